@@ -1,3 +1,51 @@
 import os
 
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+
+# persistent ids of the authors in the knowledge graph (see knowledge_graph.author_index)
+AUTHOR_INDEX_PATH = os.getenv("AUTHOR_INDEX_PATH", "data/author_index.json")
+# canonical institutions of the affiliations (see knowledge_graph.affiliations)
+AFFILIATION_DICTIONARY_PATH = os.getenv("AFFILIATION_DICTIONARY_PATH", "data/affiliations.json")
+
+# entity disambiguation (see disambiguation.py), the endpoints can point to local stand-ins for testing
+WIKIDATA_SPARQL_ENDPOINT = os.getenv("WIKIDATA_SPARQL_ENDPOINT", "https://query.wikidata.org/sparql")
+ORCID_API_URL = os.getenv("ORCID_API_URL", "https://pub.orcid.org/v3.0")
+DISAMBIGUATION_CACHE_PATH = os.getenv("DISAMBIGUATION_CACHE_PATH", "data/disambiguation_cache.sqlite")
+# lookups that found nothing are repeated after this many seconds (default: 30 days), found entities are cached for good
+DISAMBIGUATION_NOT_FOUND_TTL = float(os.getenv("DISAMBIGUATION_NOT_FOUND_TTL", str(30 * 24 * 3600)))
+
+# OpenAI requests of a process share one client (see parser_openai.py), the limits should match the account rate limits
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "40000"))
+
+# batch runs (see pipeline.py): processes parsing the documents and threads downloading them
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "16"))
+
+# preload the shared components when the service starts (can be disabled for faster reloads during development)
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
+
+# results of /metadata/single_paper (see result_cache.py): the version has to be increased whenever the extraction changes,
+# the SQLite file of the persistent tier is optional
+PIPELINE_VERSION = os.getenv("PIPELINE_VERSION", "1")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH")
+
+# memory ceiling of batch runs in MB (see memory.py), no new papers are fetched while the process and its workers are above it (0 = no ceiling)
+MEMORY_LIMIT_MB = int(os.getenv("MEMORY_LIMIT_MB", "0"))
+
+# read endpoints on the knowledge graph (see knowledge_graph/queries.py): result pages are cached for READ_CACHE_TTL seconds
+READ_CACHE_TTL = float(os.getenv("READ_CACHE_TTL", "10"))
+READ_CACHE_SIZE = int(os.getenv("READ_CACHE_SIZE", "4096"))
+
+# adaptive limits of the requests in flight per external host (see concurrency.py)
+HOST_INITIAL_CONCURRENCY = int(os.getenv("HOST_INITIAL_CONCURRENCY", "4"))
+HOST_MAX_CONCURRENCY = int(os.getenv("HOST_MAX_CONCURRENCY", "32"))
+
+# distributed crawls (see work_queue.py): SQLite file shared by the workers, lease duration of a task in seconds
+# and number of leases before a task is marked as failed
+WORK_QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "data/work_queue.sqlite")
+WORK_LEASE_SECONDS = float(os.getenv("WORK_LEASE_SECONDS", "300"))
+WORK_MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", "3"))
@@ -0,0 +1,4 @@
+from paper_semantification.cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Iterable, List, Optional
+
+from paper_semantification import MEMORY_LIMIT_MB, PARSE_WORKERS, WORK_LEASE_SECONDS, WORK_QUEUE_PATH
+
+# Command line interface for batch runs without the API server:
+#   python -m paper_semantification 2451 3498-3500 --sink parquet --workers 8
+#   python -m paper_semantification --all --resume --sink neo4j
+# and for distributed crawls through a shared work queue (see work_queue.py):
+#   python -m paper_semantification queue enqueue --all
+#   python -m paper_semantification queue work --workers 4    (on every node)
+#   python -m paper_semantification queue export --sink parquet
+#   python -m paper_semantification queue sync                (writes the finished papers into the knowledge graph)
+
+
+def parse_volume_ranges(specs: Iterable[str]) -> List[int]:
+    """ parses volume ids and inclusive ranges ("2451", "3498-3500", "2000,2002") into a sorted list without duplicates """
+    volumes = set()
+    for spec in specs:
+        for part in spec.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                if '-' in part:
+                    start, end = (int(p) for p in part.split('-', 1))
+                    if start > end:
+                        raise ValueError
+                    volumes.update(range(start, end + 1))
+                else:
+                    volumes.add(int(part))
+            except ValueError:
+                raise argparse.ArgumentTypeError(f"Invalid volume or volume range: {part}")
+    return sorted(volumes)
+
+
+class Checkpoint:
+    """ volumes that were completely written to the output, stored as JSON so an interrupted run can be resumed """
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = set(json.load(f)['done'])
+
+    def mark_done(self, volume_id: int):
+        self.done.add(int(volume_id))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'done': sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+
+    def pending(self, volumes: Iterable) -> List[int]:
+        return [int(v) for v in volumes if int(v) not in self.done]
+
+
+class Progress:
+    """ prints a single, continuously updated progress line with the throughput of the run """
+    def __init__(self, total_volumes: int, stream=sys.stderr):
+        self.total_volumes = total_volumes
+        self.stream = stream
+        self.volumes = 0
+        self.papers = 0
+        self.failed = 0
+        self.start = time.monotonic()
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.start
+        rate = self.papers / elapsed if elapsed > 0 else 0.0
+        minutes, seconds = divmod(int(elapsed), 60)
+        return (f"[{self.volumes}/{self.total_volumes} volumes] {self.papers} papers ({self.failed} failed), {rate:.2f} papers/s, "
+                f"elapsed {minutes // 60:02d}:{minutes % 60:02d}:{seconds:02d}")
+
+    def update(self, volume_id: int, papers: int, failed: int = 0):
+        self.volumes += 1
+        self.papers += papers
+        self.failed += failed
+        self.stream.write(f"\r{self.line()} (last: Vol-{volume_id})")
+        self.stream.flush()
+
+    def finish(self):
+        self.stream.write(f"\r{self.line()}\n")
+        self.stream.flush()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(prog='python -m paper_semantification',
+                                         description='Extracts the metadata of CEUR-WS volumes in a batch run.')
+    arg_parser.add_argument('volumes', nargs='*', help='volume ids or ranges, e.g. 2451 3498-3500')
+    arg_parser.add_argument('--all', action='store_true', help='process all volumes listed by the ceurspt api')
+    arg_parser.add_argument('--workers', type=int, default=PARSE_WORKERS,
+                            help='parsing processes, 1 processes the volumes one after the other (default: %(default)s)')
+    arg_parser.add_argument('--cache-dir', default='data',
+                            help='directory of the author index, affiliation dictionary, disambiguation cache and checkpoint '
+                                 '(default: %(default)s)')
+    arg_parser.add_argument('--sink', choices=['jsonl', 'parquet', 'neo4j'], default='jsonl',
+                            help='jsonl/parquet write the author rows to --output, neo4j writes them into the knowledge graph')
+    arg_parser.add_argument('--output', help='output file (jsonl) or directory (parquet) (default: output/metadata.<sink>)')
+    arg_parser.add_argument('--sync', action='store_true',
+                            help='with --sink neo4j, only write the changes of each paper and remove data it no longer contains')
+    arg_parser.add_argument('--disambiguate', action='store_true', help='link papers and authors to Wikidata and ORCID')
+    arg_parser.add_argument('--resume', action='store_true', help='skip the volumes completed by a previous run')
+    arg_parser.add_argument('--checkpoint', help='checkpoint file (default: <cache-dir>/checkpoint.json)')
+    arg_parser.add_argument('--memory-limit', type=int, default=MEMORY_LIMIT_MB, metavar='MB',
+                            help='memory ceiling of the run and its parsing processes, with --workers > 1 no further papers are fetched '
+                                 'while it is exceeded (default: %(default)s = none)')
+    arg_parser.add_argument('--dry-run', action='store_true', help='only list the volumes and papers that would be processed')
+    return arg_parser
+
+
+def build_queue_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(prog='python -m paper_semantification queue',
+                                         description='Distributed crawl: volumes are enqueued once, any number of workers process them.')
+    arg_parser.add_argument('--queue', default=WORK_QUEUE_PATH, help='SQLite file of the work queue (default: %(default)s)')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    enqueue = commands.add_parser('enqueue', help='add volumes to the queue, volumes already in the queue are skipped')
+    enqueue.add_argument('volumes', nargs='*', help='volume ids or ranges, e.g. 2451 3498-3500')
+    enqueue.add_argument('--all', action='store_true', help='enqueue all volumes listed by the ceurspt api')
+    work = commands.add_parser('work', help='process tasks until the queue is drained')
+    work.add_argument('--workers', type=int, default=1, help='worker processes on this node (default: %(default)s)')
+    work.add_argument('--lease', type=float, default=WORK_LEASE_SECONDS, metavar='SECONDS',
+                      help='lease duration, tasks of workers that stop sending heartbeats are leased again (default: %(default)s)')
+    commands.add_parser('status', help='print the number of tasks per state and the failed tasks')
+    commands.add_parser('retry', help='put the failed tasks back into the queue')
+    export = commands.add_parser('export', help='write the rows of the finished papers to a sink')
+    export.add_argument('--sink', choices=['jsonl', 'parquet'], default='jsonl')
+    export.add_argument('--output', help='output file (jsonl) or directory (parquet) (default: output/metadata.<sink>)')
+    sync = commands.add_parser('sync', help='write the finished papers into the knowledge graph with delta synchronization, '
+                                            'can be repeated while the crawl is running')
+    sync.add_argument('--cache-dir', default='data', help='directory of the author index and affiliation dictionary (default: %(default)s)')
+    return arg_parser
+
+
+def queue_main(argv: List[str]):
+    arg_parser = build_queue_arg_parser()
+    args = arg_parser.parse_args(argv)
+    from paper_semantification.work_queue import WorkQueue, enqueue_volumes, run_crawl_worker, sync_graph_from_queue
+
+    if args.command == 'work':
+        if args.workers <= 1:
+            run_crawl_worker(args.queue, lease_seconds=args.lease)
+            return
+        import multiprocessing
+        processes = [multiprocessing.Process(target=run_crawl_worker, args=(args.queue, args.lease))
+                     for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return
+
+    queue = WorkQueue(args.queue)
+    try:
+        if args.command == 'enqueue':
+            try:
+                volumes = parse_volume_ranges(args.volumes)
+            except argparse.ArgumentTypeError as e:
+                arg_parser.error(str(e))
+            if args.all:
+                from paper_semantification.parser import list_volumes
+                volumes = sorted(int(v) for v in list_volumes())
+            if not volumes:
+                arg_parser.error('either volumes or --all must be given')
+            print(f"{enqueue_volumes(queue, volumes)} of {len(volumes)} volumes enqueued")
+        elif args.command == 'status':
+            for kind, counts in sorted(queue.stats().items()):
+                print(f"{kind}: " + ', '.join(f"{count} {state}" for state, count in counts.items()))
+            for kind, key, error in queue.failures():
+                print(f"failed {kind} {key}: {error}")
+        elif args.command == 'retry':
+            print(f"{queue.retry_failed()} failed tasks enqueued again")
+        elif args.command == 'export':
+            from paper_semantification.sink import create_sink
+            output = args.output or os.path.join('output', f'metadata.{args.sink}')
+            if os.path.exists(output):
+                # the export contains all finished papers, appending it to an earlier export would duplicate them
+                arg_parser.error(f'{output} already exists')
+            with create_sink(args.sink, output) as sink:
+                sink.write_rows(queue.results('paper'))
+            print(f"{sink.rows_written} rows written to {sink.path}")
+        elif args.command == 'sync':
+            print(f"{sync_graph_from_queue(queue, cache_dir=args.cache_dir)} papers changed in the knowledge graph")
+    finally:
+        queue.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['queue']:
+        return queue_main(argv[1:])
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    try:
+        volumes = parse_volume_ranges(args.volumes)
+    except argparse.ArgumentTypeError as e:
+        arg_parser.error(str(e))
+    if not volumes and not args.all:
+        arg_parser.error('either volumes or --all must be given')
+    if args.sync and args.sink != 'neo4j':
+        arg_parser.error('--sync requires --sink neo4j')
+    output = args.output or os.path.join('output', f'metadata.{args.sink}')
+    if args.sink != 'neo4j' and not args.resume and not args.dry_run and os.path.exists(output):
+        # appending the rows of a new run to an earlier output would duplicate them
+        arg_parser.error(f'{output} already exists, use --resume to continue the run that wrote it')
+
+    # imported here, as the parser loads all extraction dependencies
+    from paper_semantification.parser import list_volume_papers, list_volumes, parse_volumes
+    from paper_semantification.sink import create_sink
+
+    if args.all:
+        volumes = sorted(int(v) for v in list_volumes())
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.cache_dir, 'checkpoint.json'))
+    if args.resume:
+        skipped = len(volumes)
+        volumes = checkpoint.pending(volumes)
+        print(f"Resuming: {skipped - len(volumes)} volumes already done, {len(volumes)} left")
+    if not volumes:
+        print("Nothing to do")
+        return
+
+    if args.dry_run:
+        total = 0
+        for volume_id in volumes:
+            paper_keys = list_volume_papers(volume_id)
+            total += len(paper_keys)
+            print(f"Vol-{volume_id}: {len(paper_keys)} papers")
+        print(f"{len(volumes)} volumes, {total} papers would be processed")
+        return
+
+    if args.sink == 'neo4j':
+        sink = create_sink('none')
+    else:
+        sink = create_sink(args.sink, output)
+    if args.resume:
+        # rows are flushed before a volume is checkpointed, rows of the pending volumes are left over from an interrupted run
+        sink.drop_volumes(volumes)
+    progress = Progress(len(volumes))
+
+    def on_volume_done(volume_id, papers, failed):
+        # volumes with failed papers are processed again by the next --resume, which first drops the rows written now
+        if not failed:
+            checkpoint.mark_done(volume_id)
+        progress.update(volume_id, papers, failed)
+
+    with sink:
+        parse_volumes(volumes=volumes, construct_graph=args.sink == 'neo4j', sink=sink, disambiguate=args.disambiguate,
+                      workers=args.workers, cache_dir=args.cache_dir, on_volume_done=on_volume_done,
+                      memory_limit_mb=args.memory_limit, sync_graph=args.sync)
+    progress.finish()
+    if args.sink != 'neo4j':
+        print(f"{sink.rows_written} rows written to {sink.path}")
@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import http.client
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+from urllib.error import URLError
+from urllib.parse import urlparse
+
+from paper_semantification import HOST_INITIAL_CONCURRENCY, HOST_MAX_CONCURRENCY
+
+if TYPE_CHECKING:
+    import requests
+
+# Adaptive concurrency control for the external hosts (ceurspt, dblp, OpenAI).
+# Every host gets its own limit of requests in flight, adapted AIMD-style: the limit grows by one per round of successful
+# requests (additive increase) and is halved when the host fails or throttles, or reduced when its latency rises well above
+# the average latency of the same kind of request (multiplicative decrease). After repeated failures, or when the host asks for a pause
+# (429 with Retry-After), the circuit of the host opens: requests wait until the pause is over, then a single trial request
+# decides whether the host is back. Failures are raised as UpstreamError, so they are not mistaken for empty results.
+
+
+class UpstreamError(Exception):
+    """ an external host failed (timeout, connection error, 429 or 5xx) or its circuit stayed open for too long """
+    def __init__(self, host: str, message: str):
+        # both arguments are kept in args, so the error can be pickled between the pipeline processes
+        super().__init__(host, message)
+        self.host = host
+
+    def __str__(self):
+        return f"{self.args[0]}: {self.args[1]}"
+
+
+class HostLimiter:
+    """
+    AIMD limit and circuit breaker of a single host
+
+    initial, min_limit, max_limit: limits of the number of requests in flight
+    latency_tolerance: successful requests slower than this factor times the baseline latency reduce the limit.
+                       The baseline is a moving average per request class, so large downloads are not compared with small pages.
+    failure_threshold: consecutive failures after which the circuit opens
+    cooldown, max_cooldown: pause of an open circuit, doubled with every failed trial request
+    max_wait: longest time a request waits for an open circuit before it fails with UpstreamError
+    """
+    def __init__(self, host: str, initial: int = HOST_INITIAL_CONCURRENCY, min_limit: int = 1, max_limit: int = HOST_MAX_CONCURRENCY,
+                 latency_tolerance: float = 2.0, failure_threshold: int = 5, cooldown: float = 5.0, max_cooldown: float = 120.0,
+                 max_wait: float = 300.0):
+        self.host = host
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_wait = max_wait
+        self.in_flight = 0
+        # request class -> moving average of the latency of successful requests
+        self.baselines = {}
+        self.failures = 0
+        self.total_failures = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self._trial = False
+        self._cond = threading.Condition()
+
+    @property
+    def is_open(self) -> bool:
+        return self.open_until > time.monotonic() or self._trial
+
+    def _try_start(self) -> float:
+        """ starts a request if possible and returns 0, otherwise returns how long to wait before trying again """
+        now = time.monotonic()
+        if self.open_until > now:
+            return self.open_until - now
+        if self.open_until:
+            # half-open: a single trial request decides whether the host is back
+            if self.in_flight or self._trial:
+                return 0.05
+            self._trial = True
+        elif self.in_flight >= int(self.limit):
+            return 0.05
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self):
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            while True:
+                wait = self._try_start()
+                if not wait:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise UpstreamError(self.host, 'circuit open')
+                self._cond.wait(wait)
+
+    async def aacquire(self):
+        """ acquire for coroutines, waits without blocking the event loop """
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            with self._cond:
+                wait = self._try_start()
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise UpstreamError(self.host, 'circuit open')
+            await asyncio.sleep(wait)
+
+    def release(self, latency: Optional[float] = None, failed: bool = False, retry_after: Optional[float] = None,
+                request_class: str = ''):
+        """
+        finishes a request and adapts the limit
+
+        latency: duration of a successful request, None if the request says nothing about the health of the host
+        failed: the host failed or throttled the request
+        retry_after: pause requested by the host in seconds
+        request_class: kind of request whose latency is comparable (e.g. the file extension of a download)
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if failed:
+                self._on_failure(retry_after)
+            elif latency is not None:
+                self._on_success(latency, request_class)
+            elif self._trial:
+                self._trial = False
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float, request_class: str = ''):
+        if self._trial or self.open_until:
+            self._trial, self.open_until, self.cooldown = False, 0.0, self.base_cooldown
+        self.failures = 0
+        baseline = self.baselines.get(request_class, latency)
+        if latency > self.latency_tolerance * baseline:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        # exponentially weighted moving average, it follows a host that became slower or faster for good
+        self.baselines[request_class] = baseline + 0.1 * (latency - baseline)
+
+    def _on_failure(self, retry_after: Optional[float]):
+        self.failures += 1
+        self.total_failures += 1
+        self.limit = max(self.min_limit, self.limit / 2)
+        now = time.monotonic()
+        if self._trial:
+            self._trial = False
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self.open_until = now + self.cooldown
+        elif retry_after:
+            self.open_until = max(self.open_until, now + min(retry_after, self.max_cooldown))
+        elif self.failures >= self.failure_threshold:
+            self.open_until = now + self.cooldown
+            print(f"Pausing requests to {self.host} for {self.cooldown:.0f}s after {self.failures} failures")
+
+    def stats(self) -> dict:
+        return {'limit': int(self.limit), 'in_flight': self.in_flight, 'failures': self.total_failures, 'open': self.is_open,
+                'baseline_latency': dict(self.baselines)}
+
+
+def is_network_error(error: BaseException) -> bool:
+    """
+    whether an exception says something about the health of a host: timeouts, connection errors and HTTP 429/5xx.
+    Other exceptions of a client library (e.g. a response it cannot parse) are errors of the caller.
+    """
+    if isinstance(error, (UpstreamError, ConnectionError, TimeoutError, URLError, http.client.HTTPException)):
+        return True
+    # requests is only checked if a client library already imported it
+    requests = sys.modules.get('requests')
+    if requests is not None and isinstance(error, requests.RequestException):
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+        return status is None or status == 429 or status >= 500
+    return False
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    try:
+        return float(headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class ConcurrencyController:
+    """ HostLimiters of all hosts a process talks to, created on first use with the given options """
+    def __init__(self, **limiter_options):
+        self.limiter_options = limiter_options
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, host: str, **options) -> HostLimiter:
+        """ returns the limiter of a host, options override the defaults of the controller when the limiter is created """
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = HostLimiter(host, **{**self.limiter_options, **options})
+            return self._limiters[host]
+
+    @contextmanager
+    def request(self, host: str, request_class: str = ''):
+        """ runs a request within the limit of the host, network errors (see is_network_error) count as failures of the host """
+        limiter = self.limiter(host)
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            limiter.release(failed=is_network_error(e))
+            raise
+        limiter.release(latency=time.monotonic() - start, request_class=request_class)
+
+    def fetch(self, url: str, method: str = 'GET', timeout: float = 60, **kwargs) -> "requests.Response":
+        """
+        sends an HTTP request within the limit of its host. Responses like 404 are returned as they are,
+        timeouts, connection errors, 429 and 5xx raise UpstreamError.
+        """
+        import requests as req
+        parsed_url = urlparse(url)
+        host = parsed_url.netloc
+        # latencies of e.g. PDF downloads and small XML/HTML pages are compared separately
+        request_class = os.path.splitext(parsed_url.path)[1].lower()
+        limiter = self.limiter(host)
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = req.request(method, url, timeout=timeout, **kwargs)
+        except req.RequestException as e:
+            limiter.release(failed=True)
+            raise UpstreamError(host, repr(e)) from e
+        if response.status_code == 429 or response.status_code >= 500:
+            limiter.release(failed=True, retry_after=retry_after_seconds(response.headers))
+            raise UpstreamError(host, f'HTTP {response.status_code} for {url}')
+        limiter.release(latency=time.monotonic() - start, request_class=request_class)
+        return response
+
+    def call(self, host: str, function, *args, **kwargs):
+        """
+        calls a client library function talking to host within its limit. Network errors are raised as UpstreamError,
+        all other exceptions are raised unchanged.
+        """
+        try:
+            with self.request(host):
+                return function(*args, **kwargs)
+        except UpstreamError:
+            raise
+        except Exception as e:
+            if is_network_error(e):
+                raise UpstreamError(host, repr(e)) from e
+            raise
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {host: limiter.stats() for host, limiter in self._limiters.items()}
+
+
+# limits shared by the whole process
+controller = ConcurrencyController()
+
+
+def _reset_after_fork():
+    global controller
+    controller = ConcurrencyController()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def fetch(url: str, method: str = 'GET', timeout: float = 60, **kwargs) -> "requests.Response":
+    return controller.fetch(url, method=method, timeout=timeout, **kwargs)
+
+
+def call(host: str, function, *args, **kwargs):
+    return controller.call(host, function, *args, **kwargs)
+
+
+# Upstream errors that happen deep inside the extraction (e.g. dblp lookups used as a cross-check)
+# are reported to the paper being processed by the current thread instead of being raised.
+_errors = contextvars.ContextVar('upstream_errors', default=None)
+
+
+@contextmanager
+def collect_errors():
+    """ collects the errors reported with report_error in this block """
+    errors = []
+    token = _errors.set(errors)
+    try:
+        yield errors
+    finally:
+        _errors.reset(token)
+
+
+def report_error(source: str, error: Exception):
+    errors: Optional[List[str]] = _errors.get()
+    print(f"{source} failed: {error}")
+    if errors is not None:
+        errors.append(f"{source}: {error}")
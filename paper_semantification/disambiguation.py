@@ -0,0 +1,262 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional
+
+from paper_semantification import (WIKIDATA_SPARQL_ENDPOINT, ORCID_API_URL, DISAMBIGUATION_CACHE_PATH,
+                                   DISAMBIGUATION_NOT_FOUND_TTL)
+from paper_semantification.concurrency import fetch
+from paper_semantification.knowledge_graph.affiliations import normalized_key
+from paper_semantification.startup import lazy_import
+
+fuzz = lazy_import('fuzzywuzzy.fuzz')
+
+# Entity disambiguation with Wikidata and ORCID.
+# All lookups of a volume are collected first and sent in batches (SPARQL VALUES blocks, OR-combined
+# ORCID searches, paged until all results are read). Every answer is stored in a persistent cache, so repeated runs only query
+# the entities that were never looked up before. "Not found" answers expire, as the entity may be added later.
+# A name is not enough to identify a person: ORCID iDs found by name are only assigned if the affiliation or email agrees.
+
+USER_AGENT = 'paper_semantification (https://github.com/HaigeWang1/Paper-Semantification)'
+
+
+def chunks(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def sparql_literal(value: str, lang: Optional[str] = None) -> str:
+    literal = json.dumps(value, ensure_ascii=False)
+    return f'{literal}@{lang}' if lang else literal
+
+
+class DisambiguationCache:
+    """
+    persistent key value cache (SQLite) for the results of the disambiguation lookups
+
+    not_found_ttl: seconds after which empty results (None, nothing found) are looked up again
+    """
+    def __init__(self, path: Optional[str] = DISAMBIGUATION_CACHE_PATH, not_found_ttl: float = DISAMBIGUATION_NOT_FOUND_TTL):
+        path = path or ':memory:'
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.not_found_ttl = not_found_ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lookups (kind TEXT, key TEXT, value TEXT, stored REAL, PRIMARY KEY (kind, key))")
+        if 'stored' not in {row[1] for row in self._conn.execute("PRAGMA table_info(lookups)")}:
+            # caches written before the entries expired, their empty results are looked up again
+            self._conn.execute("ALTER TABLE lookups ADD COLUMN stored REAL")
+        self._lock = threading.Lock()
+
+    def get_many(self, kind: str, keys: Iterable[str]) -> Dict[str, Optional[str]]:
+        """ returns the cached values of the keys that were looked up before (None = nothing found), expired empty results are left out """
+        result = {}
+        keys = list(keys)
+        expired = time.time() - self.not_found_ttl
+        with self._lock:
+            for batch in chunks(keys, 500):
+                rows = self._conn.execute(f"SELECT key, value, stored FROM lookups WHERE kind = ? AND key IN ({','.join('?' * len(batch))})",
+                                          [kind, *batch])
+                for key, value, stored in rows:
+                    value = json.loads(value)
+                    if value or (stored is not None and stored > expired):
+                        result[key] = value
+        return result
+
+    def put_many(self, kind: str, values: Dict[str, Optional[str]]):
+        with self._lock, self._conn:
+            now = time.time()
+            self._conn.executemany("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?)",
+                                   [(kind, key, json.dumps(value), now) for key, value in values.items()])
+
+    def cached_lookup(self, kind: str, keys: Iterable[str], lookup) -> Dict[str, Optional[str]]:
+        """ returns the values of all keys, calling lookup(missing_keys) only for keys that are not cached yet """
+        keys = list(dict.fromkeys(k for k in keys if k))
+        result = self.get_many(kind, keys)
+        missing = [k for k in keys if k not in result]
+        if missing:
+            found = lookup(missing)
+            values = {k: found.get(k) for k in missing}
+            self.put_many(kind, values)
+            result.update(values)
+        return result
+
+
+class WikidataClient:
+    """ batched lookups against a Wikidata SPARQL endpoint (e.g. a local stand-in for tests) """
+    def __init__(self, endpoint: str = WIKIDATA_SPARQL_ENDPOINT, batch_size: int = 50, timeout: int = 60):
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def query(self, query: str) -> List[dict]:
+        response = fetch(self.endpoint, method='POST', data={'query': query}, timeout=self.timeout,
+                         headers={'Accept': 'application/sparql-results+json', 'User-Agent': USER_AGENT})
+        response.raise_for_status()
+        return [{k: v['value'] for k, v in binding.items()} for binding in response.json()['results']['bindings']]
+
+    @staticmethod
+    def entity_id(uri: str) -> str:
+        return uri.rsplit('/', 1)[-1]
+
+    def find_papers(self, titles: List[str]) -> Dict[str, str]:
+        """ returns the Wikidata ids of the scholarly articles with the given titles """
+        result = {}
+        for batch in chunks(titles, self.batch_size):
+            values = ' '.join(sparql_literal(t, 'en') for t in batch)
+            rows = self.query(f"SELECT ?title ?item WHERE {{ VALUES ?title {{ {values} }} ?item wdt:P1476 ?title . }}")
+            result.update({row['title']: self.entity_id(row['item']) for row in rows})
+        return result
+
+    def paper_authors(self, paper_ids: List[str]) -> Dict[str, List[dict]]:
+        """ returns the authors (wikidata_id, name, orcid) listed for each of the given papers """
+        result = {paper_id: [] for paper_id in paper_ids}
+        for batch in chunks(paper_ids, self.batch_size):
+            values = ' '.join(f'wd:{paper_id}' for paper_id in batch)
+            rows = self.query(f"""SELECT ?paper ?author ?name ?orcid WHERE {{
+                                    VALUES ?paper {{ {values} }}
+                                    ?paper wdt:P50 ?author .
+                                    ?author rdfs:label ?name . FILTER(LANG(?name) = "en")
+                                    OPTIONAL {{ ?author wdt:P496 ?orcid . }}
+                                  }}""")
+            for row in rows:
+                result[self.entity_id(row['paper'])].append({'wikidata_id': self.entity_id(row['author']), 'name': row['name'],
+                                                            'orcid': row.get('orcid')})
+        return result
+
+    def find_authors_by_orcid(self, orcids: List[str]) -> Dict[str, str]:
+        """ returns the Wikidata ids of the persons with the given ORCID iDs """
+        result = {}
+        for batch in chunks(orcids, self.batch_size):
+            values = ' '.join(sparql_literal(o) for o in batch)
+            rows = self.query(f"SELECT ?orcid ?item WHERE {{ VALUES ?orcid {{ {values} }} ?item wdt:P496 ?orcid . }}")
+            result.update({row['orcid']: self.entity_id(row['item']) for row in rows})
+        return result
+
+
+class OrcidClient:
+    """
+    bulk name search against the ORCID public API (or a local stand-in)
+
+    page_size: records per request, the results of a search are paged until they are exhausted
+    max_records: searches with more results are split into one search per name, names with more results are not matched
+    """
+    def __init__(self, endpoint: str = ORCID_API_URL, batch_size: int = 20, timeout: int = 60, page_size: int = 1000,
+                 max_records: int = 5000):
+        self.endpoint = endpoint.rstrip('/')
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.page_size = page_size
+        self.max_records = max_records
+
+    @staticmethod
+    def split_name(name: str):
+        parts = name.split()
+        return ' '.join(parts[:-1]), parts[-1] if parts else ''
+
+    def query(self, names: List[str]) -> Optional[List[dict]]:
+        """ returns all records matching one of the names, or None if there are more than max_records """
+        clauses = []
+        for name in names:
+            given, family = self.split_name(name)
+            clauses.append(f'(given-names:{json.dumps(given)} AND family-name:{json.dumps(family)})')
+        records = []
+        while True:
+            response = fetch(f'{self.endpoint}/expanded-search/', timeout=self.timeout,
+                             params={'q': ' OR '.join(clauses), 'start': len(records), 'rows': self.page_size},
+                             headers={'Accept': 'application/json', 'User-Agent': USER_AGENT})
+            response.raise_for_status()
+            body = response.json()
+            found = body.get('num-found') or 0
+            if found > self.max_records:
+                return None
+            page = body.get('expanded-result') or []
+            records.extend(page)
+            if not page or len(records) >= found:
+                return records
+
+    def search(self, names: List[str]) -> Dict[str, List[dict]]:
+        """
+        returns the ORCID records matching each name as {'orcid', 'institutions', 'emails'}.
+        Names without a match, or with more records than max_records, are left out.
+        """
+        result = {}
+        for batch in chunks(names, self.batch_size):
+            records = self.query(batch)
+            if records is None:
+                if len(batch) > 1:
+                    # a truncated result would miss candidates of the names
+                    result.update(self.search_each(batch))
+                continue
+            for name in batch:
+                matches = [{'orcid': r['orcid-id'], 'institutions': r.get('institution-name') or [], 'emails': r.get('email') or []}
+                           for r in records
+                           if fuzz.token_set_ratio(name, f"{r.get('given-names') or ''} {r.get('family-names') or ''}") >= 95]
+                if matches:
+                    result[name] = matches
+        return result
+
+    def search_each(self, names: List[str]) -> Dict[str, List[dict]]:
+        result = {}
+        for name in names:
+            result.update(self.search([name]))
+        return result
+
+
+def confirmed_orcid(author, candidates: Optional[List[dict]]) -> Optional[str]:
+    """
+    returns the ORCID iD of the one candidate record whose institutions or emails agree with the author, as the name alone
+    cannot tell namesakes apart (the author index treats ORCID iDs as identity)
+    """
+    emails = {e.lower() for e in author.email}
+    affiliations = {normalized_key(a) for a in author.affiliation} - {''}
+    confirmed = set()
+    for candidate in candidates or []:
+        if emails & {e.lower() for e in candidate['emails']} or any(
+                fuzz.token_sort_ratio(a, normalized_key(i)) >= 92 for a in affiliations for i in candidate['institutions']):
+            confirmed.add(candidate['orcid'])
+    return confirmed.pop() if len(confirmed) == 1 else None
+
+
+def disambiguate_volume(papers: List, wikidata: Optional[WikidataClient] = None, orcid: Optional[OrcidClient] = None,
+                        cache: Optional[DisambiguationCache] = None) -> List:
+    """
+    attaches Wikidata ids and ORCID iDs to the papers of a volume and their authors
+
+    papers: list of PaperMetadata (see parser.extract_paper_metadata)
+    1. papers are looked up on Wikidata by their title
+    2. authors are matched with the authors Wikidata lists for the paper
+    3. the remaining authors are searched on ORCID by their name, a record is only assigned if its institution or email agrees
+    4. authors with an ORCID iD are looked up on Wikidata by their ORCID iD
+    """
+    wikidata = wikidata or WikidataClient()
+    orcid = orcid or OrcidClient()
+    cache = cache or DisambiguationCache()
+
+    paper_ids = cache.cached_lookup('wikidata_paper', [p.title for p in papers], wikidata.find_papers)
+    listed_authors = cache.cached_lookup('wikidata_paper_authors', [i for i in paper_ids.values() if i], wikidata.paper_authors)
+
+    resolved = []
+    for paper in papers:
+        paper_id = paper_ids.get(paper.title)
+        candidates = listed_authors.get(paper_id) or []
+        authors = []
+        for author in paper.authors:
+            match = max(candidates, key=lambda c: fuzz.token_set_ratio(author.name, c['name']), default=None)
+            if match and fuzz.token_set_ratio(author.name, match['name']) >= 85:
+                author = replace(author, orcid=author.orcid or match['orcid'], wikidata_id=author.wikidata_id or match['wikidata_id'])
+            authors.append(author)
+        resolved.append(replace(paper, authors=authors, wikidata_id=paper_id or paper.wikidata_id))
+
+    candidates = cache.cached_lookup('orcid_candidates', [a.name for p in resolved for a in p.authors if not a.orcid], orcid.search)
+    resolved = [replace(paper, authors=[replace(author, orcid=author.orcid or confirmed_orcid(author, candidates.get(author.name)))
+                                        for author in paper.authors])
+                for paper in resolved]
+    person_ids = cache.cached_lookup('wikidata_orcid', [a.orcid for p in resolved for a in p.authors if not a.wikidata_id],
+                                     wikidata.find_authors_by_orcid)
+    return [replace(paper, authors=[replace(author, wikidata_id=author.wikidata_id or person_ids.get(author.orcid))
+                                    for author in paper.authors])
+            for paper in resolved]
@@ -0,0 +1,128 @@
+import os
+import re
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import pandas as pd
+from rapidfuzz import fuzz, process, utils
+from unidecode import unidecode
+
+
+# Each column is normalized in a single pass over its values. The patterns below
+# fold the chained `.str.replace` calls the evaluation used to run into one regex per column.
+
+# initials ("U.") and the characters that only add noise to author names
+_NAME_NOISE_RE = re.compile(r"[A-Za-z]\.|[´-]")
+_WHITESPACE_RE = re.compile(r"\s+")
+# removes middle names for better author comparison
+_MIDDLE_NAME_RE = re.compile(r"\s\S+\s")
+# brackets and commas are dropped together with a following space, dots, dashes and colons are dropped alone
+_TITLE_PUNCT_RE = re.compile(r"[(),]\.* ?|[.\-:]")
+_TITLE_TRANSLATION = str.maketrans({"’": "'"})
+_AFFILIATION_RE = re.compile(r"[^a-z0-9\s]|[\n ]")
+
+
+@dataclass
+class EvaluationScores:
+    """ number of papers (out of `total_papers`) that were correctly extracted on each evaluation level """
+    total_papers: int
+    # 1) exact matching of paper titles and author names
+    title_and_names: int
+    # 2) exact matching of title, author names and email
+    title_names_and_emails: int
+    # 3) as 2) plus approximate matching of affiliations
+    title_names_emails_and_affiliations: int
+
+    def to_dict(self):
+        return asdict(self)
+
+    def __str__(self):
+        return (f'Exact matching of paper titles and author names: {self.title_and_names} out of {self.total_papers}\n'
+                f'Exact matching of title, names and emails: {self.title_names_and_emails} out of {self.total_papers}\n'
+                f'Exact matching of title, names and emails; app. matching of affiliations: '
+                f'{self.title_names_emails_and_affiliations} out of {self.total_papers}')
+
+
+def normalize_author_name(name: str) -> str:
+    """ removes initials, special characters, accents and middle names for better author comparison """
+    name = _WHITESPACE_RE.sub(' ', _NAME_NOISE_RE.sub('', name)).strip().lower()
+    return _MIDDLE_NAME_RE.sub(' ', unidecode(name))
+
+
+def normalize_paper_title(title: str) -> str:
+    """ removes brackets and punctuation from a paper title """
+    return _TITLE_PUNCT_RE.sub('', title).translate(_TITLE_TRANSLATION).strip().lower()
+
+
+def normalize_affiliation(affiliation: str) -> str:
+    """ keeps only the lower case alphanumeric characters of an affiliation """
+    return _AFFILIATION_RE.sub('', affiliation.lower())
+
+
+def normalize_email(email: str) -> str:
+    return email.lower().strip()
+
+
+def preprocess_df(df: pd.DataFrame) -> pd.DataFrame:
+    """ preprocesses the data for the validation step - remove special characters, extra spaces """
+    df = df.copy()
+    df['URL'] = df['URL'].str.replace('https', 'http', regex=False)
+    df['Author name'] = df['Author name'].map(normalize_author_name, na_action='ignore')
+    df['Paper title'] = df['Paper title'].map(normalize_paper_title, na_action='ignore')
+    df['Author Affiliations mod'] = df['Author Affiliations'].map(normalize_affiliation, na_action='ignore')
+    df['Author E-Mail'] = df['Author E-Mail'].map(normalize_email, na_action='ignore')
+    return df
+
+
+def affiliation_similarity(expected: pd.Series, actual: pd.Series) -> pd.Series:
+    """ adds a similarity score to the affiliations extracted and the expected affiliations, computed for all rows in one batch """
+    if expected.empty:
+        return pd.Series([], index=expected.index, dtype=float)
+    scores = process.cpdist(expected.fillna('').astype(str).tolist(), actual.fillna('').astype(str).tolist(),
+                            scorer=fuzz.token_set_ratio, processor=utils.default_process, workers=-1)
+    return pd.Series(scores, index=expected.index)
+
+
+def _write_artifact(df: pd.DataFrame, artifacts_dir: Optional[str], name: str):
+    if artifacts_dir:
+        os.makedirs(artifacts_dir, exist_ok=True)
+        df.astype(str).to_parquet(os.path.join(artifacts_dir, f'{name}.parquet'), index=False)
+
+
+def evaluate_results(expected_df: pd.DataFrame, actual_df: pd.DataFrame, artifacts_dir: Optional[str] = None) -> EvaluationScores:
+    """
+    compares expected results with the information our algorithm has extracted
+
+    expected_df: manually validated metadata (e.g. test/test_set.xlsx)
+    actual_df: metadata extracted by parse_volumes
+    artifacts_dir: if set, the intermediate tables are stored there as parquet files for debugging
+    """
+    expected_df = preprocess_df(expected_df)
+    actual_df = preprocess_df(actual_df)
+    _write_artifact(actual_df, artifacts_dir, 'actual')
+    _write_artifact(expected_df, artifacts_dir, 'expected')
+
+    merged_df = pd.merge(expected_df, actual_df, on=['URL', 'Paper title', 'Author name'], suffixes=('_exp', '_act'), how='left')
+    test_no = merged_df['Paper title'].nunique()
+
+    #1) author names and paper titles: exact matching
+    no_match = merged_df['Proceedings_act'].isna()
+    score_1 = merged_df.loc[no_match, 'Paper title'].nunique()
+    _write_artifact(merged_df[no_match], artifacts_dir, 'no_match')
+
+    #2) exact matching of title, author names and email
+    email_exp, email_act = merged_df['Author E-Mail_exp'], merged_df['Author E-Mail_act']
+    email_match = ((email_exp == email_act) | (email_exp.isna() & (email_act == '')) |
+                   (email_act.isna() & (email_exp == '')) | (email_exp.isna() & email_act.isna()))
+    score_2 = merged_df.loc[~email_match, 'Paper title'].nunique()
+    _write_artifact(merged_df[~email_match], artifacts_dir, 'email')
+
+    #3) approximate matching of affiliations for the rows with matching emails
+    df = merged_df[(email_exp == email_act) | (email_exp.isna() & email_act.isna())]
+    similarity = affiliation_similarity(df['Author Affiliations_exp'], df['Author Affiliations_act'])
+    score_3 = df.loc[similarity < 80, 'Paper title'].nunique()
+
+    return EvaluationScores(total_papers=test_no,
+                            title_and_names=test_no - score_1,
+                            title_names_and_emails=test_no - score_2,
+                            title_names_emails_and_affiliations=test_no - score_2 - score_3)
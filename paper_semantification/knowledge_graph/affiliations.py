@@ -0,0 +1,138 @@
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from typing import Optional, Tuple
+
+from unidecode import unidecode
+
+from paper_semantification.knowledge_graph.bulk_import import stable_id
+from paper_semantification.startup import lazy_import
+
+fuzz = lazy_import('fuzzywuzzy.fuzz')
+
+# Canonical institution dictionary.
+# The parsers return the same institution in many variants ("ITMO University", "ITMO University, Saint-Petersburg 197101, Russia",
+# "Dept. of CS, RWTH Aachen University"). Each affiliation string is reduced to the segment naming the organization and to a key
+# of its normalized tokens. Known keys and known raw strings are resolved with a dict lookup, new keys are only fuzzy matched
+# against the institutions sharing their rarest token.
+
+# words of organizations (preferred) and of the units within them: "Institute of Computer Science, University of Bonn"
+# is keyed on "University of Bonn", "Max Planck Institute for Informatics, Saarbrücken" on the institute
+ORGANIZATION_WORDS = {'university', 'universitat', 'universite', 'universita', 'universidad', 'universidade', 'universiteit',
+                      'universitet', 'academy', 'akademie', 'hochschule', 'hospital', 'foundation', 'gmbh', 'inc', 'ltd',
+                      'corporation', 'company', 'ag', 'polytechnic', 'politecnico', 'fraunhofer', 'cnrs', 'inria'}
+UNIT_WORDS = {'institute', 'institut', 'instituto', 'istituto', 'college', 'school', 'center', 'centre', 'zentrum',
+              'laboratory', 'laboratories', 'lab', 'labs'}
+STOPWORDS = {'of', 'the', 'and', 'for', 'at', 'in', 'de', 'der', 'die', 'des', 'du', 'la', 'le', 'di', 'del', 'und', 'fur', 'et', 'y'}
+ABBREVIATIONS = {'univ': 'university', 'uni': 'university', 'inst': 'institute', 'tech': 'technology', 'natl': 'national',
+                 'dept': 'department', 'lab': 'laboratory', 'labs': 'laboratory', 'ctr': 'center', 'centre': 'center'}
+
+
+def tokens(text: str):
+    words = re.findall(r'[a-z0-9]+', unidecode(text).lower())
+    return [ABBREVIATIONS.get(w, w) for w in words if w not in STOPWORDS]
+
+
+def institution_segment(affiliation: str) -> str:
+    """
+    returns the part of an affiliation string that names the institution: the first segment with an organization word,
+    otherwise the first one with a unit word (institute, school, ...), otherwise the first segment
+    """
+    segments = [s.strip() for s in affiliation.split(',') if s.strip()]
+    for words in (ORGANIZATION_WORDS, UNIT_WORDS):
+        for segment in segments:
+            if words.intersection(re.findall(r'[a-z]+', unidecode(segment).lower())):
+                return segment
+    return segments[0] if segments else ''
+
+
+def normalized_key(affiliation: str) -> str:
+    return ' '.join(sorted(set(tokens(institution_segment(affiliation)))))
+
+
+class AffiliationDictionary:
+    """
+    Maps affiliation strings to canonical institution ids and names, growing with every processed paper.
+
+    path: JSON file the dictionary is loaded from and saved to. If None, the dictionary only lives in memory.
+    """
+    def __init__(self, path: Optional[str] = None, threshold: int = 92):
+        self.path = path
+        self.threshold = threshold
+        # id -> {'name': canonical name, 'keys': normalized keys mapped to the institution}
+        self.institutions = {}
+        self.keys = {}
+        self.token_index = defaultdict(set)
+        self._raw = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for affiliation_id, record in json.load(f).items():
+                    self._add(affiliation_id, record['name'], record['keys'])
+        # whether institutions or keys were added since the dictionary was loaded or saved
+        self.changed = False
+
+    def _add(self, affiliation_id, name, keys):
+        record = self.institutions.setdefault(affiliation_id, {'name': sys.intern(name), 'keys': []})
+        for key in keys:
+            if key not in self.keys:
+                record['keys'].append(key)
+                self.keys[key] = affiliation_id
+                self.changed = True
+                for token in key.split():
+                    self.token_index[token].add(affiliation_id)
+
+    def _fuzzy_match(self, key):
+        key_tokens = key.split()
+        known = [t for t in key_tokens if t in self.token_index]
+        if not known:
+            return None
+        rarest = min(known, key=lambda t: len(self.token_index[t]))
+        best_id, best_score = None, 0
+        # sorted, so that ties are resolved the same way in every run
+        for affiliation_id in sorted(self.token_index[rarest]):
+            score = max(fuzz.token_sort_ratio(key, k) for k in self.institutions[affiliation_id]['keys'])
+            if score > best_score:
+                best_id, best_score = affiliation_id, score
+        return best_id if best_score >= self.threshold else None
+
+    def canonicalize(self, affiliation: str) -> Tuple[str, str]:
+        """ returns (id, canonical name) of the institution of an affiliation string """
+        affiliation = sys.intern(affiliation.strip())
+        if affiliation in self._raw:
+            return self._raw[affiliation]
+        key = normalized_key(affiliation)
+        affiliation_id = self.keys.get(key) or self._fuzzy_match(key)
+        if affiliation_id is None:
+            affiliation_id = stable_id('affiliation', key)
+            self._add(affiliation_id, institution_segment(affiliation), [key])
+        else:
+            self._add(affiliation_id, self.institutions[affiliation_id]['name'], [key])
+        result = (affiliation_id, self.institutions[affiliation_id]['name'])
+        self._raw[affiliation] = result
+        return result
+
+    def save(self):
+        """ writes the dictionary to its file, if it changed since it was loaded or saved """
+        if self.path and self.changed:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.institutions, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.changed = False
+
+
+def canonical_affiliations(affiliations, affiliation_dictionary: Optional[AffiliationDictionary] = None):
+    """ returns a list of {'id', 'name'} for the affiliations of an author, without dictionary the raw strings are kept """
+    result = {}
+    for affiliation in affiliations:
+        if not affiliation or not affiliation.strip():
+            continue
+        if affiliation_dictionary is not None:
+            affiliation_id, name = affiliation_dictionary.canonicalize(affiliation)
+        else:
+            affiliation_id, name = stable_id('affiliation', affiliation.strip()), affiliation.strip()
+        result.setdefault(affiliation_id, {'id': affiliation_id, 'name': name})
+    return list(result.values())
@@ -0,0 +1,144 @@
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+from unidecode import unidecode
+
+from paper_semantification.knowledge_graph.bulk_import import stable_id
+from paper_semantification.startup import lazy_import
+
+fuzz = lazy_import('fuzzywuzzy.fuzz')
+
+# Cross-paper author entity resolution.
+# Authors are only compared with the candidates that share a blocking key with them
+# (normalized surname + first initial, email local part, ORCID), so resolving a new author
+# costs O(block size) instead of a comparison with every author in the graph.
+
+# maximum number of affiliations and name variants kept per author
+MAX_VARIANTS = 20
+
+
+def as_list(value) -> List[str]:
+    """ authors coming from the parsers store emails/affiliations either as string or list """
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [v for v in value if v]
+
+
+def name_tokens(name: str) -> List[str]:
+    """ lower case ascii tokens of a name, the surname is always the last token """
+    if ',' in name:
+        # "Förstner, Konrad U." -> "Konrad U. Förstner"
+        surname, _, given = name.partition(',')
+        name = f'{given} {surname}'
+    return re.findall(r'[a-z]+', unidecode(name).lower())
+
+
+def blocking_keys(name: str, emails: Iterable[str] = (), orcid: Optional[str] = None) -> List[str]:
+    keys = []
+    tokens = name_tokens(name)
+    if tokens:
+        keys.append(f'name:{tokens[-1]} {tokens[0][0]}')
+    for email in emails:
+        local_part = email.split('@')[0].strip().lower()
+        if local_part:
+            keys.append(f'email:{local_part}')
+    if orcid:
+        keys.append(f'orcid:{orcid}')
+    return keys
+
+
+class AuthorIndex:
+    """
+    Assigns persistent ids to authors across papers.
+
+    path: JSON file the index is loaded from and saved to. If None, the index only lives in memory.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.authors = {}
+        self.blocks = defaultdict(set)
+        # whether authors were added or updated since the index was loaded or saved
+        self.changed = False
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.authors = json.load(f)
+            for author_id, record in self.authors.items():
+                self._index(author_id, record)
+
+    def _index(self, author_id, record):
+        for name in record['names']:
+            for key in blocking_keys(name, record['emails'], record.get('orcid')):
+                self.blocks[key].add(author_id)
+
+    def candidates(self, name, emails, orcid=None):
+        result = set()
+        for key in blocking_keys(name, emails, orcid):
+            result.update(self.blocks.get(key, ()))
+        return result
+
+    @staticmethod
+    def score(record, name, emails, affiliations, orcid=None) -> int:
+        """ similarity of an author to an indexed record, 0 means they are different persons """
+        if orcid and record.get('orcid'):
+            return 100 if orcid == record['orcid'] else 0
+        name_score = max(fuzz.token_set_ratio(unidecode(name), unidecode(n)) for n in record['names'])
+        if set(e.lower() for e in emails) & set(e.lower() for e in record['emails']):
+            return 100 if name_score >= 70 else 0
+        if name_score < 90:
+            return 0
+        # same name: affiliations decide whether it is the same person, if both are known
+        if affiliations and record['affiliations']:
+            if not any(fuzz.token_set_ratio(a, b) >= 70 for a in affiliations for b in record['affiliations']):
+                return 0
+        return name_score
+
+    def resolve(self, name: str, email=None, affiliation=None, orcid: Optional[str] = None) -> str:
+        """ returns the id of the author, a new id is assigned to authors that are not in the index yet """
+        emails, affiliations = as_list(email), as_list(affiliation)
+        best_id, best_score = None, 0
+        # sorted, so that ties are resolved the same way in every run
+        for author_id in sorted(self.candidates(name, emails, orcid)):
+            record = self.authors[author_id]
+            if orcid and record.get('orcid') == orcid:
+                # the ORCID identifies the author, regardless of equally scored namesakes
+                best_id = author_id
+                break
+            score = self.score(record, name, emails, affiliations, orcid)
+            if score > best_score:
+                best_id, best_score = author_id, score
+
+        if best_id is None:
+            # the first author with a name gets the same id as without index (see bulk_import)
+            best_id = stable_id('Author', name)
+            suffix = 1
+            while best_id in self.authors:
+                best_id = stable_id('Author', name, suffix)
+                suffix += 1
+            self.authors[best_id] = {'names': [], 'emails': [], 'affiliations': [], 'orcid': None}
+
+        record = self.authors[best_id]
+        for values, new_values in ((record['names'], [name]), (record['emails'], emails), (record['affiliations'], affiliations)):
+            for value in new_values:
+                if value not in values and len(values) < MAX_VARIANTS:
+                    values.append(value)
+                    self.changed = True
+        if orcid and record['orcid'] != orcid:
+            record['orcid'] = orcid
+            self.changed = True
+        self._index(best_id, record)
+        return best_id
+
+    def save(self):
+        """ writes the index to its file, if it changed since it was loaded or saved """
+        if self.path and self.changed:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.authors, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.changed = False
@@ -0,0 +1,155 @@
+import csv
+import hashlib
+import os
+import sys
+from typing import Iterable
+
+# Exports the rows written by parse_volumes (see paper_semantification.sink.SCHEMA) as CSV files
+# for `neo4j-admin database import full`. The files contain the same graph create_neo4j_graph builds:
+# Nodes: Paper(title, url, wikidata_id, volume), Author(author_id, name, email, affiliation, orcid, wikidata_id), affiliation(affiliation_id, affiliation), Proceeding(proceeding), Event(event)
+# Relationships: (Author)-[:AUTHORED]->(Paper), (Author)-[:AFFILIATED_WITH]->(affiliation),
+#                (Author)-[:PRESENTED_AT]->(Proceeding), (Author)-[:PARTICIPATED_IN]->(Event)
+
+ARRAY_DELIMITER = '|'
+
+NODE_FILES = {
+    'Paper': ('paper.csv', ['paperId:ID(Paper)', 'title', 'url', 'wikidata_id', 'volume:int']),
+    'Author': ('author.csv', ['author_id:ID(Author)', 'name', 'email:string[]', 'affiliation:string[]', 'orcid', 'wikidata_id']),
+    'affiliation': ('affiliation.csv', ['affiliation_id:ID(affiliation)', 'affiliation']),
+    'Proceeding': ('proceeding.csv', ['proceedingId:ID(Proceeding)', 'proceeding']),
+    'Event': ('event.csv', ['eventId:ID(Event)', 'event']),
+}
+
+RELATIONSHIP_FILES = {
+    'AUTHORED': ('authored.csv', [':START_ID(Author)', ':END_ID(Paper)']),
+    'AFFILIATED_WITH': ('affiliated_with.csv', [':START_ID(Author)', ':END_ID(affiliation)']),
+    'PRESENTED_AT': ('presented_at.csv', [':START_ID(Author)', ':END_ID(Proceeding)']),
+    'PARTICIPATED_IN': ('participated_in.csv', [':START_ID(Author)', ':END_ID(Event)']),
+}
+
+
+def stable_id(*parts) -> str:
+    """ returns an id that stays the same for the same key across runs """
+    return hashlib.sha1('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:20]
+
+
+def _split(value: str, separator: str):
+    return [part.strip() for part in value.split(separator) if part.strip()] if value else []
+
+
+class Neo4jImportWriter:
+    """
+    writes deduplicated node and relationship files, holding only the ids seen so far in memory
+
+    author_index: AuthorIndex resolving the author ids, without an index the id is derived from the author name
+    affiliation_dictionary: AffiliationDictionary mapping affiliations to institutions, without it every affiliation string is a node
+    """
+    def __init__(self, out_dir: str, author_index=None, affiliation_dictionary=None):
+        self.out_dir = out_dir
+        self.author_index = author_index
+        self.affiliation_dictionary = affiliation_dictionary
+        os.makedirs(out_dir, exist_ok=True)
+        self._files = []
+        self._writers = {}
+        for name, (filename, header) in {**NODE_FILES, **RELATIONSHIP_FILES}.items():
+            f = open(os.path.join(out_dir, filename), 'w', newline='', encoding='utf-8')
+            writer = csv.writer(f)
+            writer.writerow(header)
+            self._files.append(f)
+            self._writers[name] = writer
+        self._seen = set()
+
+    def _node(self, label, node_id, *properties):
+        if (label, node_id) not in self._seen:
+            self._seen.add((label, node_id))
+            self._writers[label].writerow([node_id, *properties])
+        return node_id
+
+    def _relationship(self, rel_type, start_id, end_id):
+        if (rel_type, start_id, end_id) not in self._seen:
+            self._seen.add((rel_type, start_id, end_id))
+            self._writers[rel_type].writerow([start_id, end_id])
+
+    def write_row(self, row: dict):
+        """ adds the nodes and relationships of one author row """
+        affiliations = _split(row.get('Author Affiliations', ''), '; ')
+        emails = _split(row.get('Author E-Mail', ''), ', ')
+        url, name = row.get('URL', ''), row.get('Author name', '')
+
+        paper_id = self._node('Paper', stable_id('Paper', url), row.get('Paper title', ''), url, row.get('Paper Wikidata ID', ''),
+                              row.get('Volume') or '')
+        proceeding_id = self._node('Proceeding', stable_id('Proceeding', row.get('Proceedings', '')), row.get('Proceedings', ''))
+        event_id = self._node('Event', stable_id('Event', row.get('Event', '')), row.get('Event', ''))
+        if not name:
+            return
+        # as in create_neo4j_graph, authors keep the properties of their first occurrence
+        if self.author_index is not None:
+            author_id = self.author_index.resolve(name, emails, affiliations, orcid=row.get('ORCID') or None)
+        else:
+            author_id = stable_id('Author', name)
+        author_id = self._node('Author', author_id, name, ARRAY_DELIMITER.join(emails), ARRAY_DELIMITER.join(affiliations),
+                               row.get('ORCID', ''), row.get('Author Wikidata ID', ''))
+        self._relationship('AUTHORED', author_id, paper_id)
+        self._relationship('PRESENTED_AT', author_id, proceeding_id)
+        self._relationship('PARTICIPATED_IN', author_id, event_id)
+        # one node per institution, authors without affiliation are not linked to an empty affiliation node
+        for affiliation in affiliations:
+            if self.affiliation_dictionary is not None:
+                affiliation_id, affiliation = self.affiliation_dictionary.canonicalize(affiliation)
+            else:
+                affiliation_id = stable_id('affiliation', affiliation)
+            self._relationship('AFFILIATED_WITH', author_id, self._node('affiliation', affiliation_id, affiliation))
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def export_import_files(rows: Iterable[dict], out_dir: str, author_index=None, affiliation_dictionary=None) -> str:
+    """
+    writes the neo4j-admin import files for the given rows to out_dir and returns the import command
+
+    rows: author rows as written by the output sinks of parse_volumes
+    out_dir: directory mounted as the import directory of the neo4j container (./neo4j/import in docker-compose)
+    author_index: optional AuthorIndex resolving the author ids
+    affiliation_dictionary: optional AffiliationDictionary mapping affiliations to canonical institutions
+    """
+    with Neo4jImportWriter(out_dir, author_index, affiliation_dictionary) as writer:
+        for row in rows:
+            writer.write_row(row)
+    return import_command()
+
+
+def import_command(import_dir: str = '/var/lib/neo4j/import', database: str = 'neo4j') -> str:
+    """ returns the neo4j-admin command that loads the exported files into an empty (stopped) database """
+    args = ['neo4j-admin', 'database', 'import', 'full', database, '--overwrite-destination',
+            f'--array-delimiter="{ARRAY_DELIMITER}"']
+    args += [f'--nodes={label}={import_dir}/{filename}' for label, (filename, _) in NODE_FILES.items()]
+    args += [f'--relationships={rel_type}={import_dir}/{filename}' for rel_type, (filename, _) in RELATIONSHIP_FILES.items()]
+    return ' '.join(args)
+
+
+if __name__ == "__main__":
+    # Usage: python -m paper_semantification.knowledge_graph.bulk_import <rows.jsonl | parquet dir> [out_dir]
+    from paper_semantification import AUTHOR_INDEX_PATH, AFFILIATION_DICTIONARY_PATH
+    from paper_semantification.knowledge_graph.affiliations import AffiliationDictionary
+    from paper_semantification.knowledge_graph.author_index import AuthorIndex
+    from paper_semantification.sink import JsonlSink, ParquetSink
+
+    source = sys.argv[1]
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else 'neo4j/import'
+    sink = ParquetSink(source) if os.path.isdir(source) else JsonlSink(source)
+    author_index = AuthorIndex(AUTHOR_INDEX_PATH)
+    affiliation_dictionary = AffiliationDictionary(AFFILIATION_DICTIONARY_PATH)
+    command = export_import_files(sink.iter_rows(), out_dir, author_index, affiliation_dictionary)
+    author_index.save()
+    affiliation_dictionary.save()
+    print("Import files written to", out_dir)
+    print("Stop the neo4j service and run:")
+    print(f"docker-compose run --rm neo4j {command}")
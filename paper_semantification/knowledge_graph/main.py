@@ -1,4 +1,10 @@
-from neo4j import GraphDatabase
+import threading
+
+from paper_semantification.startup import lazy_import
+
+# the driver is only loaded when the first connection is opened
+neo4j = lazy_import('neo4j')
+_load_lock = threading.Lock()
 
 # Neo4j database connection
 class Neo4jConnection:
@@ -13,11 +19,26 @@ class Neo4jConnection:
             self._driver.close()
 
     def connect(self):
-        self._driver = GraphDatabase.driver(self._uri, auth=(self._user, self._password))
+        with _load_lock:
+            # executes the lazily imported driver in one thread only
+            driver = neo4j.GraphDatabase.driver
+        self._driver = driver(self._uri, auth=(self._user, self._password))
 
     def query(self, query, parameters=None, db=None):
         assert self._driver is not None, "Driver not initialized!"
         session = self._driver.session(database=db) if db is not None else self._driver.session()
         result = list(session.run(query, parameters))
         session.close()
-        return result
\ No newline at end of file
+        return result
+
+    def execute_write(self, work, db=None):
+        """ calls work(tx) in a single write transaction, which is retried as a whole on transient errors """
+        assert self._driver is not None, "Driver not initialized!"
+        with self._driver.session(database=db) as session:
+            return session.execute_write(work)
+
+    def read_query(self, query, parameters=None, db=None):
+        """ runs a read-only query in a read session (routed to a read replica in a cluster) and returns the records as dicts """
+        assert self._driver is not None, "Driver not initialized!"
+        with self._driver.session(database=db, default_access_mode=neo4j.READ_ACCESS) as session:
+            return session.execute_read(lambda tx: tx.run(query, parameters).data())
\ No newline at end of file
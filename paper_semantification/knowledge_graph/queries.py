@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from paper_semantification.knowledge_graph.main import Neo4jConnection
+from paper_semantification.knowledge_graph.utils import create_neo4j_constraints
+from paper_semantification import NEO4J_URI, READ_CACHE_TTL, READ_CACHE_SIZE
+
+# Read queries of the API on the knowledge graph.
+# All queries are parameterized, run in read sessions and start from an indexed property (Paper.volume/url, Author.author_id).
+# Results are paginated with keysets: every page is ordered by a unique property (PagedQuery.order_by) and the next page
+# starts after the last key of the previous one (`next`), so deep pages cost the same as the first one. Pages are cached
+# for a few seconds, which takes repeated lookups of popular papers and authors off the database while the graph is being written.
+
+
+@dataclass(frozen=True)
+class PagedQuery:
+    """
+    read query paginated by a keyset
+
+    cypher: query with an {after} placeholder for the cursor condition, without ORDER BY and LIMIT
+    order_by: unique property the pages are ordered by, the cursor condition compares it to $after
+    key: returned column holding the value of order_by, the cursor of the next page
+    """
+    cypher: str
+    order_by: str
+    key: str
+
+    def build(self, after) -> str:
+        condition = f'AND {self.order_by} > $after' if after is not None else ''
+        return f'{self.cypher.replace("{after}", condition).rstrip()}\nORDER BY {self.order_by} LIMIT $limit\n'
+
+
+PAPERS_BY_VOLUME = PagedQuery("""
+MATCH (p:Paper) WHERE p.volume = $volume {after}
+RETURN p.url AS url, p.title AS title, p.wikidata_id AS wikidata_id
+""", order_by='p.url', key='url')
+
+AUTHORS_OF_PAPER = PagedQuery("""
+MATCH (p:Paper {url: $url})<-[:AUTHORED]-(a:Author) WHERE true {after}
+RETURN a.author_id AS author_id, a.name AS name, a.orcid AS orcid, a.wikidata_id AS wikidata_id
+""", order_by='a.author_id', key='author_id')
+
+PAPERS_BY_AUTHOR = PagedQuery("""
+MATCH (:Author {author_id: $author_id})-[:AUTHORED]->(p:Paper) WHERE true {after}
+RETURN p.url AS url, p.title AS title, p.volume AS volume, p.wikidata_id AS wikidata_id
+""", order_by='p.url', key='url')
+
+COAUTHORS = PagedQuery("""
+MATCH (a:Author {author_id: $author_id})-[:AUTHORED]->(:Paper)<-[:AUTHORED]-(c:Author) WHERE c <> a {after}
+WITH c, count(*) AS papers
+RETURN c.author_id AS author_id, c.name AS name, papers
+""", order_by='c.author_id', key='author_id')
+
+AFFILIATIONS = PagedQuery("""
+MATCH (:Author {author_id: $author_id})-[:AFFILIATED_WITH]->(aff:affiliation) WHERE true {after}
+RETURN aff.affiliation_id AS affiliation_id, aff.affiliation AS affiliation
+""", order_by='aff.affiliation_id', key='affiliation_id')
+
+
+class TTLCache:
+    """ thread-safe cache whose entries expire after `ttl` seconds, the least recently used entries are evicted beyond `max_entries` """
+    def __init__(self, ttl: float = READ_CACHE_TTL, max_entries: int = READ_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class GraphReader:
+    """
+    Paginated and cached read queries on the knowledge graph, shared by all requests of the service
+
+    uri: bolt or neo4j URI of the database (neo4j:// routes the read sessions to the read replicas of a cluster)
+    cache: cache of the result pages, caching is disabled if ttl is 0
+    """
+    def __init__(self, uri: str = NEO4J_URI, cache: Optional[TTLCache] = None):
+        self.connection = Neo4jConnection(uri=uri)
+        self.cache = cache if cache is not None else TTLCache()
+        self._lock = threading.Lock()
+        self._connected = False
+
+    def _connect(self):
+        with self._lock:
+            if not self._connected:
+                # one driver with its connection pool for all requests
+                self.connection.connect()
+                try:
+                    create_neo4j_constraints(self.connection)
+                except Exception as e:
+                    print(f"Indexes could not be created: {e!r}")
+                self._connected = True
+
+    def page(self, query: PagedQuery, after, limit: int, **parameters) -> dict:
+        """
+        returns {'items': [...], 'next': cursor of the next page or None} of a query
+
+        after: cursor returned with the previous page, None for the first page
+        """
+        cache_key = (query, after, limit, tuple(sorted(parameters.items())))
+        if self.cache.ttl > 0:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        self._connect()
+        items = self.connection.read_query(query.build(after), {**parameters, 'after': after, 'limit': limit})
+        result = {'items': items, 'next': items[-1][query.key] if len(items) == limit else None}
+        if self.cache.ttl > 0:
+            self.cache.put(cache_key, result)
+        return result
+
+    def papers_by_volume(self, volume: int, after: Optional[str] = None, limit: int = 50) -> dict:
+        return self.page(PAPERS_BY_VOLUME, after, limit, volume=int(volume))
+
+    def authors_of_paper(self, url: str, after: Optional[str] = None, limit: int = 50) -> dict:
+        return self.page(AUTHORS_OF_PAPER, after, limit, url=url)
+
+    def papers_by_author(self, author_id: str, after: Optional[str] = None, limit: int = 50) -> dict:
+        return self.page(PAPERS_BY_AUTHOR, after, limit, author_id=author_id)
+
+    def coauthors(self, author_id: str, after: Optional[str] = None, limit: int = 50) -> dict:
+        return self.page(COAUTHORS, after, limit, author_id=author_id)
+
+    def affiliations(self, author_id: str, after: Optional[str] = None, limit: int = 50) -> dict:
+        return self.page(AFFILIATIONS, after, limit, author_id=author_id)
+
+    def close(self):
+        self.connection.close()
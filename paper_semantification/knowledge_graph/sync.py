@@ -0,0 +1,214 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set, Tuple
+
+# Delta synchronization of the subgraph of a paper.
+# Instead of merging everything again (which never removes anything), the newly extracted state of a paper is compared
+# with the state stored in the graph, and only the differences are written, in one transaction:
+#   - papers whose content hash did not change are not touched at all
+#   - authors that are no longer listed lose their AUTHORED edge (and are deleted if they have no other paper)
+#   - AFFILIATED_WITH, PRESENTED_AT and PARTICIPATED_IN edges are shared by all papers of an author, so they record the
+#     URLs of the papers they come from (`papers`). An edge is removed once no paper lists it anymore.
+#   - the emails and affiliation strings of an author differ between papers, each paper stores its own on its AUTHORED edge.
+#     The Author node holds the union over all papers of the author.
+# Every change of a paper increases its `version` and stores the new `content_hash`.
+
+# relationship type -> (label, key property) of the node the relationship points to
+PROVENANCE_EDGES = {
+    'AFFILIATED_WITH': ('affiliation', 'affiliation_id'),
+    'PRESENTED_AT': ('Proceeding', 'proceeding'),
+    'PARTICIPATED_IN': ('Event', 'event'),
+}
+# properties that are only set when a value is known (disambiguation ids are kept if a later lookup fails)
+KEEP_IF_MISSING = {'orcid', 'wikidata_id'}
+
+
+def empty_state() -> dict:
+    return {'paper': {}, 'authors': {}, 'edges': {rel_type: set() for rel_type in PROVENANCE_EDGES}, 'affiliations': {}}
+
+
+def build_state(title: str, proceeding: str, event: str, authors, wikidata_id: Optional[str] = None,
+                volume: Optional[int] = None) -> dict:
+    """
+    returns the state of the subgraph of a paper
+
+    authors: list of (author_id, Author, institutions) with the canonical institutions [{'id', 'name'}] of the author
+    """
+    state = empty_state()
+    state['paper'] = {'title': title, 'wikidata_id': wikidata_id or None, 'volume': int(volume) if volume else None}
+    for author_id, author, institutions in authors:
+        state['authors'][author_id] = {'name': author.name, 'email': list(author.email), 'affiliation': list(author.affiliation),
+                                       'orcid': author.orcid or None, 'wikidata_id': author.wikidata_id or None}
+        state['edges']['PRESENTED_AT'].add((author_id, proceeding))
+        state['edges']['PARTICIPATED_IN'].add((author_id, event))
+        for institution in institutions:
+            state['edges']['AFFILIATED_WITH'].add((author_id, institution['id']))
+            state['affiliations'][institution['id']] = institution['name']
+    return state
+
+
+def content_hash(state: dict) -> str:
+    def default(value):
+        return sorted(value)
+    return hashlib.sha1(json.dumps(state, sort_keys=True, ensure_ascii=False, default=default).encode('utf-8')).hexdigest()
+
+
+def _as_list(value):
+    if value is None or value == '':
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _changed(current: dict, desired: dict) -> dict:
+    """ returns the properties of desired that differ from current """
+    changes = {}
+    for key, value in desired.items():
+        if key in KEEP_IF_MISSING and value is None:
+            continue
+        if current.get(key) != value:
+            changes[key] = value
+    return changes
+
+
+@dataclass
+class SyncPlan:
+    """ minimal changes that turn the stored subgraph of a paper into the extracted one """
+    paper: dict = field(default_factory=dict)
+    upsert_authors: Dict[str, dict] = field(default_factory=dict)
+    add_authored: Set[str] = field(default_factory=set)
+    remove_authored: Set[str] = field(default_factory=set)
+    add_edges: Dict[str, Set[Tuple[str, str]]] = field(default_factory=dict)
+    remove_edges: Dict[str, Set[Tuple[str, str]]] = field(default_factory=dict)
+    affiliations: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.paper or self.upsert_authors or self.add_authored or self.remove_authored
+                    or any(self.add_edges.values()) or any(self.remove_edges.values()))
+
+
+def diff_states(current: dict, desired: dict) -> SyncPlan:
+    plan = SyncPlan()
+    plan.paper = _changed(current['paper'], desired['paper'])
+    current_authors, desired_authors = current['authors'], desired['authors']
+    plan.add_authored = set(desired_authors) - set(current_authors)
+    plan.remove_authored = set(current_authors) - set(desired_authors)
+    for author_id, properties in desired_authors.items():
+        changes = _changed(current_authors.get(author_id, {}), properties)
+        if author_id in plan.add_authored or changes:
+            plan.upsert_authors[author_id] = properties
+    for rel_type in PROVENANCE_EDGES:
+        plan.add_edges[rel_type] = desired['edges'][rel_type] - current['edges'][rel_type]
+        plan.remove_edges[rel_type] = current['edges'][rel_type] - desired['edges'][rel_type]
+    plan.affiliations = {affiliation_id: desired['affiliations'][affiliation_id]
+                         for _, affiliation_id in plan.add_edges['AFFILIATED_WITH']}
+    return plan
+
+
+def read_state(tx, url: str) -> dict:
+    """ returns the stored state of the subgraph of a paper """
+    state = empty_state()
+    record = tx.run("MATCH (p:Paper {url: $url}) RETURN p.title AS title, p.wikidata_id AS wikidata_id, p.volume AS volume LIMIT 1",
+                    url=url).single()
+    if record is None:
+        return state
+    state['paper'] = {'title': record['title'], 'wikidata_id': record['wikidata_id'], 'volume': record['volume']}
+    # graphs written before the delta synchronization only have the values of the Author node
+    for row in tx.run("MATCH (:Paper {url: $url})<-[r:AUTHORED]-(a:Author) RETURN a.author_id AS author_id, a.name AS name, "
+                      "coalesce(r.email, a.email) AS email, coalesce(r.affiliation, a.affiliation) AS affiliation, "
+                      "a.orcid AS orcid, a.wikidata_id AS wikidata_id", url=url):
+        state['authors'][row['author_id']] = {'name': row['name'], 'email': _as_list(row['email']),
+                                              'affiliation': _as_list(row['affiliation']), 'orcid': row['orcid'],
+                                              'wikidata_id': row['wikidata_id']}
+    # only the edges this paper contributed to, edges of the other papers of the authors are left alone
+    for row in tx.run("MATCH (:Paper {url: $url})<-[:AUTHORED]-(a:Author)-[r:AFFILIATED_WITH|PRESENTED_AT|PARTICIPATED_IN]->(n) "
+                      "WHERE $url IN coalesce(r.papers, []) "
+                      "RETURN a.author_id AS author_id, type(r) AS rel_type, coalesce(n.affiliation_id, n.proceeding, n.event) AS key",
+                      url=url):
+        state['edges'][row['rel_type']].add((row['author_id'], row['key']))
+    return state
+
+
+@dataclass
+class SyncResult:
+    url: str
+    changed: bool
+    version: Optional[int] = None
+    plan: Optional[SyncPlan] = None
+
+
+def apply_plan(tx, url: str, plan: SyncPlan):
+    """ writes the changes of a plan, all statements are batched with UNWIND """
+    tx.run("MERGE (p:Paper {url: $url}) SET p += $properties", url=url, properties=plan.paper)
+    if plan.upsert_authors:
+        # new authors are always upserted, so this also creates the AUTHORED edges of plan.add_authored
+        tx.run("""
+               UNWIND $authors AS row
+               MERGE (a:Author {author_id: row.author_id})
+               SET a.name = row.name, a.orcid = coalesce(row.orcid, a.orcid), a.wikidata_id = coalesce(row.wikidata_id, a.wikidata_id)
+               WITH a, row
+               MATCH (p:Paper {url: $url})
+               MERGE (a)-[r:AUTHORED]->(p)
+               SET r.email = row.email, r.affiliation = row.affiliation
+               """, url=url, authors=[{'author_id': author_id, **properties} for author_id, properties in sorted(plan.upsert_authors.items())])
+    for rel_type, (label, key) in PROVENANCE_EDGES.items():
+        if plan.add_edges.get(rel_type):
+            on_create = "ON CREATE SET n.affiliation = row.name" if rel_type == 'AFFILIATED_WITH' else ""
+            tx.run(f"""
+                   UNWIND $rows AS row
+                   MATCH (a:Author {{author_id: row.author_id}})
+                   MERGE (n:{label} {{{key}: row.key}}) {on_create}
+                   MERGE (a)-[r:{rel_type}]->(n)
+                   SET r.papers = [u IN coalesce(r.papers, []) WHERE u <> $url] + $url
+                   """, url=url, rows=[{'author_id': author_id, 'key': node_key, 'name': plan.affiliations.get(node_key)}
+                                       for author_id, node_key in sorted(plan.add_edges[rel_type])])
+        if plan.remove_edges.get(rel_type):
+            tx.run(f"""
+                   UNWIND $rows AS row
+                   MATCH (a:Author {{author_id: row.author_id}})-[r:{rel_type}]->(n:{label} {{{key}: row.key}})
+                   SET r.papers = [u IN coalesce(r.papers, []) WHERE u <> $url]
+                   WITH r, n WHERE size(r.papers) = 0
+                   DELETE r
+                   WITH DISTINCT n WHERE NOT (n)--()
+                   DELETE n
+                   """, url=url, rows=[{'author_id': author_id, 'key': node_key}
+                                       for author_id, node_key in sorted(plan.remove_edges[rel_type])])
+    if plan.remove_authored:
+        # authors without any other paper are removed with their remaining edges
+        tx.run("""
+               UNWIND $ids AS id
+               MATCH (a:Author {author_id: id})-[r:AUTHORED]->(:Paper {url: $url})
+               DELETE r
+               WITH DISTINCT a WHERE NOT (a)-[:AUTHORED]->()
+               DETACH DELETE a
+               """, ids=sorted(plan.remove_authored), url=url)
+    merged = set(plan.upsert_authors) | plan.remove_authored
+    if merged:
+        # the Author nodes hold the emails and affiliations of all their papers
+        tx.run("""
+               UNWIND $ids AS id
+               MATCH (a:Author {author_id: id})-[r:AUTHORED]->()
+               WITH a, collect(r) AS edges
+               SET a.email = reduce(result = [], value IN reduce(values = [], r IN edges | values + coalesce(r.email, []))
+                                    | CASE WHEN value IN result THEN result ELSE result + value END),
+                   a.affiliation = reduce(result = [], value IN reduce(values = [], r IN edges | values + coalesce(r.affiliation, []))
+                                          | CASE WHEN value IN result THEN result ELSE result + value END)
+               """, ids=sorted(merged))
+
+
+def sync_paper(tx, url: str, state: dict) -> SyncResult:
+    """ brings the subgraph of the paper with the given URL to `state` (see build_state) within the transaction tx """
+    new_hash = content_hash(state)
+    record = tx.run("MATCH (p:Paper {url: $url}) RETURN p.content_hash AS content_hash LIMIT 1", url=url).single()
+    if record is not None and record['content_hash'] == new_hash:
+        return SyncResult(url=url, changed=False)
+    plan = diff_states(read_state(tx, url), state)
+    if plan.empty:
+        # e.g. a graph written before the delta synchronization, only the hash is missing
+        tx.run("MATCH (p:Paper {url: $url}) SET p.content_hash = $hash", url=url, hash=new_hash)
+        return SyncResult(url=url, changed=False, plan=plan)
+    apply_plan(tx, url, plan)
+    version = tx.run("MATCH (p:Paper {url: $url}) SET p.content_hash = $hash, p.version = coalesce(p.version, 0) + 1, "
+                     "p.synced_at = datetime() RETURN p.version AS version", url=url, hash=new_hash).single()['version']
+    return SyncResult(url=url, changed=True, version=version, plan=plan)
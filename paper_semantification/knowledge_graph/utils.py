@@ -1,17 +1,32 @@
 from paper_semantification.knowledge_graph.main import Neo4jConnection
+from paper_semantification.knowledge_graph.bulk_import import stable_id
+from paper_semantification.knowledge_graph.affiliations import canonical_affiliations
+from paper_semantification.knowledge_graph.sync import SyncResult, build_state, sync_paper
 from paper_semantification import NEO4J_URI
 
 # Parameters name
 # Proceeding: proceeding, Event: event, URL: url
-# Paper: title
-# Author: name, email
-# Affiliation: affiliation
-def create_neo4j_graph(author_list, title, proceeding, event, neo4j_connection, url):
+# Paper: title, wikidata_id, volume
+# Author: author_id, name, email, orcid, wikidata_id
+# Affiliation: affiliation_id, affiliation
+# AUTHORED (delta synchronization, see sync.py): email, affiliation of the author as listed by the paper
+def create_neo4j_graph(author_list, title, proceeding, event, neo4j_connection, url, author_index = None, wikidata_id = None,
+                       affiliation_dictionary = None, volume = None):
+    """
+    volume: CEUR-WS volume the paper was published in
+    author_index: AuthorIndex that resolves the persistent author ids Author nodes are merged on.
+                  Without an index, the id is derived from the author name.
+    wikidata_id: Wikidata id of the paper, if it was disambiguated
+    affiliation_dictionary: AffiliationDictionary mapping the affiliations to the canonical institutions affiliation nodes are merged on.
+                            Without a dictionary, every distinct affiliation string becomes a node.
+    """
     neo4j_connection.connect()
     
     # Create Paper nodes
-    create_paper_query = "MERGE (p:Paper {title: $title, url: $url})"
-    neo4j_connection.query(create_paper_query, {"title": title, "url": url})  # Replace with actual URL
+    create_paper_query = ("MERGE (p:Paper {title: $title, url: $url}) "
+                          "SET p.wikidata_id = coalesce($wikidata_id, p.wikidata_id), p.volume = coalesce($volume, p.volume)")
+    neo4j_connection.query(create_paper_query, {"title": title, "url": url, "wikidata_id": wikidata_id or None,
+                                                "volume": int(volume) if volume else None})
 
     # Create Proceeding nodes
     create_proceeding_query = "MERGE (pr:Proceeding {proceeding: $proceeding})"
@@ -23,32 +38,71 @@ def create_neo4j_graph(author_list, title, proceeding, event, neo4j_connection,
 
     # Create Author nodes
     for author in author_list:
+        author_id = resolve_author_id(author, author_index)
         # Create Author nodes
         create_author_query = """
-                            MERGE (a:Author{name:$name})
-                            ON CREATE SET a.email = $email, a.affiliation = $affiliation
-                            MERGE (aff:affiliation{affiliation:$affiliation})
+                            MERGE (a:Author{author_id:$author_id})
+                            ON CREATE SET a.name = $name, a.email = $email, a.affiliation = $affiliation
+                            SET a.orcid = coalesce($orcid, a.orcid), a.wikidata_id = coalesce($wikidata_id, a.wikidata_id)
+                            WITH a
+                            UNWIND $institutions AS institution
+                            MERGE (aff:affiliation{affiliation_id:institution.id})
+                            ON CREATE SET aff.affiliation = institution.name
                             MERGE (a)-[:AFFILIATED_WITH]->(aff)
 
                             """
-        neo4j_connection.query(create_author_query, {"name": author.name, "email": author.email or "", "affiliation": author.affiliation or ""})  
+        neo4j_connection.query(create_author_query, {"author_id": author_id, "name": author.name, "email": list(author.email) or "", "affiliation": list(author.affiliation) or "",
+                                                     "orcid": author.orcid, "wikidata_id": author.wikidata_id,
+                                                     "institutions": canonical_affiliations(author.affiliation, affiliation_dictionary)})  
     
         # Create relationships between Authors and Papers
-        create_author_paper_query = "MATCH (a:Author {name: $name}), (p:Paper {title: $title}) MERGE (a)-[:AUTHORED]->(p)"
-        neo4j_connection.query(create_author_paper_query, {"name": author.name, "title": title})
+        create_author_paper_query = "MATCH (a:Author {author_id: $author_id}), (p:Paper {title: $title}) MERGE (a)-[:AUTHORED]->(p)"
+        neo4j_connection.query(create_author_paper_query, {"author_id": author_id, "title": title})
 
         # Create relationships between Authors and Proceedings
-        create_author_proceeding_query = "MATCH (a:Author {name: $name}), (pr:Proceeding {proceeding: $proceeding}) MERGE (a)-[:PRESENTED_AT]->(pr)"
-        neo4j_connection.query(create_author_proceeding_query, {"name": author.name, "proceeding": proceeding})
+        create_author_proceeding_query = "MATCH (a:Author {author_id: $author_id}), (pr:Proceeding {proceeding: $proceeding}) MERGE (a)-[:PRESENTED_AT]->(pr)"
+        neo4j_connection.query(create_author_proceeding_query, {"author_id": author_id, "proceeding": proceeding})
 
         # Create relationships between Authors and Events
-        create_author_event_query = "MATCH (a:Author {name: $name}), (e:Event {event: $event}) MERGE (a)-[:PARTICIPATED_IN]->(e)"
-        neo4j_connection.query(create_author_event_query, {"name": author.name, "event": event})
+        create_author_event_query = "MATCH (a:Author {author_id: $author_id}), (e:Event {event: $event}) MERGE (a)-[:PARTICIPATED_IN]->(e)"
+        neo4j_connection.query(create_author_event_query, {"author_id": author_id, "event": event})
 
      
     neo4j_connection.close()
 
 
+def resolve_author_id(author, author_index = None) -> str:
+    """ persistent id of an author, without an AuthorIndex the id is derived from the author name """
+    if author_index is not None:
+        return author_index.resolve(author.name, author.email, author.affiliation, orcid=author.orcid)
+    return stable_id('Author', author.name)
+
+
+def sync_neo4j_graph(author_list, title, proceeding, event, neo4j_connection, url, author_index = None, wikidata_id = None,
+                     affiliation_dictionary = None, volume = None) -> SyncResult:
+    """
+    Same graph as create_neo4j_graph, but the subgraph of the paper is brought up to date with delta synchronization
+    (see knowledge_graph/sync.py): only the changes are written in one transaction, and authors, affiliations, proceedings
+    and events that the paper no longer lists are removed. The connection has to be connected and stays open.
+    """
+    authors = [(resolve_author_id(author, author_index), author, canonical_affiliations(author.affiliation, affiliation_dictionary))
+               for author in author_list]
+    state = build_state(title, proceeding, event, authors, wikidata_id=wikidata_id, volume=volume)
+    return neo4j_connection.execute_write(lambda tx: sync_paper(tx, url, state))
+
+
+def create_neo4j_constraints(neo4j_connection):
+    """
+    unique constraints (and indexes) on the ids the Author and affiliation nodes are merged on,
+    and indexes on the Paper properties that papers are merged and looked up by
+    """
+    neo4j_connection.query("CREATE CONSTRAINT author_id IF NOT EXISTS FOR (a:Author) REQUIRE a.author_id IS UNIQUE")
+    neo4j_connection.query("CREATE CONSTRAINT affiliation_id IF NOT EXISTS FOR (aff:affiliation) REQUIRE aff.affiliation_id IS UNIQUE")
+    neo4j_connection.query("CREATE INDEX paper_url IF NOT EXISTS FOR (p:Paper) ON (p.url)")
+    neo4j_connection.query("CREATE INDEX paper_title IF NOT EXISTS FOR (p:Paper) ON (p.title)")
+    neo4j_connection.query("CREATE INDEX paper_volume IF NOT EXISTS FOR (p:Paper) ON (p.volume, p.url)")
+
+
 
 
 
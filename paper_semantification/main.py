@@ -1,17 +1,43 @@
-from fastapi import FastAPI, Query
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from paper_semantification import WARM_UP
 from paper_semantification.knowledge_graph.utils import delete_neo4j_graph
-from paper_semantification.parser import parse_volumes, process_single_paper
-from typing import List
+from paper_semantification.knowledge_graph.queries import GraphReader
+from paper_semantification.parser import parse_volumes, process_single_paper, warm_up
+from paper_semantification.result_cache import ResultCache, etag_matches
+from typing import List, Optional
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load the shared components before serving, so that the latency of the first request is predictable
+    if WARM_UP:
+        await asyncio.to_thread(warm_up)
+    yield
+    graph_reader.close()
+
+
+app = FastAPI(lifespan=lifespan)
+# extracted metadata of single papers, keyed by (volume_id, paper_id, pipeline version)
+result_cache = ResultCache()
+# read queries on the knowledge graph, sharing one driver and a short-lived cache of the result pages
+graph_reader = GraphReader()
+
+
+def extract_single_paper(volume_id: int, paper_id: int) -> dict:
+    paper_metadata = process_single_paper(volume_id=str(volume_id), paper_key=f"paper{str(paper_id)}")
+    return {"paper_path": paper_metadata[0], "paper_title": paper_metadata[1], "name": paper_metadata[2], "affiliation": paper_metadata[3], "email": paper_metadata[4], "proceeding": paper_metadata[5], "event": paper_metadata[6], "errors": paper_metadata[7]}
 
 # Endpoint to extract metadata from a single paper
 @app.get("/metadata/single_paper")
-async def get_single_paper_metadata(volume_id: int = Query(..., description="Volume ID"),
+async def get_single_paper_metadata(request: Request, response: Response,
+                                    volume_id: int = Query(..., description="Volume ID"),
                                     paper_id: int = Query(..., description="Paper ID")):
     """
-    Extracts metadata from a single paper.
+    Extracts metadata from a single paper. Results are cached, repeated requests with
+    If-None-Match set to the returned ETag are answered with 304 Not Modified.
+    If external services failed, `errors` lists the failures (502 if nothing could be extracted).
 
     Parameters:
     - volume_id (int): ID of the volume.
@@ -20,9 +46,36 @@ async def get_single_paper_metadata(volume_id: int = Query(..., description="Vol
     Returns:
     - dict: Metadata of the paper.
     """
-    paper_metadata = process_single_paper(volume_id=str(volume_id), paper_key=f"paper{str(paper_id)}")
-    return {"paper_path": paper_metadata[0], "paper_title": paper_metadata[1], "name": paper_metadata[2], "affiliation": paper_metadata[3], "email": paper_metadata[4], "proceeding": paper_metadata[5], "event": paper_metadata[6]}
-    # return **paper_metadata
+    entry = result_cache.get(volume_id, paper_id)
+    if entry is None:
+        # the extraction blocks, run it outside of the event loop
+        payload = await asyncio.to_thread(extract_single_paper, volume_id, paper_id)
+        if payload["errors"]:
+            # results affected by failures of external services are not cached
+            if not payload["paper_title"] and not payload["name"]:
+                raise HTTPException(status_code=502, detail=payload["errors"])
+            return payload
+        entry = result_cache.put(volume_id, paper_id, payload)
+    if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers={"ETag": entry["etag"]})
+    response.headers["ETag"] = entry["etag"]
+    return entry["payload"]
+
+
+# Endpoint to invalidate cached results of single papers
+@app.delete("/metadata/cache")
+async def invalidate_cache(volume_id: Optional[int] = Query(None, description="Volume ID (default: all volumes)"),
+                           paper_id: Optional[int] = Query(None, description="Paper ID (default: all papers of the volume)")):
+    """
+    Removes cached results of /metadata/single_paper, e.g. after a paper was corrected.
+    `paper_id` can only be given together with `volume_id` (422 otherwise).
+
+    Returns:
+    - dict: Number of removed entries.
+    """
+    if paper_id is not None and volume_id is None:
+        raise HTTPException(status_code=422, detail="paper_id requires volume_id")
+    return {"invalidated": result_cache.invalidate(volume_id, paper_id)}
 
 # Endpoint to extract metadata from all papers in a given volume
 @app.get("/metadata/volumes")
@@ -43,6 +96,54 @@ async def get_all_papers_metadata(volumes_ids: List[int] = Query([], description
     return all_papers_metadata
 
 
+# Endpoints to query the knowledge graph.
+# The results are paginated: pass the returned `next` as `after` to get the next page (`next` is null on the last page).
+@app.get("/graph/volumes/{volume_id}/papers")
+async def get_volume_papers(volume_id: int, after: Optional[str] = Query(None, description="Cursor of the next page"),
+                            limit: int = Query(50, ge=1, le=500, description="Page size")):
+    """
+    Returns the papers of a volume, ordered by their URL.
+    """
+    return await asyncio.to_thread(graph_reader.papers_by_volume, volume_id, after, limit)
+
+
+@app.get("/graph/papers/authors")
+async def get_paper_authors(url: str = Query(..., description="URL of the paper PDF"),
+                            after: Optional[str] = Query(None, description="Cursor of the next page"),
+                            limit: int = Query(50, ge=1, le=500, description="Page size")):
+    """
+    Returns the authors of a paper, ordered by their author ID.
+    """
+    return await asyncio.to_thread(graph_reader.authors_of_paper, url, after, limit)
+
+
+@app.get("/graph/authors/{author_id}/papers")
+async def get_author_papers(author_id: str, after: Optional[str] = Query(None, description="Cursor of the next page"),
+                            limit: int = Query(50, ge=1, le=500, description="Page size")):
+    """
+    Returns the papers of an author, ordered by their URL.
+    """
+    return await asyncio.to_thread(graph_reader.papers_by_author, author_id, after, limit)
+
+
+@app.get("/graph/authors/{author_id}/coauthors")
+async def get_author_coauthors(author_id: str, after: Optional[str] = Query(None, description="Cursor of the next page"),
+                               limit: int = Query(50, ge=1, le=500, description="Page size")):
+    """
+    Returns the co-authors of an author with the number of shared papers, ordered by their author ID.
+    """
+    return await asyncio.to_thread(graph_reader.coauthors, author_id, after, limit)
+
+
+@app.get("/graph/authors/{author_id}/affiliations")
+async def get_author_affiliations(author_id: str, after: Optional[str] = Query(None, description="Cursor of the next page"),
+                                  limit: int = Query(50, ge=1, le=500, description="Page size")):
+    """
+    Returns the affiliations of an author, ordered by their affiliation ID.
+    """
+    return await asyncio.to_thread(graph_reader.affiliations, author_id, after, limit)
+
+
 # Endpoint to delete the knowledge graph from the neo4j database
 @app.delete("/delete_graph")
 async def delete_knowledge_graph():
@@ -54,6 +155,7 @@ async def delete_knowledge_graph():
     """
     # Execute neo4j query that deletes all nodes and relationships
     delete_neo4j_graph()
+    graph_reader.cache.clear()
     return "Knowledge graph deleted successfully!"
 
 if __name__ == "__main__":
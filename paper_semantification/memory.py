@@ -0,0 +1,66 @@
+import gc
+import multiprocessing
+import os
+import resource
+import sys
+
+from paper_semantification import MEMORY_LIMIT_MB
+
+# Memory accounting of long batch runs: the current and peak resident set size (RSS) of the process and its workers,
+# and a guard that tells the pipeline to stop fetching ahead while the process and its workers are above the memory ceiling.
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """ peak RSS of this process, or of its largest terminated child process (e.g. the parsing workers) """
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return usage.ru_maxrss / (1024 * 1024) if sys.platform == 'darwin' else usage.ru_maxrss / 1024
+
+
+def process_rss_mb(pid='self') -> float:
+    """ current RSS of a process from /proc, 0 if it is not available (e.g. the process already exited) """
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def current_rss_mb(children: bool = False) -> float:
+    """
+    current RSS of this process, falls back to the peak RSS where /proc is not available
+
+    children: also count the running child processes started with multiprocessing (e.g. the parsing workers)
+    """
+    rss = process_rss_mb()
+    if not rss:
+        return peak_rss_mb()
+    if children:
+        rss += sum(process_rss_mb(child.pid) for child in multiprocessing.active_children())
+    return rss
+
+
+class MemoryGuard:
+    """
+    Memory ceiling of a run
+
+    limit_mb: RSS in MB of the process and its parsing workers above which no new work should be started, 0 disables the ceiling
+
+    Fetching is only throttled by the pipeline (--workers > 1). A sequential run processes one volume at a time,
+    there the ceiling only makes the rows be flushed to the sink after the volume.
+    """
+    def __init__(self, limit_mb: int = MEMORY_LIMIT_MB):
+        self.limit_mb = limit_mb
+        self.throttled = 0
+
+    def over_limit(self) -> bool:
+        if not self.limit_mb or current_rss_mb(children=True) <= self.limit_mb:
+            return False
+        # parse trees with reference cycles are only freed by the garbage collector
+        gc.collect()
+        if current_rss_mb(children=True) <= self.limit_mb:
+            return False
+        self.throttled += 1
+        return True
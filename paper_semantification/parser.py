@@ -1,45 +1,105 @@
-import requests as req
+from __future__ import annotations
+
 import re
-import dblp
-from dataclasses import dataclass
-from typing import Optional, List
-from bs4 import BeautifulSoup 
+from dataclasses import dataclass, field
+from functools import lru_cache
+import os
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional, List, Tuple
 import string
-from spellchecker import SpellChecker
-from fuzzywuzzy import fuzz
-import pandas as pd
-import paper_semantification.parser_openai as openai
+from paper_semantification.startup import lazy_import
 from paper_semantification.knowledge_graph.main import Neo4jConnection
-from paper_semantification.knowledge_graph.utils import create_neo4j_graph
-from paper_semantification import NEO4J_URI
-from email_validator import validate_email, EmailNotValidError
-from ftfy import fix_text
-import grobid_tei_xml
+from paper_semantification.knowledge_graph.utils import create_neo4j_graph, create_neo4j_constraints, sync_neo4j_graph
+from paper_semantification.knowledge_graph.author_index import AuthorIndex
+from paper_semantification.knowledge_graph.affiliations import AffiliationDictionary
+from paper_semantification import NEO4J_URI, AUTHOR_INDEX_PATH, AFFILIATION_DICTIONARY_PATH, DISAMBIGUATION_CACHE_PATH
+from paper_semantification.sink import OutputSink, MemorySink
+from paper_semantification.memory import MemoryGuard, peak_rss_mb
+from paper_semantification.concurrency import UpstreamError, call, collect_errors, fetch, report_error
 from xml.etree import ElementTree as ET
-from unidecode import unidecode
 
 import warnings
 warnings.filterwarnings("ignore")
 
-
-@dataclass
+# heavy dependencies only some code paths use are loaded on first use, which keeps the start of the service fast
+pd = lazy_import('pandas')
+dblp = lazy_import('dblp')
+openai = lazy_import('paper_semantification.parser_openai')
+evaluation = lazy_import('paper_semantification.evaluation')
+disambiguation = lazy_import('paper_semantification.disambiguation')
+bs4 = lazy_import('bs4')
+spellchecker = lazy_import('spellchecker')
+fuzz = lazy_import('fuzzywuzzy.fuzz')
+email_validator = lazy_import('email_validator')
+ftfy = lazy_import('ftfy')
+grobid_tei_xml = lazy_import('grobid_tei_xml')
+# executing a lazily imported module from several threads at once is not safe before python 3.12 (see load_lazy_modules)
+_lazy_modules_lock = threading.Lock()
+_lazy_modules_loaded = False
+
+
+def load_lazy_modules():
+    """ executes the lazily imported modules the extraction uses, has to be called before several threads extract papers """
+    global _lazy_modules_loaded
+    with _lazy_modules_lock:
+        if not _lazy_modules_loaded:
+            for module in (pd, dblp, openai, bs4, spellchecker, fuzz, email_validator, ftfy, grobid_tei_xml):
+                # any attribute access executes the module
+                module.__name__
+            _lazy_modules_loaded = True
+
+
+def as_tuple(value) -> Tuple[str, ...]:
+    """
+    the parsers return emails and affiliations as None, string or list - normalize them to a tuple of strings.
+    Nested lists are flattened, other values (e.g. a dict returned by OpenAI) are converted to strings.
+    """
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    if isinstance(value, dict):
+        return (', '.join(str(v) for v in value.values() if v),)
+    if not isinstance(value, (list, tuple, set)):
+        return (str(value),)
+    return tuple(v for item in value for v in as_tuple(item))
+
+
+@dataclass(frozen=True, slots=True)
 class Author:
+    """ immutable and hashable: authors are compared and hashed by name, affiliation and email (see key) """
     name: str
-    affiliation: Optional[List[str]] = None
-    email: Optional[List[str]] = None
-    
-    def __eq__(self, other):
-        if isinstance(other, Author):
-            return self.name == other.name and str(self.email) == str(other.email) and str(self.affiliation) == str(other.affiliation) 
-        return False
+    affiliation: Tuple[str, ...] = ()
+    email: Tuple[str, ...] = ()
+    orcid: Optional[str] = field(default=None, compare=False)
+    wikidata_id: Optional[str] = field(default=None, compare=False)
+
+    def __post_init__(self):
+        if not isinstance(self.name, str):
+            object.__setattr__(self, 'name', ' '.join(as_tuple(self.name)))
+        object.__setattr__(self, 'affiliation', as_tuple(self.affiliation))
+        object.__setattr__(self, 'email', as_tuple(self.email))
+
+    @property
+    def key(self):
+        return (self.name, self.affiliation, self.email)
+
+    def __reduce__(self):
+        # frozen slotted dataclasses cannot be unpickled with the default protocol on all python versions
+        return (Author, (self.name, self.affiliation, self.email, self.orcid, self.wikidata_id))
   
 ### GROBID
 class GrobitFile():
-    def __init__(self, url):
-        response = req.get(url)
-        if response.status_code == 200:
+    def __init__(self, url = None, content: Optional[bytes] = None):
+        """ parses the GROBID TEI XML downloaded from url, or the already downloaded content """
+        if content is None:
+            response = fetch(url)
+            if response.status_code == 200:
+                content = response.content
+        if content:
             # Parse the XML content
-            root = ET.fromstring(response.content)
+            root = ET.fromstring(content)
             xml_content = ET.tostring(root, encoding='unicode')
             self.tei_xml = grobid_tei_xml.parse_document_xml(xml_content)
 
@@ -71,20 +131,37 @@ class GrobitFile():
     
 # ### CERMINE
 class CermineFile():
-    def __init__(self, filename):
-        self.cermine = BeautifulSoup(req.get(filename).text, 'lxml')
+    def __init__(self, filename = None, content: Optional[bytes] = None):
+        """ parses the CERMINE XML downloaded from filename, or the already downloaded content """
+        if content is None:
+            content = fetch(filename).text
+        self.cermine = bs4.BeautifulSoup(content, 'lxml')
         self._title = ''
+        self._authors = None
+
+    def release(self):
+        """ extracts title and authors and frees the parse tree, which otherwise lives as long as this object """
+        if self.cermine is not None:
+            self.title, self.authors
+            # the tree is full of reference cycles, decompose breaks them so it is freed without waiting for the garbage collector
+            self.cermine.decompose()
+            self.cermine = None
 
 
     @property
     def title(self):
-        if not self._title:
+        if not self._title and self.cermine is not None:
             self._title = elem_to_text(self.cermine.find('article-title')).strip()
         return self._title
 
 
     @property
     def authors(self):
+        if self._authors is None:
+            self._authors = self._parse_authors() if self.cermine is not None else []
+        return self._authors
+
+    def _parse_authors(self):
         try:
             authors_in_header = self.cermine.find('article-meta').find('contrib-group').findAll('contrib')
         except:
@@ -157,8 +234,8 @@ class CermineFile():
                         affiliations += [(', ').join(affl)]
             
             # Put the strings through fix_text in order to solve potential encoding/decoding problems (e.g with german umlauts)
-            name = fix_text(name)
-            affiliations = [fix_text(aff_name) for aff_name in affiliations]
+            name = ftfy.fix_text(name)
+            affiliations = [ftfy.fix_text(aff_name) for aff_name in affiliations]
             
             author = Author(name, affiliations, email)
             result.append(author)
@@ -215,9 +292,36 @@ def strip_space_and_special_chars(text):
         else:
             res_text = cur_text
            
+@lru_cache(maxsize=None)
+def get_spell_checker():
+    """ loading the dictionary is expensive, so one SpellChecker is shared by the process """
+    return spellchecker.SpellChecker()
+
+@lru_cache(maxsize=1024)
+def _dblp_search(title: str):
+    return call('dblp.org', dblp.search, [title])
+
+def dblp_search(title: str):
+    """
+    searches a title on dblp, memoized because the same titles are searched several times per paper.
+    dblp is only used as a cross-check, if it is not available the error is reported for the paper and no result is returned
+    """
+    try:
+        return _dblp_search(title)
+    except UpstreamError as e:
+        report_error('dblp', e)
+        return pd.DataFrame()
+    except Exception as e:
+        # e.g. a response the dblp client cannot parse, which is no failure of the host and not retried
+        print(f"dblp search failed for {title!r}: {e!r}")
+        return pd.DataFrame()
+
 def spell_check_correct(text):
-    spell = SpellChecker()
-    corrected_words = [spell.correction(word) if spell.correction(word) is not None else word for word in text.split()]
+    spell = get_spell_checker()
+    corrected_words = []
+    for word in text.split():
+        correction = spell.correction(word)
+        corrected_words.append(correction if correction is not None else word)
     corrected_sentence = ' '.join(corrected_words)
     return corrected_sentence
 
@@ -263,12 +367,12 @@ def check_email(email_adrs):
     """
     try: 
         for email in email_adrs:
-            validate_email(email) 
+            email_validator.validate_email(email) 
         if email_adrs!= []:
             return True    
         else:
             return False
-    except EmailNotValidError: 
+    except email_validator.EmailNotValidError: 
         return False
 
 def get_paper_title(title1: str, title2: str, pdf_path: str) -> str:
@@ -282,10 +386,10 @@ def get_paper_title(title1: str, title2: str, pdf_path: str) -> str:
             return title1
         # use dblp for cross check
         dblp_result = pd.DataFrame() 
-        if not dblp.search([title1]).empty:
-            dblp_result = dblp.search([title1])
-        elif not dblp.search([title2]).empty:
-            dblp_result = dblp.search([title2])
+        if not dblp_search(title1).empty:
+            dblp_result = dblp_search(title1)
+        elif not dblp_search(title2).empty:
+            dblp_result = dblp_search(title2)
 
         # account for spell errors 
         g_title = spell_check_correct(title1)
@@ -382,6 +486,9 @@ def get_author_info(grobid, cermine, openAI):
     openAI: information extracted using openAI
     """
     try:             
+        # the authors properties parse the documents on every access
+        grobid_authors = grobid.authors
+        cermine_authors = cermine.authors
         dblp_authors = []
         openAI_authors = []
         paper_authors_gr = []
@@ -393,19 +500,19 @@ def get_author_info(grobid, cermine, openAI):
 
         # use dblp for cross check
         dblp_result = pd.DataFrame() 
-        if not dblp.search([grobid.title]).empty:
-            dblp_result = dblp.search([grobid.title])
-        elif not dblp.search([cermine.title]).empty:
-            dblp_result = dblp.search([cermine.title])
+        if not dblp_search(grobid.title).empty:
+            dblp_result = dblp_search(grobid.title)
+        elif not dblp_search(cermine.title).empty:
+            dblp_result = dblp_search(cermine.title)
 
         if not dblp_result.empty:     
             dblp_authors = dblp_result['Authors'][0] 
 
         #check results from grobid      
         paper_authors_gr = {}
-        if not dblp_result.empty: #len(dblp_authors) == len(grobid.authors):
+        if not dblp_result.empty: #len(dblp_authors) == len(grobid_authors):
             for a1 in dblp_authors:
-                for a2 in grobid.authors:
+                for a2 in grobid_authors:
                     #only add correct names from dblp
                     if fuzz.token_set_ratio(a1, a2.name) >= 80:
                         paper_authors_gr[a1] = Author(name = a1, affiliation=a2.affiliation, email = a2.email)
@@ -413,7 +520,7 @@ def get_author_info(grobid, cermine, openAI):
         #cross check the author name with openAI iff dblp entry is empty
         else:
             for a1 in openAI_authors:
-                for a2 in grobid.authors:
+                for a2 in grobid_authors:
                     if fuzz.token_set_ratio(a1, a2.name) >= 80:
                         paper_authors_gr[a1] = Author(name = a1, affiliation=a2.affiliation, email = a2.email)
                     else:
@@ -422,9 +529,9 @@ def get_author_info(grobid, cermine, openAI):
 
 
         paper_authors_ce = {}
-        if not dblp_result.empty: #len(dblp_authors) == len(cermine.authors):  -- not sure if we need this here, needs for validation
+        if not dblp_result.empty: #len(dblp_authors) == len(cermine_authors):  -- not sure if we need this here, needs for validation
             for a1 in dblp_authors:
-                for a2 in cermine.authors:
+                for a2 in cermine_authors:
                     #only add correct names from dblp
                     if fuzz.token_set_ratio(a1, a2.name) >= 80:
                         paper_authors_ce[a1] = Author(name = a1, affiliation=a2.affiliation, email = a2.email)
@@ -432,7 +539,7 @@ def get_author_info(grobid, cermine, openAI):
         #cross check the author name with openAI iff dblp entry is empty
         else:
             for a1 in openAI_authors:
-                for a2 in cermine.authors:
+                for a2 in cermine_authors:
                     if fuzz.token_set_ratio(a1, a2.name) >= 80:
                         paper_authors_ce[a1] = Author(name = a1, affiliation=a2.affiliation, email = a2.email)
                     else:
@@ -454,7 +561,7 @@ def get_author_info(grobid, cermine, openAI):
                 
                 # check affiliation and email address from grobid and cermine
                 if a in paper_authors_gr:
-                    aff_grobid = [paper_authors_gr[a].affiliation] if paper_authors_gr[a].affiliation != [] else []
+                    aff_grobid = list(paper_authors_gr[a].affiliation)
                     email_grobid = paper_authors_gr[a].email
 
                 if a in paper_authors_ce:
@@ -468,15 +575,21 @@ def get_author_info(grobid, cermine, openAI):
 
         else:
             #only possibility here is to automatically merge only in those cases when the authors are the same for both grobid and cermine, otherweise a manual check is required
-            authors_gr = [a.name for a in grobid.authors]
-            authors_ce = [a.name for a in cermine.authors]
+            authors_gr = [a.name for a in grobid_authors]
+            authors_ce = [a.name for a in cermine_authors]
             if len(authors_gr) != len(authors_ce):
                 # take the intersection of both lists
                 paper_authors = []
-                authors_intersection = [a for a in authors_gr if a in authors_ce]
+                grobid_by_name = {}
+                for a in grobid_authors:
+                    grobid_by_name.setdefault(a.name, a)
+                cermine_by_name = {}
+                for a in cermine_authors:
+                    cermine_by_name.setdefault(a.name, a)
+                authors_intersection = [a for a in authors_gr if a in cermine_by_name]
                 for iter_author_name in authors_intersection:
-                    iter_author_grobid = [a for a in grobid.authors if a.name == iter_author_name][0]
-                    iter_author_cermine = [a for a in cermine.authors if a.name == iter_author_name][0]
+                    iter_author_grobid = grobid_by_name[iter_author_name]
+                    iter_author_cermine = cermine_by_name[iter_author_name]
                     iter_aff_grobid = iter_author_grobid.affiliation
                     iter_aff_cermine = iter_author_cermine.affiliation
                     iter_email_grobid = iter_author_grobid.email
@@ -487,8 +600,8 @@ def get_author_info(grobid, cermine, openAI):
             elif approximate_lists(authors_gr, authors_ce): # list of authors is (almost) the same
                 author_info = []
                 paper_authors = []
-                for a in grobid.authors:
-                    for b in cermine.authors:
+                for a in grobid_authors:
+                    for b in cermine_authors:
                         if fuzz.token_set_ratio(a.name, b.name) >= 70:
                             author_info.append((b.name, a.affiliation, b.affiliation, a.email, b.email))
                             
@@ -499,6 +612,9 @@ def get_author_info(grobid, cermine, openAI):
     
             
         #Crosschecking via openAI
+        openAI_by_name = {}
+        for person in openAI:
+            openAI_by_name.setdefault(person['name'], person)
         tmp_paper_authors = []
         for a in paper_authors:
             name_author = a.name
@@ -507,16 +623,12 @@ def get_author_info(grobid, cermine, openAI):
 
             for b in openAI_authors:
                 if fuzz.token_set_ratio(name_author, b) >= 80:
-                    tmp = list(filter(lambda person: person['name'] == b, openAI))[0]['email']
-                    if not tmp:
-                        email_openAI = ''
-                    else:
-                        email_openAI = tmp[0]
-                    aff_openAI = list(filter(lambda person: person['name'] == b, openAI))[0]['affiliation']
+                    # only the first email address extracted by openAI is considered
+                    email_openAI = as_tuple(openAI_by_name[b]['email'])[:1]
+                    aff_openAI = openAI_by_name[b]['affiliation']
 
                 #aff_author, email_author = merge_author_info_openAI(aff_grobid, aff_cermine,aff_openAI,email_grobid,email_cermine, email_openAI)
                     aff_author, email_author = merge_author_info(aff_author,aff_openAI, email_author, email_openAI)
-                    tmp_paper_authors.append(Author(name=name_author, affiliation=aff_author, email= email_author))
                     break # to skip remaining authors in the list
             tmp_paper_authors.append(Author(name=name_author, affiliation=aff_author, email= email_author))
         paper_authors = tmp_paper_authors
@@ -525,73 +637,6 @@ def get_author_info(grobid, cermine, openAI):
         print('No author info available')
         return []
 
-def calculate_similarity(row):
-    """ adds a simialrity score to the affiliations extracted and the expected affiliations """
-
-    return fuzz.token_set_ratio(row['Author Affiliations_exp'], row['Author Affiliations_act'])
-
-def replace_between_spaces(text):
-    """ removes middle names for better author comparison when doing the evaluation """
-
-    return re.sub(r'\s\S+\s', ' ', text)
-
-def preprocess_df(expected_df, actual_df):
-    """ preprocessed the data for the validation step - remove special characters, extra spaces """
-
-    pattern = r'([A-Za-z])\.'
-    pattern_sp = r'[^a-zA-Z0-9\s]'
-    expected_df['URL'] = expected_df['URL'].str.replace('https', 'http')
-    # Replace the matched pattern with an empty string
-    actual_df['Author name'] = actual_df['Author name'].str.replace(pattern, '', regex=True).str.strip().str.replace('  ', ' ').str.replace('´', '').str.replace('-', '').str.lower()
-    expected_df['Author name'] = expected_df['Author name'].str.replace(pattern, '', regex=True).str.strip().str.replace('  ', ' ').str.replace('´', '').str.replace('-', '').str.lower()
-
-    actual_df['Author name'] = actual_df['Author name'].apply(lambda x: unidecode(x)).apply(replace_between_spaces)
-    expected_df['Author name'] = expected_df['Author name'].apply(lambda x: unidecode(x)).apply(replace_between_spaces)
-
-    actual_df['Paper title'] = actual_df['Paper title'].str.replace('(', ',').str.replace(')', ',').str.replace('.', '').str.replace(', ', ',').str.replace('-', ',').str.replace(':', ',').str.replace(',', '').str.replace("’", "'").str.strip().str.lower()
-    expected_df['Paper title'] = expected_df['Paper title'].str.replace('(', ',').str.replace(')', ',').str.replace('.', '').str.replace(', ', ',').str.replace('-', ',').str.replace(':', ',').str.replace(',', '').str.replace("’", "'").str.strip().str.lower()
-
-    actual_df['Author Affiliations mod'] = actual_df['Author Affiliations'].str.replace('\n', '').str.lower().str.replace(pattern_sp, '', regex=True).str.replace(' ', '')
-    expected_df['Author Affiliations mod'] = expected_df['Author Affiliations'].str.replace('\n', '').str.lower().str.replace(pattern_sp, '', regex=True).str.replace(' ', '')
-
-    actual_df['Author E-Mail'] = actual_df['Author E-Mail'].str.lower().str.strip()
-    expected_df['Author E-Mail'] = expected_df['Author E-Mail'].str.lower().str.strip()
-    actual_df.to_excel('actual.xlsx', index = False)
-    expected_df.to_excel('expected.xlsx', index = False)
-    return expected_df, actual_df
-
-
-def evaluate_results(expected_df, actual_df):
-    """ compares expected results with the information our algorithm has extracted """
-    expected_df, actual_df = preprocess_df(expected_df, actual_df)
-    merged_df = pd.merge(expected_df, actual_df, on=['URL', 'Paper title', 'Author name'] , suffixes=('_exp', '_act'), how='left')
-
-    test_no = merged_df['Paper title'].nunique()
-    #1) author names and paper titles: exact matching
-    score_1 = merged_df[~merged_df['Proceedings_act'].notna()]['Paper title'].nunique()
-    merged_df[merged_df['Proceedings_act'].isna()].to_excel('no_match.xlsx')
-    print(f'Exact matching of paper titles and author names: {test_no - score_1} out of {test_no}')
-
-
-    #2) exact matching of title, author names and email
-    score_2 = merged_df[~(((merged_df['Author E-Mail_exp'] == merged_df['Author E-Mail_act']) |
-                        ((merged_df['Author E-Mail_exp'].isna()) & (merged_df['Author E-Mail_act'] == '')) |
-                        ((merged_df['Author E-Mail_act'].isna()) & (merged_df['Author E-Mail_exp'] == '')) |
-                        (merged_df['Author E-Mail_exp'].isna() & merged_df['Author E-Mail_act'].isna())))]['Paper title'].nunique()
-    merged_df[~(((merged_df['Author E-Mail_exp'] == merged_df['Author E-Mail_act']) |
-                        ((merged_df['Author E-Mail_exp'].isna()) & (merged_df['Author E-Mail_act'] == '')) |
-                        ((merged_df['Author E-Mail_act'].isna()) & (merged_df['Author E-Mail_exp'] == '')) |
-                        (merged_df['Author E-Mail_exp'].isna() & merged_df['Author E-Mail_act'].isna())))].to_excel('email.xlsx', index=False)
-    print(f'Exact matching of title, names and emails: {test_no - score_2} out of {test_no}')
-
-
-    df = merged_df[((merged_df['Author E-Mail_exp'] == merged_df['Author E-Mail_act']) |
-                        (merged_df['Author E-Mail_exp'].isna() & merged_df['Author E-Mail_act'].isna()))]
-    df['similarity_aff'] = df.apply(calculate_similarity, axis=1)
-    # Filter rows where the similarity ratio is over 80
-    result = df[df['similarity_aff'] < 80]['Paper title'].nunique()
-    print(f'Exact matching of title, names and emails; app. matching of affiliations: {test_no - score_2-result} out of {test_no}')
-
 def is_iterable(obj):
     """ checks if object is iterable """
 
@@ -601,160 +646,396 @@ def is_iterable(obj):
     except TypeError:
         return False
     
-def parse_volumes(volumes: List[int] = None, all_volumes: bool = False, construct_graph = False, do_evaluation: bool = False) -> List:
+def list_volumes() -> List[str]:
+    """ returns the ids of all volumes listed by the ceurspt api """
+    print("Fetching all volumes from http://ceurspt.wikidata.dbis.rwth-aachen.de/index.html")
+    Web = fetch('http://ceurspt.wikidata.dbis.rwth-aachen.de/index.html') 
+    S = bs4.BeautifulSoup(Web.text, 'lxml') 
+    html_txt = S.prettify()
+    #extract all volumes
+    reg1 = r'Vol-(\d+)">'
+    #all volumes from the ceurspt api
+    return re.findall(reg1, html_txt)
+
+def list_volume_papers(volume_id) -> List[str]:
+    """ returns the keys of the papers of a volume (e.g. paper1), without prefaces, indexes and invited talks """
+    url = f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}'
+    Web = fetch(url) 
+    reg2 = rf'Vol-{volume_id}/(.*?).pdf'
+    #reg2 = r'paper(\d+).pdf' ##needs to be changed to reg2 = r'paper(\d+).pdf' to accound for more papers that do not follow this format.
+    paper_keys = sorted(list(set(re.findall(reg2, bs4.BeautifulSoup(Web.text, 'lxml').prettify()))))
+    # remove contents that are not papers
+    return [ele for ele in paper_keys if 'preface' not in ele.lower() and 'index' not in ele.lower() and 'invited' not in ele.lower()]
+
+def get_volume_events(volume_id) -> Optional[dict]:
+    """ returns the events and proceedings of a volume or None if they are not available """
+    url = f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}.json'
+    response = fetch(url)
+    try:
+        json_event = JsonFile(response)
+    except:
+        return None
+    return get_eventsAndProceedings(json_event)
+
+def parse_volumes(volumes: List[int] = None, all_volumes: bool = False, construct_graph = False, do_evaluation: bool = False,
+                  test_set_path: str = "../test/test_set.xlsx", evaluation_artifacts_dir: Optional[str] = None,
+                  sink: Optional[OutputSink] = None, disambiguate: bool = False, workers: int = 1,
+                  cache_dir: Optional[str] = None, on_volume_done: Optional[Callable[[int, int, int], None]] = None,
+                  memory_limit_mb: Optional[int] = None, sync_graph: bool = False):
     """ 
     Parses a list of volumes and constructs the corresponding knowledge graph and return the list of extracted metadata
 
     volumes: list of volumes to be processed
     all_volumes: if set to True, parses all volumes
     construct_graph: if set to True, calls the method for KG construction
-    do_evaluation: if set to True, calls the evaluation method for the test data    
+    do_evaluation: if set to True, calls the evaluation method for the test data and returns the evaluation scores
+    test_set_path: path to the manually validated test data used for the evaluation
+    evaluation_artifacts_dir: if set, the evaluation stores its intermediate tables as parquet files in this directory
+    sink: output sink the extracted rows are flushed to in chunks while processing (default: kept in memory)
+    disambiguate: if set to True, the papers and authors of each volume are linked to Wikidata and ORCID
+    workers: if greater than 1, downloading and parsing run in a pipeline with this many parsing processes (see pipeline.py)
+    cache_dir: directory of the author index, affiliation dictionary and disambiguation cache (default: the configured paths)
+    on_volume_done: called with (volume_id, number of papers, number of failed papers) once the rows of a volume are flushed to the sink
+    memory_limit_mb: memory ceiling of the run, see MemoryGuard (default: MEMORY_LIMIT_MB)
+    sync_graph: if set to True, the graph of each paper is updated with delta synchronization (see knowledge_graph/sync.py)
+                instead of merging, which also removes data the paper no longer contains
+    returns the evaluation scores if do_evaluation is set, otherwise the RunSummary
     """
+    start = time.monotonic()
 
     if not volumes and not all_volumes:
         raise ValueError("Either volumes or all_volumes must be specified")
     if all_volumes:
-        print("Fetching all volumes from http://ceurspt.wikidata.dbis.rwth-aachen.de/index.html")
-        Web = req.get('http://ceurspt.wikidata.dbis.rwth-aachen.de/index.html') 
-        S = BeautifulSoup(Web.text, 'lxml') 
-        html_txt = S.prettify()
-        #extract all volumes
-        reg1 = r'Vol-(\d+)">'
-        #all volumes from the ceurspt api
-        cur_volumes = re.findall(reg1, html_txt)
+        cur_volumes = list_volumes()
     elif volumes:
         cur_volumes = [str(v) for v in volumes]
 
     neo4j_conn = None  
+    author_index = None
+    affiliation_dictionary = None
     if construct_graph:
         print("Setting up Neo4j connection")
         neo4j_conn = Neo4jConnection(uri=NEO4J_URI)  
         neo4j_conn.connect()  
+        create_neo4j_constraints(neo4j_conn)
+        author_index = AuthorIndex(os.path.join(cache_dir, 'author_index.json') if cache_dir else AUTHOR_INDEX_PATH)
+        affiliation_dictionary = AffiliationDictionary(os.path.join(cache_dir, 'affiliations.json') if cache_dir else AFFILIATION_DICTIONARY_PATH)
+    disambiguation_cache = None
+    if disambiguate:
+        disambiguation_cache = disambiguation.DisambiguationCache(os.path.join(cache_dir, 'disambiguation_cache.sqlite') if cache_dir
+                                                                  else DISAMBIGUATION_CACHE_PATH)
+
+    if sink is None:
+        sink = MemorySink()
+    memory_guard = MemoryGuard() if memory_limit_mb is None else MemoryGuard(memory_limit_mb)
+    summary = RunSummary()
+
+    for k, volume_papers in stream_volumes(cur_volumes, workers=workers, memory_guard=memory_guard):
+        # volumes without papers are reported as done as well
+        if disambiguate and volume_papers:
+            try:
+                volume_papers = disambiguation.disambiguate_volume(volume_papers, cache=disambiguation_cache)
+            except Exception as e:
+                print(f"Disambiguation of volume {k} failed: {e}")
+        for metadata in volume_papers:
+            if construct_graph and sync_graph:
+                if metadata.errors:
+                    # an incomplete extraction would remove the authors the failed services did not return
+                    print(f"Skipping the synchronization of {metadata.url}: {metadata.errors}")
+                else:
+                    result = sync_neo4j_graph(author_list=metadata.authors, title=metadata.title, proceeding=metadata.proceeding,
+                                              event=metadata.event, neo4j_connection=neo4j_conn, url=metadata.url,
+                                              author_index=author_index, wikidata_id=metadata.wikidata_id,
+                                              affiliation_dictionary=affiliation_dictionary, volume=metadata.volume_id)
+                    summary.graph_changes += result.changed
+                    print(f"Synchronized graph of paper {metadata.title}: " + (f"updated to version {result.version}" if result.changed else "unchanged"))
+            elif construct_graph:
+                print(f"Creating graph for paper {metadata.title}")
+                create_neo4j_graph(author_list=metadata.authors, title=metadata.title, proceeding=metadata.proceeding, event=metadata.event,
+                                   neo4j_connection=neo4j_conn, url=metadata.url, author_index=author_index, wikidata_id=metadata.wikidata_id,
+                                   affiliation_dictionary=affiliation_dictionary, volume=metadata.volume_id)
+            sink.write_rows(metadata.to_rows())
+        failed = sum(1 for metadata in volume_papers if metadata.errors)
+        summary.volumes += 1
+        summary.papers += len(volume_papers)
+        summary.failed += failed
+        if on_volume_done is not None or memory_guard.over_limit():
+            # the indexes are saved together with the rows, so a checkpointed volume does not refer to unsaved author ids
+            flush_run(sink, author_index, affiliation_dictionary)
+        if on_volume_done is not None:
+            on_volume_done(k, len(volume_papers), failed)
+    flush_run(sink, author_index, affiliation_dictionary)
+    summary.rows = sink.rows_written
+    summary.elapsed = time.monotonic() - start
+    summary.throttled = memory_guard.throttled
+    summary.peak_rss_mb = peak_rss_mb()
+    summary.peak_worker_rss_mb = peak_rss_mb(children=True)
+    print(summary)
 
-    #extract all pages for each vol
-    papers = {}
-    events = {}
-    for v in cur_volumes:
-        url = 'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-' + v
-        Web = req.get(url) 
-        reg2 = rf'Vol-{v}/(.*?).pdf'
-        #reg2 = r'paper(\d+).pdf' ##needs to be changed to reg2 = r'paper(\d+).pdf' to accound for more papers that do not follow this format.
-        papers[int(v)] = sorted(list(set(re.findall(reg2, BeautifulSoup(Web.text, 'lxml').prettify()))))
+    if do_evaluation:
+        df = sink.read()
+        expected_df = pd.read_excel(test_set_path)
+        if not df.empty:
+            scores = evaluation.evaluate_results(expected_df=expected_df, actual_df=df, artifacts_dir=evaluation_artifacts_dir)
+            return scores
+    return summary
+
+def flush_run(sink: OutputSink, author_index: Optional[AuthorIndex] = None, affiliation_dictionary: Optional[AffiliationDictionary] = None):
+    """ flushes the buffered rows to the sink and saves the author index and affiliation dictionary, if they changed """
+    sink.flush()
+    if author_index is not None:
+        author_index.save()
+    if affiliation_dictionary is not None:
+        affiliation_dictionary.save()
+
+def discover_volumes(volume_ids: Iterable) -> Iterator[Tuple[int, List[str], Optional[dict]]]:
+    """ lists the papers and events of the volumes one at a time, only when the next volume is about to be processed """
+    for v in volume_ids:
+        try:
+            yield int(v), list_volume_papers(v), get_volume_events(v)
+        except UpstreamError as e:
+            # the volume is skipped, it is not marked as done and can be processed again later
+            print(f"Listing the papers of volume {v} failed: {e}")
 
-    # remove contents that are not papers
-    for v in cur_volumes:
-        papers[int(v)] =  [ele for ele in papers[int(v)] if 'preface' not in ele.lower() and 'index' not in ele.lower() and 'invited' not in ele.lower()] 
+def stream_volumes(volume_ids: Iterable, workers: int = 1, memory_guard: Optional[MemoryGuard] = None) -> Iterator[Tuple[int, List[PaperMetadata]]]:
+    """
+    extracts the papers of the volumes and yields (volume_id, papers) per volume as soon as a volume is finished,
+    so that only the volumes in progress are held in memory
 
-    # parsing the events and proceedings as a nested dictionary using key = volume number, value = the json dictionary
-    for v in cur_volumes:
-        url = 'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-' + v + '.json'
-        response = req.get(url)
+    workers: if greater than 1, downloading and parsing run in a pipeline with this many parsing processes (see pipeline.py)
+    memory_guard: pauses fetching further papers while the process and its workers are above the memory ceiling (only with workers > 1)
+    """
+    if workers <= 1:
+        for volume_id, paper_keys, volume_events in discover_volumes(volume_ids):
+            yield volume_id, extract_volume_papers(volume_id, paper_keys, {volume_id: volume_events} if volume_events else {})
+        return
+
+    # imported here, as the pipeline module itself builds on this module
+    from paper_semantification.pipeline import run_pipeline, group_by_volume
+    events, paper_counts = {}, {}
+
+    def tasks():
+        # the next volume is discovered once the pipeline asks for more papers
+        for volume_id, paper_keys, volume_events in discover_volumes(volume_ids):
+            paper_counts[volume_id] = len(paper_keys)
+            if volume_events:
+                events[volume_id] = volume_events
+            for paper_key in paper_keys:
+                yield volume_id, paper_key
+
+    results = run_pipeline(tasks(), events, cpu_workers=workers, memory_guard=memory_guard)
+    for volume_id, volume_papers in group_by_volume(results, paper_counts):
+        events.pop(volume_id, None)
+        yield volume_id, volume_papers
+
+def extract_volume_papers(volume_id, paper_keys: List[str], events: Optional[dict] = None) -> List[PaperMetadata]:
+    """ extracts the metadata of the papers of a volume in this process, only the OpenAI requests run in parallel """
+    paper_urls = [f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}/{paper_key}.pdf' for paper_key in paper_keys]
+    try:
+        openai_results = openai.get_parser().parse_papers(paper_urls)
+    except Exception as e:
+        openai_results = [e] * len(paper_urls)
+    return [extract_paper_metadata(volume_id, paper_key, events, openai_result)
+            for paper_key, openai_result in zip(paper_keys, openai_results)]
+
+def warm_up():
+    """ preloads the components shared by all requests, so the first request does not pay for loading them """
+    load_lazy_modules()
+    get_spell_checker()
+    try:
+        openai.get_parser()
+    except Exception as e:
+        print(f"OpenAI parser could not be initialized: {e!r}")
 
-        try:
-            json_event = JsonFile(response)
-        except:
-            continue
-        events[int(v)] = get_eventsAndProceedings(json_event)
+def format_author(author: Author):
+    """ returns name, affiliation and email of an author as flat strings """
+    return author.name, '; '.join(author.affiliation), ', '.join(author.email)
 
-    
-    data = []
-    for k in papers.keys():
-        for _, paper_key in enumerate(papers[k]):
-            paper_path, paper_title, names, affiliations, emails, proceeding, event = process_single_paper(k, paper_key, events, construct_graph, neo4j_conn)
-            for i in range(len(names)):
-            # Append author details to the data list
-                data.append({'Proceedings':  proceeding, 'Event': event, 'Paper title': paper_title,
-                            'Author name': names[i], 'Author Affiliations': affiliations[i], 'Author E-Mail': emails[i], 'URL': f'{paper_path}.pdf'})
-    
-    if do_evaluation:
-        df = pd.DataFrame(data)
-        df.reset_index(drop=True, inplace=True)
-        expected_df = pd.read_excel("../test/test_set.xlsx")
-        expected_df.to_excel('expected.xlsx', index=False)
-        if not df.empty:
-            evaluate_results(expected_df=expected_df, actual_df=df)
 
-def process_single_paper(volume_id, paper_key, events: Optional[dict] = None, construct_graph = False, neo4j_conn = None):
+@dataclass
+class PaperMetadata:
+    """ metadata extracted for a single paper """
+    volume_id: int
+    paper_key: str
+    paper_path: str
+    title: str
+    authors: List[Author]
+    proceeding: str = ''
+    event: str = ''
+    # extraction sources the metadata was merged from (e.g. grobid+cermine+openai)
+    source: str = ''
+    wikidata_id: str = ''
+    # failures of external services during the extraction, empty if the paper was extracted completely
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def url(self):
+        return self.paper_path + '.pdf'
+
+    def to_rows(self) -> List[dict]:
+        """ one row per author, following the schema of the output sinks """
+        rows = []
+        for author in self.authors:
+            name, affiliation, email = format_author(author)
+            rows.append({'Volume': self.volume_id, 'Proceedings': self.proceeding, 'Event': self.event, 'Paper title': self.title,
+                         'Author name': name, 'Author Affiliations': affiliation, 'Author E-Mail': email, 'URL': self.url,
+                         'Source': self.source, 'ORCID': author.orcid or '', 'Author Wikidata ID': author.wikidata_id or '',
+                         'Paper Wikidata ID': self.wikidata_id})
+        return rows
+
+
+@dataclass
+class RunSummary:
+    """ statistics of a batch run """
+    volumes: int = 0
+    papers: int = 0
+    # papers that could not be extracted completely because an external service failed
+    failed: int = 0
+    rows: int = 0
+    elapsed: float = 0.0
+    # papers whose subgraph was changed by the delta synchronization
+    graph_changes: int = 0
+    # number of times fetching was paused because the memory ceiling was reached
+    throttled: int = 0
+    peak_rss_mb: float = 0.0
+    peak_worker_rss_mb: float = 0.0
+
+    def __str__(self):
+        rate = self.papers / self.elapsed if self.elapsed else 0.0
+        return (f"Processed {self.volumes} volumes, {self.papers} papers ({self.failed} failed) and {self.rows} rows in {self.elapsed:.1f}s ({rate:.2f} papers/s), "
+                f"{self.graph_changes} papers changed in the graph, "
+                f"peak memory {self.peak_rss_mb:.0f} MB (workers {self.peak_worker_rss_mb:.0f} MB), throttled {self.throttled} times")
+
+
+def fetch_openai_result(path_pdf):
+    """ returns (title, authors) extracted by OpenAI, or the exception that occurred """
+    try:
+        return openai.get_parser().extract_paper(path_pdf)
+    except Exception as e:
+        return e
+
+
+def merge_paper_metadata(volume_id, paper_key, grobid: Optional["GrobitFile"], cermine: Optional["CermineFile"], openai_result,
+                         events: Optional[dict] = None, errors: Optional[List[str]] = None) -> PaperMetadata:
     """ 
-    processes a single paper
-        returns all metadata extracted using the available APIs 
-    
-    volume_id: Volume of the paper to be processed
-    paper_key: title of the paper to be processed (e.g. paper1)
-    construct_graph: if set to True, calls the graph construction procedure
-    """
+    merges the results of GROBID, CERMINE, OpenAI and dblp into the metadata of a single paper
 
+    grobid, cermine: parsed GROBID/CERMINE documents or None if they could not be fetched
+    openai_result: (title, authors) extracted by OpenAI, or the exception that occurred
+    errors: failures of external services while fetching the documents
+    """
+    errors = list(errors or [])
     paper_path = f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}/{paper_key}'
     path_pdf = paper_path + ".pdf"
-    print(f'{paper_path}.pdf')
-    grobid, cermine = None, None
+    if cermine:
+        try:
+            cermine.release()
+        except:
+            pass
     try:
-        grobid =  GrobitFile(paper_path + '.grobid')
         grobid_title = grobid.title
     except:
         grobid_title = ''
     try:
-        cermine =  CermineFile(paper_path + '.cermine')
         cermine_title = cermine.title
     except:
         cermine_title = ''
 
     try: 
-        openAI = openai.OpenAIPapersParser()
-        openAI_author = openAI.parse_authors(path_pdf)
-        openAI_title = openAI.extract_title(path_pdf)
+        if isinstance(openai_result, Exception):
+            raise openai_result
+        openAI_title, openAI_author = openai_result
     except Exception as e:
+        print(f"OpenAI extraction failed for {path_pdf}: {e!r}")
+        if isinstance(e, UpstreamError):
+            errors.append(f'openai: {e}')
         openAI_author = []
         openAI_title = ''
     paper_title = ''
     author_list = []
-    if cermine and grobid and openAI:
-        paper_title = get_final_paper_title(grobid_title, cermine_title, openAI_title,  paper_path + ".pdf")
-        author_list = get_author_info(grobid, cermine,openAI_author)
-    elif grobid and openai:
-        paper_title = get_paper_title(grobid_title, openai.paper_title, paper_path + ".pdf")
-        author_list = openai.paper_authors
-    elif cermine:
-        paper_title = cermine_title
-        author_list = cermine.authors
-    author_list_final = []
-    for author in author_list:
-        if author not in author_list_final:
-            author_list_final.append(author)
-
-    if events:
+    source = ''
+    with collect_errors() as reported:
+        if cermine and grobid:
+            paper_title = get_final_paper_title(grobid_title, cermine_title, openAI_title,  paper_path + ".pdf")
+            author_list = get_author_info(grobid, cermine,openAI_author)
+            source = 'grobid+cermine+openai'
+        elif grobid:
+            paper_title = get_paper_title(grobid_title, openAI_title, paper_path + ".pdf")
+            author_list = [Author(a['name'], a.get('affiliation'), a.get('email')) for a in openAI_author]
+            source = 'grobid+openai'
+        elif cermine:
+            paper_title = cermine_title
+            author_list = cermine.authors
+            source = 'cermine'
+    errors = list(dict.fromkeys(errors + reported))
+    # remove duplicates, keeping the order of the authors
+    author_list_final = list(dict.fromkeys(author_list))
+
+    if events and int(volume_id) in events:
         proceeding = events[int(volume_id)]['proceedings']
         event = events[int(volume_id)]['event']
     else:
         proceeding = ''
         event = ''
-    if construct_graph:
-        print(f"Creating graph for paper {paper_title}")
-        create_neo4j_graph(author_list=author_list_final, title=paper_title, proceeding=proceeding, event=event, neo4j_connection=neo4j_conn, url=paper_path+'.pdf') 
+    return PaperMetadata(volume_id=int(volume_id), paper_key=paper_key, paper_path=paper_path, title=paper_title,
+                         authors=author_list_final, proceeding=proceeding, event=event, source=source, errors=errors)
+
+
+def extract_paper_metadata(volume_id, paper_key, events: Optional[dict] = None, openai_result = None) -> PaperMetadata:
+    """ 
+    extracts the metadata of a single paper using the available APIs and merges the results
+
+    volume_id: Volume of the paper to be processed
+    paper_key: title of the paper to be processed (e.g. paper1)
+    events: proceedings and events of the volumes, as returned by get_eventsAndProceedings
+    openai_result: (title, authors) already extracted by OpenAIPapersParser.parse_papers, or the exception it raised
+    """
+
+    paper_path = f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}/{paper_key}'
+    print(f'{paper_path}.pdf')
+    grobid, cermine = None, None
+    errors = []
+    try:
+        grobid =  GrobitFile(paper_path + '.grobid')
+    except UpstreamError as e:
+        errors.append(f'grobid: {e}')
+    except:
+        pass
+    try:
+        cermine =  CermineFile(paper_path + '.cermine')
+    except UpstreamError as e:
+        errors.append(f'cermine: {e}')
+    except:
+        pass
+    if openai_result is None:
+        openai_result = fetch_openai_result(paper_path + '.pdf')
+    return merge_paper_metadata(volume_id, paper_key, grobid, cermine, openai_result, events, errors)
+
+
+def process_single_paper(volume_id, paper_key, events: Optional[dict] = None, construct_graph = False, neo4j_conn = None):
+    """ 
+    processes a single paper
+        returns all metadata extracted using the available APIs, followed by the failures of external services (empty if none)
     
-    names = []
-    affiliations = []
-    emails = []
-    for author in author_list_final:
-        # Extract author details
-        names.append(author.name)
-
-        if isinstance(author.affiliation, list):
-            affiliation = '; '.join(author.affiliation)
-        elif author.affiliation:
-            affiliation = author.affiliation
-        else:
-            affiliation = ''
+    volume_id: Volume of the paper to be processed
+    paper_key: title of the paper to be processed (e.g. paper1)
+    construct_graph: if set to True, calls the graph construction procedure
+    """
+    # the service calls this function from several threads
+    load_lazy_modules()
+    metadata = extract_paper_metadata(volume_id, paper_key, events)
+    if construct_graph:
+        print(f"Creating graph for paper {metadata.title}")
+        create_neo4j_graph(author_list=metadata.authors, title=metadata.title, proceeding=metadata.proceeding, event=metadata.event,
+                           neo4j_connection=neo4j_conn, url=metadata.url, volume=metadata.volume_id)
+
+    names, affiliations, emails = [], [], []
+    for author in metadata.authors:
+        name, affiliation, email = format_author(author)
+        names.append(name)
         affiliations.append(affiliation)
-
-        if isinstance(author.email, list):
-            email = ', '.join(author.email)
-        elif author.email:
-            email = author.email
-        else:
-            email = ''
         emails.append(email)
-    return paper_path, paper_title, names, affiliations, emails, proceeding, event
+    return metadata.paper_path, metadata.title, names, affiliations, emails, metadata.proceeding, metadata.event, metadata.errors
 
 
 if __name__ == '__main__':
@@ -1,18 +1,159 @@
-import fitz
-from openai import OpenAI
-import os
-import requests
+import ast
+import asyncio
 import hashlib
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
 
-class OpenAIPapersParser:
-    def __init__(self, gpt_model="gpt-4"):
-        self.client = OpenAI(
-            api_key= os.environ.get("OPENAI_API_KEY")
-        )
+import fitz
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from paper_semantification import OPENAI_BASE_URL, OPENAI_MAX_CONCURRENCY, OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE
+from paper_semantification import concurrency
+from paper_semantification.concurrency import UpstreamError, fetch, retry_after_seconds
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+class RateLimiter:
+    """ sliding one-minute window over the requests and (estimated) tokens sent to the API """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window = deque()
+        self._tokens = 0
+
+    async def acquire(self, tokens: int):
+        while True:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= 60:
+                self._tokens -= self._window.popleft()[1]
+            # a single request larger than the token budget is let through once the window is empty
+            if not self._window or (len(self._window) < self.requests_per_minute and self._tokens + tokens <= self.tokens_per_minute):
+                self._window.append((now, tokens))
+                self._tokens += tokens
+                return
+            await asyncio.sleep(max(60 - (now - self._window[0][0]), 0.05))
+
+
+class RequestScheduler:
+    """
+    Sends chat completions through one shared AsyncOpenAI client: the requests in flight follow the adaptive limit of the
+    API host (at most `max_concurrency`, see concurrency.py), the requests and tokens per minute stay within the account
+    budgets, and rate limits, timeouts and server errors are retried with jittered exponential backoff.
+    Requests that still fail raise UpstreamError.
+    """
+    def __init__(self, client: AsyncOpenAI, max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+                 requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE, tokens_per_minute: int = OPENAI_TOKENS_PER_MINUTE,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0, completion_tokens: int = 500):
+        self.client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.host = urlparse(str(client.base_url)).netloc
+        # completion latencies mostly depend on the length of the answer, so only a large increase counts as overload
+        self.limiter = concurrency.controller.limiter(self.host, max_limit=max_concurrency, latency_tolerance=10.0)
+
+    def estimate_tokens(self, prompt: str) -> int:
+        # ~4 characters per token plus the expected length of the answer
+        return len(prompt) // 4 + self.completion_tokens
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(getattr(getattr(error, 'response', None), 'headers', None))
+        if retry_after is not None:
+            return retry_after
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def chat(self, prompt: str, model: str) -> str:
+        tokens = self.estimate_tokens(prompt)
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(tokens)
+            await self.limiter.aacquire()
+            start = time.monotonic()
+            try:
+                chat_completion = await self.client.chat.completions.create(
+                    messages=[{"role": "user", "content": prompt}], model=model)
+            except RETRYABLE_ERRORS as e:
+                self.limiter.release(failed=True,
+                                     retry_after=retry_after_seconds(getattr(getattr(e, 'response', None), 'headers', None)))
+                if attempt == self.max_retries:
+                    raise UpstreamError(self.host, repr(e)) from e
+                await asyncio.sleep(self.backoff(attempt, e))
+                continue
+            except BaseException:
+                # e.g. invalid or cancelled requests, which say nothing about the load of the host
+                self.limiter.release()
+                raise
+            self.limiter.release(latency=time.monotonic() - start)
+            return chat_completion.choices[0].message.content
 
+
+# The async client and its scheduler live on one event loop per process, running in a background thread.
+# Synchronous callers submit their requests to this loop, so all papers share the concurrency and rate limits.
+_loop = None
+# model -> parser, the rate limits of OpenAI apply per model
+_parsers = {}
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _loop, _parsers, _lock
+    _loop, _parsers, _lock = None, {}, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='openai-scheduler', daemon=True).start()
+        return _loop
+
+
+def get_parser(gpt_model="gpt-4") -> "OpenAIPapersParser":
+    """ returns the OpenAIPapersParser of the model, shared by the whole process """
+    loop = _get_loop()
+    with _lock:
+        if gpt_model not in _parsers:
+            _parsers[gpt_model] = OpenAIPapersParser(gpt_model=gpt_model, loop=loop)
+        return _parsers[gpt_model]
+
+
+class OpenAIPapersParser:
+    def __init__(self, gpt_model="gpt-4", base_url=OPENAI_BASE_URL, loop=None, first_page_cache_size: int = 64, **scheduler_options):
+        """
+        gpt_model: model used for the extraction
+        base_url: OpenAI compatible endpoint, e.g. a local stub for testing (default: OPENAI_BASE_URL or the OpenAI API)
+        loop: event loop the async client runs on (default: the shared loop of the process)
+        first_page_cache_size: first pages kept after their papers are extracted, the pages of the papers in progress are always kept
+        scheduler_options: concurrency, rate limit and retry settings of the RequestScheduler
+        """
         self.gpt_model = gpt_model
-        # Create the tmp folder if it does not exist
-        os.makedirs("tmp", exist_ok=True)
+        self.loop = loop or _get_loop()
+        self.scheduler = asyncio.run_coroutine_threadsafe(self._create_scheduler(base_url, scheduler_options), self.loop).result()
+        # first page texts of the recently processed papers (title and authors are extracted from the same text)
+        self._first_pages = OrderedDict()
+        self._first_pages_lock = threading.Lock()
+        self.first_page_cache_size = first_page_cache_size
+        # papers being extracted by aextract_paper, e.g. all papers of a volume passed to parse_papers
+        self._papers_in_progress = 0
+
+    @staticmethod
+    async def _create_scheduler(base_url, scheduler_options):
+        # retries are handled by the scheduler
+        client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), base_url=base_url or None, max_retries=0)
+        return RequestScheduler(client, **scheduler_options)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
 
     def calculate_hash(self, file_path_url):
         hash_object = hashlib.sha256(file_path_url.encode())
@@ -21,91 +162,127 @@ class OpenAIPapersParser:
 
     def get_first_page_text(self, file_path_url):
         """
-        1. Download the PDF file from the URL and store to /tmp. Set as title the hash of the file_path_url
+        1. Download the PDF file from the URL
         2. Parse the PDF using fitz
         3. Extract the text from the first page
         """
-        # Calculate the hash of the file_path_url
-        file_path_url_hash = self.calculate_hash(file_path_url)
-        file_path = f"tmp/{file_path_url_hash}.pdf"
-        with open(file_path, "wb") as f:
-            response = requests.get(file_path_url)
-            f.write(response.content)
-        doc = fitz.open(file_path)
-        first_page = doc.load_page(0)
-
-        return first_page.get_text()
-    
+        with self._first_pages_lock:
+            if file_path_url in self._first_pages:
+                return self._first_pages[file_path_url]
+        response = fetch(file_path_url)
+        response.raise_for_status()
+        with fitz.open(stream=response.content, filetype="pdf") as doc:
+            text = doc.load_page(0).get_text()
+        with self._first_pages_lock:
+            self._first_pages[file_path_url] = text
+            self._trim_first_pages()
+        return text
+
+    def _trim_first_pages(self):
+        while len(self._first_pages) > max(self.first_page_cache_size, self._papers_in_progress):
+            self._first_pages.popitem(last=False)
+
     def send_request_to_openai(self, prompt):
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model=self.gpt_model
-        )
-        return chat_completion.choices[0].message.content
-            
-    def extract_title(self, file_path_url):
-        text = self.get_first_page_text(file_path_url)
-        prompt = f"""Your are an expert in the field of Paper Semantification.
+        return self._run(self.scheduler.chat(prompt, self.gpt_model))
+
+    @staticmethod
+    def title_prompt(text):
+        return f"""Your are an expert in the field of Paper Semantification.
         Your job is to extract the title from the first page of the paper given in the following text.
         Only ouptut the title. Do not output any other boilerplate text.
         Text: {text}
         """
-        paper_title = self.send_request_to_openai(prompt)
-        return paper_title
 
-    def extract_authors_metadata(self, file_path_url):
-        text = self.get_first_page_text(file_path_url)
-        prompt = f"""Your are an expert in the field of Paper Semantification.
+    @staticmethod
+    def authors_prompt(text):
+        return f"""Your are an expert in the field of Paper Semantification.
         Your job is to extract the authors, their affiliations and emails from the first page of the paper given in the following text.
         Be especially careful with the interpreation of german umlauts (ä, ö, ü, ß) and special characters (e.g. é, è, ç, ñ, etc.). For example, the name Konrad U. F¨orstner should be interpreted as Konrad U. Förstner.
         Do not try to come up with the emails yourself, just extract them from the text. If you cannot find an email, just leave it empty.
-        Write the output as a list of dictionaries in the following format for each author: 
-        [\{{"name": "John Doe", "affiliation": ["University of Oxford", "Stanford University"], "email": ["john.doe@oxford.com", "john.doe@stanford.edu.com"]}}, 
+        Write the output as a list of dictionaries in the following format for each author:
+        [\\{{"name": "John Doe", "affiliation": ["University of Oxford", "Stanford University"], "email": ["john.doe@oxford.com", "john.doe@stanford.edu.com"]}},
         {{"name": "Jane Doe", "affiliation": ["University of Cambridge"], "email": ["Jane.doe@oxford.com"]}}]
         \n\nText: {text}
         """
-        paper_authors = self.send_request_to_openai(prompt)
-        return paper_authors
-    
+
+    @staticmethod
+    def format_prompt(paper_authors_str):
+        return f"""
+        Given the following string of authors, format it as a list of dictionaries in the following format for each author.
+        The main goal is to successfully run eval function in python on the output of this request.
+        {paper_authors_str}
+        """
+
+    def extract_title(self, file_path_url):
+        return self._run(self.aextract_title(file_path_url))
+
+    def extract_authors_metadata(self, file_path_url):
+        text = self.get_first_page_text(file_path_url)
+        return self.send_request_to_openai(self.authors_prompt(text))
+
     def format_json_authors(self, paper_authors_str: str):
         """
         In case the extracted authors from the main prompt are not output in the appropriate format,
         and eval fails, send another request to OpenAI to format the authors
         """
-        prompt = f"""
-        Given the following string of authors, format it as a list of dictionaries in the following format for each author.
-        The main goal is to successfully run eval function in python on the output of this request.
-        {paper_authors_str}    
-        """
-        paper_authors_refined = self.send_request_to_openai(prompt)
-        return paper_authors_refined
-    
+        return self.send_request_to_openai(self.format_prompt(paper_authors_str))
+
     def parse_authors(self, file_path_url):
-        paper_authors = self.extract_authors_metadata(file_path_url)
+        return self._run(self.aparse_authors(file_path_url))
+
+    async def _first_page_text(self, file_path_url):
+        return await asyncio.to_thread(self.get_first_page_text, file_path_url)
+
+    async def aextract_title(self, file_path_url):
+        text = await self._first_page_text(file_path_url)
+        return await self.scheduler.chat(self.title_prompt(text), self.gpt_model)
+
+    async def aparse_authors(self, file_path_url):
+        text = await self._first_page_text(file_path_url)
+        paper_authors = await self.scheduler.chat(self.authors_prompt(text), self.gpt_model)
         paper_authors = paper_authors.replace('\n', '')
         try:
-            paper_authors_json = eval(paper_authors)
+            # the answer is parsed as a python literal, it is never executed
+            paper_authors_json = ast.literal_eval(paper_authors)
         except Exception as e:
-            # Backup plan: if eval fails, ask OpenAI to format the authors
+            # Backup plan: if parsing fails, ask OpenAI to format the authors
             print(f"Exception: {e}")
             print("Failed to parse the authors string. Asking OpenAI to format it.")
-            paper_authors_refined = self.format_json_authors(paper_authors)
-            paper_authors_json = eval(paper_authors_refined)
+            paper_authors_refined = await self.scheduler.chat(self.format_prompt(paper_authors), self.gpt_model)
+            paper_authors_json = ast.literal_eval(paper_authors_refined)
         return paper_authors_json
 
+    async def aextract_paper(self, file_path_url):
+        """ returns (title, authors) of a paper, both requests are sent concurrently """
+        with self._first_pages_lock:
+            self._papers_in_progress += 1
+        try:
+            # download the first page once for both requests
+            await self._first_page_text(file_path_url)
+            return tuple(await asyncio.gather(self.aextract_title(file_path_url), self.aparse_authors(file_path_url)))
+        finally:
+            with self._first_pages_lock:
+                self._papers_in_progress -= 1
+                self._trim_first_pages()
 
+    def extract_paper(self, file_path_url):
+        return self._run(self.aextract_paper(file_path_url))
+
+    def parse_papers(self, file_path_urls):
+        """
+        extracts (title, authors) of many papers in parallel, limited by the scheduler of the parser.
+        Returns one result per url, failed papers are returned as the exception that occurred.
+        """
+        async def parse_all():
+            return await asyncio.gather(*[self.aextract_paper(url) for url in file_path_urls], return_exceptions=True)
+        return self._run(parse_all())
 
 
 if __name__ == "__main__":
-    parser = OpenAIPapersParser()
+    parser = get_parser()
     file_path_url = "http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper-23.pdf"
     paper_title = parser.extract_title(file_path_url)
     print(paper_title)
     # Output: "Take it Personally - A Python library for data enrichment in informetrical applications"
     paper_authors = parser.parse_authors(file_path_url)
-    print(paper_authors)
\ No newline at end of file
+    print(paper_authors)
@@ -0,0 +1,165 @@
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from paper_semantification import FETCH_WORKERS, PARSE_WORKERS
+from paper_semantification.memory import MemoryGuard
+from paper_semantification.concurrency import UpstreamError, fetch
+from paper_semantification.parser import (CermineFile, GrobitFile, PaperMetadata, fetch_openai_result, get_spell_checker,
+                                          load_lazy_modules, merge_paper_metadata)
+
+# Two stage pipeline for batch runs:
+#   I/O stage (threads): downloads the GROBID and CERMINE documents and runs the OpenAI extraction
+#   CPU stage (processes): parses the documents and merges the results (lxml/BeautifulSoup, ftfy, spell checking, fuzzy matching)
+# Only raw bytes are sent to the worker processes and only the compact PaperMetadata comes back.
+
+
+@dataclass
+class RawPaper:
+    volume_id: int
+    paper_key: str
+    # None if the document could not be downloaded
+    grobid: Optional[bytes]
+    cermine: Optional[bytes]
+    # (title, authors) extracted by OpenAI or the error that occurred
+    openai_result: object
+    # failures of external services while downloading
+    errors: List[str]
+
+
+def _download(url: str, only_ok: bool, errors: List[str], source: str) -> Optional[bytes]:
+    try:
+        response = fetch(url)
+    except UpstreamError as e:
+        errors.append(f'{source}: {e}')
+        return None
+    if only_ok and response.status_code != 200:
+        return b''
+    return response.content
+
+
+def fetch_raw_paper(volume_id, paper_key) -> RawPaper:
+    """ I/O stage: downloads everything needed to extract the metadata of a paper """
+    paper_path = f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}/{paper_key}'
+    print(f'{paper_path}.pdf')
+    openai_result = fetch_openai_result(paper_path + '.pdf')
+    if isinstance(openai_result, Exception) and not isinstance(openai_result, UpstreamError):
+        # exceptions of the API clients cannot always be pickled
+        openai_result = RuntimeError(repr(openai_result))
+    errors = []
+    return RawPaper(volume_id=int(volume_id), paper_key=paper_key, grobid=_download(paper_path + '.grobid', True, errors, 'grobid'),
+                    cermine=_download(paper_path + '.cermine', False, errors, 'cermine'), openai_result=openai_result, errors=errors)
+
+
+def parse_raw_paper(raw: RawPaper, events: Optional[dict] = None) -> PaperMetadata:
+    """ CPU stage: parses the downloaded documents and merges them, runs in a worker process """
+    grobid, cermine = None, None
+    if raw.grobid is not None:
+        try:
+            grobid = GrobitFile(content=raw.grobid)
+        except:
+            pass
+    if raw.cermine is not None:
+        try:
+            cermine = CermineFile(content=raw.cermine)
+        except:
+            pass
+    return merge_paper_metadata(raw.volume_id, raw.paper_key, grobid, cermine, raw.openai_result, events, raw.errors)
+
+
+def _failed_paper(volume_id, paper_key, stage: str, e: Exception) -> PaperMetadata:
+    """ metadata of a paper whose extraction failed in the given stage, so that the rest of the batch continues """
+    print(f"{stage.capitalize()} Vol-{volume_id}/{paper_key} failed: {e!r}")
+    return PaperMetadata(volume_id=int(volume_id), paper_key=paper_key, title='', authors=[],
+                         paper_path=f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}/{paper_key}',
+                         errors=[f'{stage}: {e!r}'])
+
+
+def _init_worker():
+    # load the spell checking dictionary once per worker instead of once per paper
+    get_spell_checker()
+
+
+def run_pipeline(tasks: Iterable[Tuple[int, str]], events: Optional[dict] = None, cpu_workers: int = PARSE_WORKERS,
+                 io_workers: int = FETCH_WORKERS, memory_guard: Optional[MemoryGuard] = None,
+                 fetch_paper: Callable[..., RawPaper] = fetch_raw_paper,
+                 parse_paper: Callable[..., PaperMetadata] = parse_raw_paper) -> Iterator[PaperMetadata]:
+    """
+    extracts the metadata of the given papers and yields it in the order the papers are finished
+
+    tasks: (volume_id, paper_key) of the papers
+    events: proceedings and events of the volumes, as returned by get_eventsAndProceedings
+    cpu_workers: number of processes parsing and merging the documents (default: number of cores)
+    io_workers: number of threads downloading the documents
+    memory_guard: while the process is above its memory ceiling, no further papers are fetched until the papers in flight are done
+    fetch_paper, parse_paper: the functions of the two stages, parse_paper must be importable by the worker processes
+    """
+    events = events or {}
+    tasks = iter(tasks)
+    # the I/O threads use lazily imported modules (e.g. the OpenAI parser), which must not be executed by several threads at once
+    load_lazy_modules()
+    # workers are spawned instead of forked, as the I/O threads are already running when the pool grows
+    context = multiprocessing.get_context('spawn')
+    with ThreadPoolExecutor(io_workers) as io_pool, \
+            ProcessPoolExecutor(cpu_workers, mp_context=context, initializer=_init_worker) as cpu_pool:
+        fetching, parsing = {}, {}
+
+        def submit_tasks():
+            # backpressure: only fetch ahead as long as the CPU stage keeps up
+            while len(fetching) < 2 * io_workers and len(parsing) < 2 * cpu_workers:
+                if memory_guard is not None and (fetching or parsing) and memory_guard.over_limit():
+                    return
+                task = next(tasks, None)
+                if task is None:
+                    return
+                fetching[io_pool.submit(fetch_paper, *task)] = task
+
+        submit_tasks()
+        while fetching or parsing:
+            done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetching:
+                    volume_id, paper_key = fetching.pop(future)
+                    try:
+                        raw = future.result()
+                    except Exception as e:
+                        yield _failed_paper(volume_id, paper_key, 'fetch', e)
+                        continue
+                    volume_events = {raw.volume_id: events[raw.volume_id]} if raw.volume_id in events else {}
+                    parsing[cpu_pool.submit(parse_paper, raw, volume_events)] = (volume_id, paper_key)
+                else:
+                    volume_id, paper_key = parsing.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        yield _failed_paper(volume_id, paper_key, 'parsing', e)
+            submit_tasks()
+
+
+def group_by_volume(results: Iterable[PaperMetadata], paper_counts: Dict[int, int]) -> Iterator[Tuple[int, List[PaperMetadata]]]:
+    """
+    collects the papers of each volume and yields (volume_id, papers sorted by paper) as soon as all papers of the volume are finished
+
+    paper_counts: number of papers per volume, filled while the volumes are discovered. Volumes are removed once they are yielded,
+                  volumes without papers are yielded with an empty list.
+    """
+    pending = defaultdict(list)
+
+    def empty_volumes():
+        for volume_id in [v for v, count in paper_counts.items() if count == 0 and v not in pending]:
+            del paper_counts[volume_id]
+            yield volume_id, []
+
+    for metadata in results:
+        yield from empty_volumes()
+        pending[metadata.volume_id].append(metadata)
+        if len(pending[metadata.volume_id]) >= paper_counts.get(metadata.volume_id, 0):
+            paper_counts.pop(metadata.volume_id, None)
+            yield metadata.volume_id, sorted(pending.pop(metadata.volume_id), key=lambda m: m.paper_key)
+    yield from empty_volumes()
+    # volumes with missing results (should not happen)
+    for volume_id, volume_papers in pending.items():
+        paper_counts.pop(volume_id, None)
+        yield volume_id, sorted(volume_papers, key=lambda m: m.paper_key)
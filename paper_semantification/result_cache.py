@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from paper_semantification import PIPELINE_VERSION, RESULT_CACHE_PATH, RESULT_CACHE_SIZE
+
+# Cache of the extracted metadata of single papers.
+# CEUR papers do not change once they are published, so a result only has to be recomputed when the pipeline changes
+# (PIPELINE_VERSION is part of the key). The most recent results are kept in memory (LRU), all results can additionally
+# be stored in SQLite, so they survive restarts and are shared by the workers of the service.
+
+CacheKey = Tuple[int, int, str]
+
+
+def etag(payload: dict) -> str:
+    """ strong ETag of a JSON payload """
+    return '"' + hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], entity_tag: str) -> bool:
+    """ whether an If-None-Match header matches an entity tag: "*" or one of its comma-separated tags (weak comparison) """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    if '*' in tags:
+        return True
+    strip_weak = lambda tag: tag[2:] if tag.startswith('W/') else tag
+    return strip_weak(entity_tag) in {strip_weak(tag) for tag in tags}
+
+
+class ResultCache:
+    """
+    LRU cache of {'etag', 'payload'} entries keyed by (volume_id, paper_id, pipeline version)
+
+    max_entries: number of results kept in memory
+    path: SQLite file of the persistent tier. If None, the results only live in memory.
+    """
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, path: Optional[str] = RESULT_CACHE_PATH,
+                 version: str = PIPELINE_VERSION):
+        self.max_entries = max_entries
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS results (volume_id INTEGER, paper_id INTEGER, version TEXT, etag TEXT, "
+                               "payload TEXT, PRIMARY KEY (volume_id, paper_id, version))")
+
+    def key(self, volume_id: int, paper_id: int) -> CacheKey:
+        return int(volume_id), int(paper_id), self.version
+
+    def _remember(self, key: CacheKey, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, volume_id: int, paper_id: int) -> Optional[dict]:
+        """ returns the cached entry of a paper or None """
+        key = self.key(volume_id, paper_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT etag, payload FROM results WHERE volume_id = ? AND paper_id = ? AND version = ?",
+                                     key).fetchone()
+            if row is None:
+                return None
+            entry = {'etag': row[0], 'payload': json.loads(row[1])}
+            self._remember(key, entry)
+            return entry
+
+    def put(self, volume_id: int, paper_id: int, payload: dict) -> dict:
+        """ stores the result of a paper and returns its entry """
+        key = self.key(volume_id, paper_id)
+        entry = {'etag': etag(payload), 'payload': payload}
+        with self._lock:
+            self._remember(key, entry)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                       (*key, entry['etag'], json.dumps(payload, ensure_ascii=False)))
+        return entry
+
+    def invalidate(self, volume_id: Optional[int] = None, paper_id: Optional[int] = None) -> int:
+        """
+        removes the cached results of all pipeline versions and returns the number of removed entries
+
+        volume_id: only remove the papers of this volume (default: all volumes)
+        paper_id: only remove this paper of the volume (default: all papers), requires volume_id
+        """
+        if paper_id is not None and volume_id is None:
+            # paper ids are only unique within a volume
+            raise ValueError("paper_id requires volume_id")
+        conditions, params = [], []
+        if volume_id is not None:
+            conditions.append('volume_id = ?')
+            params.append(int(volume_id))
+            if paper_id is not None:
+                conditions.append('paper_id = ?')
+                params.append(int(paper_id))
+
+        def matches(key):
+            return volume_id is None or (key[0] == int(volume_id) and (paper_id is None or key[1] == int(paper_id)))
+
+        with self._lock:
+            removed = [key for key in self._entries if matches(key)]
+            for key in removed:
+                del self._entries[key]
+            if self._conn is None:
+                return len(removed)
+            with self._conn:
+                where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+                cursor = self._conn.execute("DELETE FROM results" + where, params)
+            return max(len(removed), cursor.rowcount)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, Optional
+
+
+# Stable schema of the rows written by parse_volumes (one row per author of a paper)
+SCHEMA = ['Volume', 'Proceedings', 'Event', 'Paper title', 'Author name', 'Author Affiliations', 'Author E-Mail', 'URL', 'Source',
+          'ORCID', 'Author Wikidata ID', 'Paper Wikidata ID']
+
+
+def to_record(row: dict) -> dict:
+    """ brings a row into the order of SCHEMA, missing values are stored as empty strings """
+    record = {column: row.get(column) or '' for column in SCHEMA}
+    record['Volume'] = int(row.get('Volume') or 0)
+    return record
+
+
+class OutputSink(ABC):
+    """
+    Base class for the output of batch runs. Rows are buffered and flushed in chunks of `chunk_size`,
+    so memory stays bounded and the rows processed so far survive a failure of the run.
+    """
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self.rows_written = 0
+
+    def write(self, row: dict):
+        self._buffer.append(to_record(row))
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[dict]):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            self._write_chunk(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+
+    def read(self, columns: Optional[List[str]] = None):
+        """ returns the rows written so far as a pandas DataFrame, optionally only the given columns """
+        import pandas as pd
+        return pd.DataFrame(list(self.iter_rows()), columns=columns or SCHEMA)
+
+    @abstractmethod
+    def iter_rows(self) -> Iterator[dict]:
+        """ yields the rows written so far """
+
+    @abstractmethod
+    def drop_volumes(self, volume_ids: Iterable[int]):
+        """ removes the rows of the given volumes from the output, e.g. rows of unfinished volumes before they are processed again """
+
+    @abstractmethod
+    def _write_chunk(self, rows: List[dict]):
+        """ writes a chunk of records to the output """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class MemorySink(OutputSink):
+    """ keeps all rows in memory, only suited for small runs (e.g. the evaluation on the test volumes) """
+    def __init__(self, chunk_size: int = 1000):
+        super().__init__(chunk_size)
+        self.rows = []
+
+    def _write_chunk(self, rows: List[dict]):
+        self.rows.extend(rows)
+
+    def iter_rows(self) -> Iterator[dict]:
+        return iter(self.rows)
+
+    def drop_volumes(self, volume_ids: Iterable[int]):
+        volume_ids = {int(v) for v in volume_ids}
+        self.rows = [row for row in self.rows if row['Volume'] not in volume_ids]
+
+
+class NullSink(OutputSink):
+    """ discards all rows, for runs whose only output is the knowledge graph """
+    def _write_chunk(self, rows: List[dict]):
+        pass
+
+    def drop_volumes(self, volume_ids: Iterable[int]):
+        pass
+
+    def iter_rows(self) -> Iterator[dict]:
+        return iter(())
+
+
+class JsonlSink(OutputSink):
+    """ appends rows as JSON lines to a single file, a last line cut off by a crash is ignored and overwritten """
+    def __init__(self, path: str, chunk_size: int = 1000):
+        super().__init__(chunk_size)
+        self.path = path
+        self._repaired = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _remove_partial_line(self):
+        """ truncates the file after its last complete line, so new rows are not appended to a cut off one """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            f.seek(0)
+            f.truncate(f.read().rfind(b'\n') + 1)
+
+    def _write_chunk(self, rows: List[dict]):
+        if not self._repaired:
+            self._remove_partial_line()
+            self._repaired = True
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+    def iter_rows(self) -> Iterator[dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                # a line without line break was cut off while it was written
+                if line.strip() and line.endswith('\n'):
+                    yield json.loads(line)
+
+    def drop_volumes(self, volume_ids: Iterable[int]):
+        volume_ids = {int(v) for v in volume_ids}
+        if not volume_ids or not os.path.exists(self.path):
+            return
+        tmp_path = self.path + '.tmp'
+        with open(self.path, encoding='utf-8') as f, open(tmp_path, 'w', encoding='utf-8') as out:
+            # a line cut off by a crash is dropped as well
+            out.writelines(line for line in f
+                           if line.strip() and line.endswith('\n') and json.loads(line)['Volume'] not in volume_ids)
+        os.replace(tmp_path, self.path)
+
+
+class ParquetSink(OutputSink):
+    """ writes every chunk as new parquet files into a dataset partitioned by volume (<path>/Volume=<id>/...) """
+    def __init__(self, path: str, chunk_size: int = 10000):
+        import pyarrow as pa
+        super().__init__(chunk_size)
+        self.path = path
+        self.schema = pa.schema([('Volume', pa.int32())] + [(column, pa.string()) for column in SCHEMA[1:]])
+        os.makedirs(path, exist_ok=True)
+
+    def _write_chunk(self, rows: List[dict]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        pq.write_to_dataset(table, self.path, partition_cols=['Volume'])
+
+    def read(self, columns: Optional[List[str]] = None):
+        """ reads only the requested columns from the parquet dataset """
+        import pandas as pd
+        if not os.listdir(self.path):
+            return pd.DataFrame(columns=columns or SCHEMA)
+        df = pd.read_parquet(self.path, columns=columns)
+        if 'Volume' in df.columns:
+            df['Volume'] = df['Volume'].astype(int)
+        return df
+
+    def iter_rows(self) -> Iterator[dict]:
+        import pyarrow.dataset as ds
+        if not os.listdir(self.path):
+            return
+        dataset = ds.dataset(self.path, format='parquet', partitioning='hive')
+        for batch in dataset.to_batches():
+            yield from batch.to_pylist()
+
+    def drop_volumes(self, volume_ids: Iterable[int]):
+        for volume_id in volume_ids:
+            shutil.rmtree(os.path.join(self.path, f'Volume={int(volume_id)}'), ignore_errors=True)
+
+
+def create_sink(kind: str, path: Optional[str] = None, chunk_size: Optional[int] = None) -> OutputSink:
+    """ creates an output sink by name: memory, none, jsonl or parquet """
+    kwargs = {'chunk_size': chunk_size} if chunk_size else {}
+    if kind == 'memory':
+        return MemorySink(**kwargs)
+    if kind == 'none':
+        return NullSink(**kwargs)
+    if path is None:
+        raise ValueError(f"An output path is required for the {kind} sink")
+    if kind == 'jsonl':
+        return JsonlSink(path, **kwargs)
+    if kind == 'parquet':
+        return ParquetSink(path, **kwargs)
+    raise ValueError(f"Unknown output sink: {kind}")
@@ -0,0 +1,55 @@
+import importlib.util
+import re
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Helpers to keep the start of the service fast:
+#  - lazy_import defers loading heavy dependencies until they are used for the first time
+#  - import_profile shows which imports the start-up time is spent on
+
+
+def lazy_import(name: str):
+    """ returns the module `name`, which is only executed on its first attribute access """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+_IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_import_times(output: str) -> List[Tuple[str, float, float]]:
+    """ parses the output of `python -X importtime` into (package, cumulative ms, self ms) of the top-level imports """
+    result = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        # nested imports are indented by two spaces per level
+        if match and len(match.group(3)) <= 1:
+            result.append((match.group(4), int(match.group(2)) / 1000, int(match.group(1)) / 1000))
+    return result
+
+
+def import_profile(module: str = 'paper_semantification.main', top: int = 20) -> List[Tuple[str, float, float]]:
+    """ imports the module in a fresh interpreter and returns its most expensive top-level imports """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.splitlines()[-1] if completed.stderr else f'import of {module} failed')
+    return sorted(parse_import_times(completed.stderr), key=lambda t: t[1], reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    # Usage: python -m paper_semantification.startup [module]
+    module = sys.argv[1] if len(sys.argv) > 1 else 'paper_semantification.main'
+    profile = import_profile(module)
+    print(f"{'cumulative [ms]':>16} {'self [ms]':>10}  package")
+    for package, cumulative, own in profile:
+        print(f"{cumulative:16.1f} {own:10.1f}  {package}")
@@ -0,0 +1,344 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from paper_semantification import WORK_LEASE_SECONDS, WORK_MAX_ATTEMPTS, WORK_QUEUE_PATH
+
+# Work queue of distributed crawls: volumes are enqueued once, any number of worker processes (on one or several nodes
+# sharing the SQLite file) lease tasks, process them and acknowledge them.
+#   - a volume task lists the papers of the volume and enqueues one paper task per paper, so a large volume is spread
+#     over all workers
+#   - a lease expires after `lease_seconds` unless the worker sends heartbeats, tasks of crashed workers are leased again
+#   - every lease gets a new fencing token, a worker whose lease expired can no longer acknowledge or release the task
+#   - the rows of a paper are stored together with its acknowledgement in one transaction and exported from the queue,
+#     so each paper ends up in the output exactly once even if it was processed twice
+#   - the knowledge graph is written by a single process from the stored rows (sync_graph_from_queue), so the author ids
+#     and institutions come from the same AuthorIndex and AffiliationDictionary as in parse_volumes
+# SQLite relies on file locks: all workers have to reach the file through a local disk or a volume mounted into the
+# containers of one host, not through a network file system.
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+
+@dataclass
+class Lease:
+    """ a task leased by a worker, only the holder of the current token can acknowledge it """
+    kind: str
+    key: str
+    payload: dict
+    token: int
+    attempts: int
+
+
+class WorkQueue:
+    """
+    Tasks of a distributed crawl in a SQLite file shared by all workers
+
+    path: SQLite file of the queue
+    lease_seconds: time after which a task whose worker stopped sending heartbeats is leased again
+    max_attempts: leases of a task before it is marked as failed
+    """
+    def __init__(self, path: str = WORK_QUEUE_PATH, lease_seconds: float = WORK_LEASE_SECONDS, max_attempts: int = WORK_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # autocommit, transactions are started explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tasks (kind TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, "
+                           "state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, token INTEGER NOT NULL DEFAULT 0, "
+                           "owner TEXT, lease_until REAL, error TEXT, updated REAL, PRIMARY KEY (kind, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_until)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results (kind TEXT NOT NULL, key TEXT NOT NULL, rows TEXT NOT NULL, "
+                           "PRIMARY KEY (kind, key))")
+        # the heartbeat thread of a worker shares the connection
+        self._lock = threading.Lock()
+
+    def _transaction(self, work):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, kind: str, items: Iterable[Tuple[str, dict]]) -> int:
+        """ adds (key, payload) tasks, tasks that are already in the queue are left as they are. Returns the number of new tasks. """
+        rows = [(kind, str(key), json.dumps(payload), PENDING, time.time()) for key, payload in items]
+
+        def work(conn):
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks (kind, key, payload, state, updated) VALUES (?, ?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+        return self._transaction(work)
+
+    def lease(self, owner: str, kinds: Optional[List[str]] = None) -> Optional[Lease]:
+        """ leases the oldest pending or expired task (of the given kinds), or returns None if there is none """
+        def work(conn):
+            now = time.time()
+            kind_filter = f"AND kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+            while True:
+                row = conn.execute(f"SELECT kind, key, payload, attempts, token FROM tasks "
+                                   f"WHERE (state = ? OR (state = ? AND lease_until < ?)) {kind_filter} ORDER BY rowid LIMIT 1",
+                                   (PENDING, LEASED, now, *(kinds or []))).fetchone()
+                if row is None:
+                    return None
+                kind, key, payload, attempts, token = row
+                if attempts >= self.max_attempts:
+                    # the last worker of the task crashed or hung
+                    conn.execute("UPDATE tasks SET state = ?, owner = NULL, error = coalesce(error, 'lease expired'), updated = ? "
+                                 "WHERE kind = ? AND key = ?", (FAILED, now, kind, key))
+                    continue
+                conn.execute("UPDATE tasks SET state = ?, owner = ?, attempts = ?, token = ?, lease_until = ?, updated = ? "
+                             "WHERE kind = ? AND key = ?",
+                             (LEASED, owner, attempts + 1, token + 1, now + self.lease_seconds, now, kind, key))
+                return Lease(kind=kind, key=key, payload=json.loads(payload), token=token + 1, attempts=attempts + 1)
+        return self._transaction(work)
+
+    def _holds(self, conn, lease: Lease) -> bool:
+        row = conn.execute("SELECT state, token FROM tasks WHERE kind = ? AND key = ?", (lease.kind, lease.key)).fetchone()
+        return row is not None and row[0] == LEASED and row[1] == lease.token
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """ extends the lease, returns False if the task was leased to another worker in the meantime """
+        def work(conn):
+            if not self._holds(conn, lease):
+                return False
+            conn.execute("UPDATE tasks SET lease_until = ? WHERE kind = ? AND key = ?",
+                         (time.time() + self.lease_seconds, lease.kind, lease.key))
+            return True
+        return self._transaction(work)
+
+    def ack(self, lease: Lease, rows: Optional[List[dict]] = None) -> bool:
+        """
+        marks the task as done and stores its output rows in the same transaction.
+        Returns False, without storing anything, if the lease was lost to another worker.
+        """
+        def work(conn):
+            if not self._holds(conn, lease):
+                return False
+            conn.execute("UPDATE tasks SET state = ?, owner = NULL, lease_until = NULL, error = NULL, updated = ? WHERE kind = ? AND key = ?",
+                         (DONE, time.time(), lease.kind, lease.key))
+            if rows is not None:
+                conn.execute("INSERT OR REPLACE INTO results (kind, key, rows) VALUES (?, ?, ?)",
+                             (lease.kind, lease.key, json.dumps(rows, ensure_ascii=False)))
+            return True
+        return self._transaction(work)
+
+    def release(self, lease: Lease, error: str) -> bool:
+        """ gives a failed task back to the queue, it is marked as failed after max_attempts """
+        def work(conn):
+            if not self._holds(conn, lease):
+                return False
+            state = FAILED if lease.attempts >= self.max_attempts else PENDING
+            conn.execute("UPDATE tasks SET state = ?, owner = NULL, lease_until = NULL, error = ?, updated = ? WHERE kind = ? AND key = ?",
+                         (state, error, time.time(), lease.kind, lease.key))
+            return True
+        return self._transaction(work)
+
+    def retry_failed(self) -> int:
+        """ puts the failed tasks back into the queue with a new budget of attempts """
+        def work(conn):
+            return conn.execute("UPDATE tasks SET state = ?, attempts = 0, updated = ? WHERE state = ?",
+                                (PENDING, time.time(), FAILED)).rowcount
+        return self._transaction(work)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """ number of tasks per kind and state, leases that expired are counted as pending """
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, CASE WHEN state = ? AND lease_until < ? THEN ? ELSE state END AS s, count(*) "
+                                      "FROM tasks GROUP BY kind, s", (LEASED, time.time(), PENDING)).fetchall()
+        stats = {}
+        for kind, state, count in rows:
+            stats.setdefault(kind, {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0})[state] = count
+        return stats
+
+    def unfinished(self) -> int:
+        """ number of tasks that are pending or leased """
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM tasks WHERE state IN (?, ?)", (PENDING, LEASED)).fetchone()[0]
+
+    def failures(self) -> List[Tuple[str, str, str]]:
+        with self._lock:
+            return self._conn.execute("SELECT kind, key, error FROM tasks WHERE state = ? ORDER BY rowid", (FAILED,)).fetchall()
+
+    def results(self, kind: str = 'paper') -> Iterator[dict]:
+        """ yields the stored output rows of the acknowledged tasks, in the order the tasks were enqueued """
+        with self._lock:
+            stored = self._conn.execute("SELECT r.rows FROM results r JOIN tasks t ON t.kind = r.kind AND t.key = r.key "
+                                        "WHERE r.kind = ? ORDER BY t.rowid", (kind,)).fetchall()
+        for (rows,) in stored:
+            yield from json.loads(rows)
+
+    def task_results(self, kind: str = 'paper') -> Iterator[Tuple[str, List[dict]]]:
+        """ yields (key, output rows) of the acknowledged tasks, in the order the tasks were enqueued """
+        with self._lock:
+            stored = self._conn.execute("SELECT r.key, r.rows FROM results r JOIN tasks t ON t.kind = r.kind AND t.key = r.key "
+                                        "WHERE r.kind = ? ORDER BY t.rowid", (kind,)).fetchall()
+        for key, rows in stored:
+            yield key, json.loads(rows)
+
+    def close(self):
+        self._conn.close()
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Worker:
+    """
+    Leases tasks, processes them with `handler` and acknowledges them, until the queue is drained
+
+    handler: called with a Lease, returns the output rows of the task (or None). Exceptions give the task back to the queue.
+    poll_interval: pause while all remaining tasks are leased by other workers
+    """
+    def __init__(self, queue: WorkQueue, handler: Callable[[Lease], Optional[List[dict]]], owner: Optional[str] = None,
+                 poll_interval: float = 1.0):
+        self.queue = queue
+        self.handler = handler
+        self.owner = owner or default_owner()
+        self.poll_interval = poll_interval
+        self.done = 0
+        self.failed = 0
+        # acknowledgements that were rejected because the lease had expired and the task was leased again
+        self.fenced = 0
+
+    def _heartbeat(self, lease: Lease, stop: threading.Event):
+        while not stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(lease):
+                print(f"Lost the lease of {lease.kind} {lease.key}")
+                return
+
+    def process(self, lease: Lease):
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(lease, stop), daemon=True)
+        heartbeat.start()
+        try:
+            rows = self.handler(lease)
+        except Exception as e:
+            stop.set()
+            print(f"{lease.kind} {lease.key} failed (attempt {lease.attempts}): {e}")
+            self.failed += 1
+            if not self.queue.release(lease, str(e)):
+                self.fenced += 1
+            return
+        finally:
+            stop.set()
+            heartbeat.join()
+        if self.queue.ack(lease, rows):
+            self.done += 1
+        else:
+            self.fenced += 1
+
+    def run(self, stop: Optional[threading.Event] = None):
+        """ processes tasks until no task is pending or leased anymore (or stop is set) """
+        while stop is None or not stop.is_set():
+            lease = self.queue.lease(self.owner)
+            if lease is not None:
+                self.process(lease)
+            elif self.queue.unfinished():
+                # tasks of other workers, leased again if they crash
+                time.sleep(self.poll_interval)
+            else:
+                break
+        print(f"Worker {self.owner}: {self.done} tasks done, {self.failed} failed, {self.fenced} rejected after their lease expired")
+
+
+def enqueue_volumes(queue: WorkQueue, volume_ids: Iterable) -> int:
+    return queue.enqueue('volume', ((str(int(v)), {}) for v in volume_ids))
+
+
+class CrawlHandler:
+    """
+    Processes the tasks of a crawl: volume tasks enqueue their papers, paper tasks return the rows of the paper
+
+    queue: queue the paper tasks are added to
+    """
+    def __init__(self, queue: WorkQueue):
+        self.queue = queue
+
+    def __call__(self, lease: Lease) -> Optional[List[dict]]:
+        # imported here, as the parser loads all extraction dependencies
+        from paper_semantification.parser import extract_paper_metadata, get_volume_events, list_volume_papers
+        if lease.kind == 'volume':
+            volume_id = int(lease.key)
+            events = get_volume_events(volume_id)
+            self.queue.enqueue('paper', ((f'{volume_id}/{paper_key}', {'volume_id': volume_id, 'paper_key': paper_key, 'events': events})
+                                         for paper_key in list_volume_papers(volume_id)))
+            return None
+        volume_id, paper_key, events = lease.payload['volume_id'], lease.payload['paper_key'], lease.payload['events']
+        metadata = extract_paper_metadata(volume_id, paper_key, {volume_id: events} if events else {})
+        if metadata.errors:
+            # processed again later, possibly by another worker
+            raise RuntimeError('; '.join(metadata.errors))
+        return metadata.to_rows()
+
+
+def run_crawl_worker(path: str = WORK_QUEUE_PATH, lease_seconds: float = WORK_LEASE_SECONDS):
+    """ runs a worker of a crawl until the queue is drained, the entry point of the worker processes """
+    queue = WorkQueue(path, lease_seconds=lease_seconds)
+    try:
+        Worker(queue, CrawlHandler(queue)).run()
+    finally:
+        queue.close()
+
+
+def authors_of_rows(rows: List[dict]) -> list:
+    """ Authors of a paper from its output rows (see PaperMetadata.to_rows) """
+    from paper_semantification.parser import Author
+
+    def split(value, separator):
+        return [part.strip() for part in value.split(separator) if part.strip()] if value else []
+
+    return [Author(row['Author name'], affiliation=split(row.get('Author Affiliations', ''), '; '),
+                   email=split(row.get('Author E-Mail', ''), ', '), orcid=row.get('ORCID') or None,
+                   wikidata_id=row.get('Author Wikidata ID') or None)
+            for row in rows if row.get('Author name')]
+
+
+def sync_graph_from_queue(queue: WorkQueue, cache_dir: Optional[str] = None) -> int:
+    """
+    writes the finished papers of the queue into the knowledge graph with delta synchronization (see knowledge_graph/sync.py)
+    and returns the number of changed papers. Papers that did not change since the last call are skipped by their content hash,
+    so this can be repeated while the crawl is still running.
+
+    cache_dir: directory of the author index and affiliation dictionary (default: the configured paths), as in parse_volumes
+    """
+    from paper_semantification import AFFILIATION_DICTIONARY_PATH, AUTHOR_INDEX_PATH, NEO4J_URI
+    from paper_semantification.knowledge_graph.affiliations import AffiliationDictionary
+    from paper_semantification.knowledge_graph.author_index import AuthorIndex
+    from paper_semantification.knowledge_graph.main import Neo4jConnection
+    from paper_semantification.knowledge_graph.utils import create_neo4j_constraints, sync_neo4j_graph
+
+    author_index = AuthorIndex(os.path.join(cache_dir, 'author_index.json') if cache_dir else AUTHOR_INDEX_PATH)
+    affiliation_dictionary = AffiliationDictionary(os.path.join(cache_dir, 'affiliations.json') if cache_dir else AFFILIATION_DICTIONARY_PATH)
+    neo4j_conn = Neo4jConnection(uri=NEO4J_URI)
+    neo4j_conn.connect()
+    changed = 0
+    try:
+        create_neo4j_constraints(neo4j_conn)
+        for key, rows in queue.task_results('paper'):
+            if not rows:
+                continue
+            paper = rows[0]
+            result = sync_neo4j_graph(author_list=authors_of_rows(rows), title=paper['Paper title'], proceeding=paper['Proceedings'],
+                                      event=paper['Event'], neo4j_connection=neo4j_conn, url=paper['URL'], author_index=author_index,
+                                      wikidata_id=paper.get('Paper Wikidata ID'), affiliation_dictionary=affiliation_dictionary,
+                                      volume=paper['Volume'])
+            changed += result.changed
+    finally:
+        author_index.save()
+        affiliation_dictionary.save()
+        neo4j_conn.close()
+    return changed
@@ -0,0 +1,28 @@
+import atexit
+import importlib
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+
+_stub_dir = None
+
+
+def stub_missing_modules(*names):
+    """
+    registers empty stand-ins for the given modules if they are not installed (e.g. dblp, which is installed from git in the image),
+    so the modules that import them can be tested without the full build environment
+
+    The stand-ins are files in a temporary directory on sys.path, so spawned worker processes find them as well.
+    """
+    global _stub_dir
+    for name in names:
+        if name not in sys.modules and importlib.util.find_spec(name) is None:
+            if _stub_dir is None:
+                _stub_dir = tempfile.mkdtemp(prefix='module_stubs')
+                sys.path.append(_stub_dir)
+                atexit.register(shutil.rmtree, _stub_dir, True)
+            open(os.path.join(_stub_dir, f'{name}.py'), 'w').close()
+            importlib.invalidate_caches()
+            importlib.import_module(name)
@@ -0,0 +1,39 @@
+import unittest
+
+from paper_semantification.knowledge_graph.affiliations import AffiliationDictionary, canonical_affiliations, institution_segment
+
+
+class AffiliationDictionaryTest(unittest.TestCase):
+    def test_institution_segment(self):
+        self.assertEqual('University of Bonn', institution_segment('Institute of Computer Science, University of Bonn, Germany'))
+        self.assertEqual('Max Planck Institute for Informatics', institution_segment('Max Planck Institute for Informatics, Saarbrücken'))
+        self.assertEqual('Acme', institution_segment('Acme, Berlin'))
+
+    def test_variants_of_an_institution_are_merged(self):
+        dictionary = AffiliationDictionary()
+        for variants in [['ITMO University', 'ITMO University, Saint-Petersburg 197101, Russia'],
+                         ['RWTH Aachen University', 'Dept. of CS, RWTH Aachen University', 'RWTH Aachen University, Aachen, Germany'],
+                         ['University of Bonn', 'Univ. of Bonn, Germany', 'Institute of Computer Science, University of Bonn']]:
+            ids = {dictionary.canonicalize(variant)[0] for variant in variants}
+            self.assertEqual(1, len(ids), variants)
+
+    def test_different_institutions_are_kept_apart(self):
+        dictionary = AffiliationDictionary()
+        for first, second in [('Institute of Computer Science, University of Bonn', 'Institute of Computer Science, University of Tartu'),
+                              ('School of Computing, Dublin City University', 'School of Computing, National University of Singapore'),
+                              ('RWTH Aachen University', 'University of Bonn')]:
+            self.assertNotEqual(dictionary.canonicalize(first)[0], dictionary.canonicalize(second)[0], (first, second))
+
+    def test_ties_are_resolved_by_id(self):
+        for order in (['b', 'a'], ['a', 'b']):
+            dictionary = AffiliationDictionary(threshold=50)
+            for affiliation_id in order:
+                dictionary._add(affiliation_id, f'Lab {affiliation_id}', [f'lab x{affiliation_id}'])
+            self.assertEqual('a', dictionary._fuzzy_match('lab xc'))
+
+    def test_without_dictionary(self):
+        self.assertEqual(1, len(canonical_affiliations(['University of Bonn', ' University of Bonn ', ''])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from unittest import mock
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from fastapi.testclient import TestClient
+
+from paper_semantification import main
+from paper_semantification.knowledge_graph.queries import GraphReader, TTLCache
+from paper_semantification.result_cache import ResultCache
+
+
+def payload(errors=(), title="Take it Personally"):
+    return {"paper_path": "http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper23", "paper_title": title,
+            "name": ["Konrad U. Förstner"] if title else [], "affiliation": [""], "email": [""], "proceeding": "", "event": "",
+            "errors": list(errors)}
+
+
+class SinglePaperTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+        self.calls = []
+        self.result = payload()
+
+        def extract(volume_id, paper_id):
+            self.calls.append((volume_id, paper_id))
+            return self.result
+
+        patches = [mock.patch.object(main, 'result_cache', ResultCache(path=None)), mock.patch.object(main, 'extract_single_paper', extract)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def get(self, **headers):
+        return self.client.get('/metadata/single_paper', params={'volume_id': 2451, 'paper_id': 23}, headers=headers)
+
+    def test_conditional_requests(self):
+        first = self.get()
+        self.assertEqual(200, first.status_code)
+        self.assertEqual("Take it Personally", first.json()["paper_title"])
+        tag = first.headers['etag']
+        for if_none_match in (tag, f'"other", W/{tag}', '*'):
+            response = self.get(**{'If-None-Match': if_none_match})
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(tag, response.headers['etag'])
+            self.assertEqual(b'', response.content)
+        self.assertEqual(200, self.get(**{'If-None-Match': '"other"'}).status_code)
+        # the paper was only extracted once
+        self.assertEqual([(2451, 23)], self.calls)
+
+    def test_failures_are_not_cached(self):
+        self.result = payload(errors=['grobid: HTTP 503'])
+        response = self.get()
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('etag', response.headers)
+        self.result = payload(errors=['grobid: HTTP 503', 'openai: timeout'], title='')
+        self.assertEqual(502, self.get().status_code)
+        self.assertEqual(2, len(self.calls))
+
+    def test_invalidate(self):
+        self.get()
+        self.assertEqual(422, self.client.delete('/metadata/cache', params={'paper_id': 23}).status_code)
+        self.assertEqual({'invalidated': 1}, self.client.delete('/metadata/cache', params={'volume_id': 2451, 'paper_id': 23}).json())
+        self.get()
+        self.assertEqual(2, len(self.calls))
+
+
+class RecordingConnection:
+    """ answers every read query with two items and records the queries """
+    def __init__(self):
+        self.queries = []
+
+    def read_query(self, query, parameters):
+        self.queries.append((query, parameters))
+        return [{'url': 'paper1.pdf', 'author_id': 'a1', 'affiliation_id': 'aff1'},
+                {'url': 'paper2.pdf', 'author_id': 'a2', 'affiliation_id': 'aff2'}][:parameters['limit']]
+
+    def close(self):
+        pass
+
+
+class GraphEndpointsTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+        reader = GraphReader(cache=TTLCache(ttl=0))
+        reader.connection = self.connection = RecordingConnection()
+        reader._connected = True
+        patch = mock.patch.object(main, 'graph_reader', reader)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_endpoints(self):
+        cases = [('/graph/volumes/2451/papers', {}, {'volume': 2451}, 'p.url', 'paper2.pdf'),
+                 ('/graph/papers/authors', {'url': 'paper1.pdf'}, {'url': 'paper1.pdf'}, 'a.author_id', 'a2'),
+                 ('/graph/authors/a1/papers', {}, {'author_id': 'a1'}, 'p.url', 'paper2.pdf'),
+                 ('/graph/authors/a1/coauthors', {}, {'author_id': 'a1'}, 'c.author_id', 'a2'),
+                 ('/graph/authors/a1/affiliations', {}, {'author_id': 'a1'}, 'aff.affiliation_id', 'aff2')]
+        for path, params, parameters, order_by, cursor in cases:
+            with self.subTest(path):
+                response = self.client.get(path, params={**params, 'after': 'x', 'limit': 2})
+                self.assertEqual(200, response.status_code)
+                self.assertEqual(cursor, response.json()['next'])
+                query, sent = self.connection.queries[-1]
+                self.assertEqual({**parameters, 'after': 'x', 'limit': 2}, sent)
+                self.assertIn(f'AND {order_by} > $after', query)
+                # the last page has no cursor
+                self.assertIsNone(self.client.get(path, params={**params, 'limit': 3}).json()['next'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(422, self.client.get('/graph/volumes/2451/papers', params={'limit': 0}).status_code)
+        self.assertEqual(422, self.client.get('/graph/volumes/2451/papers', params={'limit': 501}).status_code)
+        self.assertEqual(422, self.client.get('/graph/papers/authors').status_code)
+        self.assertEqual(422, self.client.get('/graph/volumes/Vol-2451/papers').status_code)
+        self.assertEqual([], self.connection.queries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import pickle
+import unittest
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from paper_semantification.parser import Author, as_tuple
+
+
+class AuthorTest(unittest.TestCase):
+    def test_as_tuple(self):
+        self.assertEqual((), as_tuple(None))
+        self.assertEqual(('a@b.de',), as_tuple('a@b.de'))
+        self.assertEqual(('RWTH', 'Bonn'), as_tuple(['RWTH', '', ['Bonn']]))
+        self.assertEqual(('RWTH Aachen University, Germany',), as_tuple([{'name': 'RWTH Aachen University', 'country': 'Germany'}]))
+
+    def test_nested_values_are_hashable(self):
+        # OpenAI sometimes returns lists or objects inside the affiliations and emails
+        author = Author('Alice Smith', [['RWTH Aachen University'], {'name': 'University of Bonn'}], [['a@b.de']])
+        duplicate = Author('Alice Smith', ('RWTH Aachen University', 'University of Bonn'), 'a@b.de')
+        self.assertEqual([author], list(dict.fromkeys([author, duplicate])))
+        self.assertEqual(author, pickle.loads(pickle.dumps(author)))
+        self.assertEqual('', Author(None).name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+from paper_semantification.knowledge_graph.author_index import AuthorIndex, blocking_keys, name_tokens
+from paper_semantification.knowledge_graph.bulk_import import stable_id
+
+
+class AuthorIndexTest(unittest.TestCase):
+    def test_blocking_keys(self):
+        self.assertEqual(['konrad', 'u', 'forstner'], name_tokens('Förstner, Konrad U.'))
+        self.assertEqual(['name:forstner k', 'email:konrad.foerstner', 'orcid:0000-0002-1481-2996'],
+                         blocking_keys('Konrad U. Förstner', ['Konrad.Foerstner@th-koeln.de'], '0000-0002-1481-2996'))
+
+    def test_variants_of_an_author_are_resolved_to_one_id(self):
+        index = AuthorIndex()
+        first = index.resolve('Konrad U. Förstner', 'foerstner@zbmed.de', 'ZB MED')
+        self.assertEqual(stable_id('Author', 'Konrad U. Förstner'), first)
+        # same name without middle initial and a known email
+        self.assertEqual(first, index.resolve('Konrad Förstner', ['foerstner@zbmed.de']))
+        # same name and a matching affiliation
+        self.assertEqual(first, index.resolve('Konrad U. Forstner', affiliation=['ZB MED - Information Centre for Life Sciences']))
+
+    def test_namesakes_are_kept_apart(self):
+        index = AuthorIndex()
+        first = index.resolve('Wei Wang', 'wei@rwth-aachen.de', 'RWTH Aachen University')
+        second = index.resolve('Wei Wang', 'wang@tsinghua.edu.cn', 'Tsinghua University')
+        self.assertNotEqual(first, second)
+        self.assertEqual(stable_id('Author', 'Wei Wang', 1), second)
+        # different ORCID iDs are never merged, the same ORCID iD always is
+        self.assertNotEqual(first, index.resolve('W. Wang', orcid='0000-0001'))
+        self.assertEqual(index.resolve('Wei Wang', orcid='0000-0001'), index.resolve('Wang, Wei', orcid='0000-0001'))
+
+    def test_orcid_match_wins_over_namesakes(self):
+        index = AuthorIndex()
+        index.resolve('Wei Wang', affiliation='RWTH Aachen University')
+        with_orcid = index.resolve('Wei Wang', affiliation='Tsinghua University', orcid='0000-0002')
+        # the namesake without ORCID iD scores as high by name alone
+        for _ in range(3):
+            self.assertEqual(with_orcid, index.resolve('Wei Wang', orcid='0000-0002'))
+
+    def test_candidates_share_a_blocking_key(self):
+        index = AuthorIndex()
+        index.resolve('Alice Smith', 'alice@example.org')
+        index.resolve('Bob Jones', 'bob@example.org')
+        self.assertEqual(1, len(index.candidates('A. Smith', [])))
+        self.assertEqual(0, len(index.candidates('Carol White', [])))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data', 'author_index.json')
+            index = AuthorIndex(path)
+            author_id = index.resolve('Alice Smith', 'alice@example.org')
+            index.save()
+            loaded = AuthorIndex(path)
+            self.assertEqual(author_id, loaded.resolve('Alice Smith', 'alice@example.org'))
+            # nothing changed, so the file is not written again
+            self.assertFalse(loaded.changed)
+            os.remove(path)
+            loaded.save()
+            self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from paper_semantification.knowledge_graph.bulk_import import export_import_files, stable_id
+
+
+URL = 'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper-23.pdf'
+ROWS = [
+    {'Volume': 2451, 'Proceedings': 'Proc. A', 'Event': 'Event A', 'Paper title': 'Take it Personally', 'URL': URL,
+     'Author name': 'Konrad U. Förstner', 'Author Affiliations': 'ZB MED; TH Köln', 'Author E-Mail': 'a@zbmed.de'},
+    {'Volume': 2451, 'Proceedings': 'Proc. A', 'Event': 'Event A', 'Paper title': 'Take it Personally', 'URL': URL,
+     'Author name': 'Jane Doe', 'Author Affiliations': '', 'Author E-Mail': ''},
+    # same author again, e.g. from a repeated run
+    {'Volume': 2451, 'Proceedings': 'Proc. A', 'Event': 'Event A', 'Paper title': 'Take it Personally', 'URL': URL,
+     'Author name': 'Konrad U. Förstner', 'Author Affiliations': 'ZB MED; TH Köln', 'Author E-Mail': 'a@zbmed.de'},
+]
+
+
+def read_csv(out_dir, filename):
+    with open(os.path.join(out_dir, filename), newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))[1:]
+
+
+class BulkImportTest(unittest.TestCase):
+    def test_export_deduplicates_nodes_and_relationships(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            command = export_import_files(ROWS, out_dir)
+            self.assertIn('--nodes=Paper=/var/lib/neo4j/import/paper.csv', command)
+
+            self.assertEqual([[stable_id('Paper', URL), 'Take it Personally', URL, '', '2451']], read_csv(out_dir, 'paper.csv'))
+            authors = read_csv(out_dir, 'author.csv')
+            self.assertEqual(['Konrad U. Förstner', 'Jane Doe'], [a[1] for a in authors])
+            self.assertEqual('ZB MED|TH Köln', authors[0][3])
+            self.assertEqual(2, len(read_csv(out_dir, 'authored.csv')))
+            self.assertEqual(['ZB MED', 'TH Köln'], [a[1] for a in read_csv(out_dir, 'affiliation.csv')])
+            self.assertEqual(2, len(read_csv(out_dir, 'affiliated_with.csv')))
+            self.assertEqual(2, len(read_csv(out_dir, 'participated_in.csv')))
+
+
+if __name__ == "__main__":
+    unittest.main()
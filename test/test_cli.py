@@ -0,0 +1,110 @@
+import argparse
+import io
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from paper_semantification import parser
+from paper_semantification.cli import Checkpoint, Progress, main, parse_volume_ranges
+from paper_semantification.parser import Author, PaperMetadata
+
+
+def discover_volumes(volume_ids):
+    for v in volume_ids:
+        yield int(v), ['paper1', 'paper2'], None
+
+
+def extract_volume_papers(volume_id, paper_keys, events=None):
+    return [PaperMetadata(volume_id=volume_id, paper_key=key, paper_path=f'Vol-{volume_id}/{key}', title=key, authors=[Author('Alice Smith')])
+            for key in paper_keys]
+
+
+class CliTest(unittest.TestCase):
+    def test_parse_volume_ranges(self):
+        self.assertEqual([2000, 2002, 2451, 3498, 3499, 3500], parse_volume_ranges(['2451', '3498-3500', '2000,2002', '2451']))
+        self.assertEqual([], parse_volume_ranges([]))
+
+    def test_invalid_volume_ranges(self):
+        for spec in ['abc', '3500-3498', '1-2-3']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_volume_ranges([spec])
+
+    def test_checkpoint_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'data', 'checkpoint.json')
+            checkpoint = Checkpoint(path)
+            checkpoint.mark_done(2451)
+            checkpoint.mark_done('3498')
+            self.assertEqual([2000, 3499], Checkpoint(path).pending([2000, 2451, 3498, 3499]))
+
+    def test_progress_line(self):
+        stream = io.StringIO()
+        progress = Progress(3, stream=stream)
+        progress.update(2451, 10)
+        self.assertIn('[1/3 volumes] 10 papers', stream.getvalue())
+
+    @mock.patch.object(parser, 'discover_volumes', discover_volumes)
+    @mock.patch.object(parser, 'extract_volume_papers', extract_volume_papers)
+    def test_resume_does_not_duplicate_rows(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('sys.stderr', io.StringIO()):
+            output = os.path.join(tmp, 'rows.jsonl')
+            options = ['--resume', '--workers', '1', '--cache-dir', tmp, '--output', output]
+            main(['2451', '3498'] + options)
+            # rows of a volume flushed before the run was interrupted
+            with open(output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'Volume': 3499, 'Paper title': 'paper1'}) + '\n')
+            main(['2451', '3498-3499'] + options)
+            with open(output, encoding='utf-8') as f:
+                volumes = Counter(json.loads(line)['Volume'] for line in f)
+            self.assertEqual({2451: 2, 3498: 2, 3499: 2}, volumes)
+
+    @mock.patch.object(parser, 'discover_volumes', discover_volumes)
+    def test_failed_volume_is_retried_without_duplicates(self):
+        calls = []
+
+        def extract_with_failure(volume_id, paper_keys, events=None):
+            calls.append(volume_id)
+            papers = extract_volume_papers(volume_id, paper_keys, events)
+            if len(calls) == 1:
+                papers[1].errors.append('grobid: HTTP 503')
+            return papers
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('sys.stderr', io.StringIO()), \
+                mock.patch.object(parser, 'extract_volume_papers', extract_with_failure):
+            output = os.path.join(tmp, 'rows.jsonl')
+            options = ['2451', '--resume', '--workers', '1', '--cache-dir', tmp, '--output', output]
+            main(options)
+            main(options)
+            main(options)
+            with open(output, encoding='utf-8') as f:
+                self.assertEqual(2, len(f.readlines()))
+            # the third run has nothing left to do
+            self.assertEqual([2451, 2451], calls)
+
+    @mock.patch.object(parser, 'discover_volumes', discover_volumes)
+    @mock.patch.object(parser, 'extract_volume_papers', extract_volume_papers)
+    def test_existing_output_is_not_appended(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('sys.stderr', io.StringIO()):
+            output = os.path.join(tmp, 'rows.jsonl')
+            options = ['2451', '--workers', '1', '--cache-dir', tmp, '--output', output]
+            main(options)
+            with self.assertRaises(SystemExit):
+                main(options)
+            with open(output, encoding='utf-8') as f:
+                self.assertEqual(2, len(f.readlines()))
+
+    def test_sync_requires_neo4j_sink(self):
+        with mock.patch('sys.stderr', io.StringIO()) as stderr, self.assertRaises(SystemExit):
+            main(['2451', '--sync', '--sink', 'jsonl'])
+        self.assertIn('--sync requires --sink neo4j', stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import pickle
+import threading
+import time
+import unittest
+
+from paper_semantification.concurrency import (ConcurrencyController, HostLimiter, UpstreamError, collect_errors,
+                                               report_error)
+
+
+class HostLimiterTest(unittest.TestCase):
+    def test_additive_increase_and_multiplicative_decrease(self):
+        limiter = HostLimiter('example.org', initial=2, max_limit=8)
+        for _ in range(20):
+            limiter.acquire()
+            limiter.release(latency=0.1)
+        self.assertGreater(limiter.limit, 4)
+        limit = limiter.limit
+        limiter.acquire()
+        limiter.release(failed=True)
+        self.assertAlmostEqual(limit / 2, limiter.limit)
+        limit = limiter.limit
+        limiter.acquire()
+        limiter.release(latency=1.0)
+        self.assertLess(limiter.limit, limit)
+
+    def test_latency_baseline_per_request_class(self):
+        limiter = HostLimiter('ceurspt.wikidata.dbis.rwth-aachen.de', initial=4, max_limit=16)
+        for _ in range(100):
+            for request_class, latency in (('.grobid', 0.05), ('.pdf', 1.0)):
+                limiter.acquire()
+                limiter.release(latency=latency, request_class=request_class)
+        # slow PDF downloads do not lower the limit, as they are not compared with the small documents
+        self.assertEqual(16, limiter.limit)
+        limiter.acquire()
+        limiter.release(latency=5.0, request_class='.pdf')
+        self.assertLess(limiter.limit, 16)
+        # a single slow request only moves the average a little
+        self.assertLess(limiter.stats()['baseline_latency']['.pdf'], 1.5)
+
+    def test_limit_of_requests_in_flight(self):
+        limiter = HostLimiter('example.org', initial=3, max_limit=3)
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def request():
+            limiter.acquire()
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            limiter.release(latency=0.01)
+
+        threads = [threading.Thread(target=request) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(3, peak[0])
+
+    def test_circuit_breaker(self):
+        limiter = HostLimiter('example.org', failure_threshold=2, cooldown=0.1, max_wait=0.05)
+        for _ in range(2):
+            limiter.acquire()
+            limiter.release(failed=True)
+        self.assertTrue(limiter.is_open)
+        with self.assertRaises(UpstreamError):
+            limiter.acquire()
+        time.sleep(0.1)
+        # half-open: only one trial request
+        limiter.acquire()
+        self.assertEqual(0.05, limiter._try_start())
+        limiter.release(latency=0.01)
+        self.assertFalse(limiter.is_open)
+        limiter.acquire()
+        limiter.release(latency=0.01)
+
+    def test_retry_after_pauses_host(self):
+        limiter = HostLimiter('example.org')
+        limiter.acquire()
+        limiter.release(failed=True, retry_after=30)
+        self.assertTrue(limiter.is_open)
+        self.assertGreater(limiter._try_start(), 29)
+
+
+class ControllerTest(unittest.TestCase):
+    def test_call_raises_upstream_error(self):
+        controller = ConcurrencyController(failure_threshold=100)
+
+        def failing():
+            raise ConnectionError('connection reset')
+
+        with self.assertRaises(UpstreamError) as context:
+            controller.call('dblp.org', failing)
+        self.assertEqual('dblp.org', context.exception.host)
+        self.assertEqual(str(context.exception), str(pickle.loads(pickle.dumps(context.exception))))
+        self.assertEqual(1, controller.stats()['dblp.org']['failures'])
+        self.assertEqual(42, controller.call('dblp.org', lambda: 42))
+
+    def test_call_raises_other_errors_unchanged(self):
+        controller = ConcurrencyController(failure_threshold=1)
+
+        def parse_error():
+            raise KeyError('hits')
+
+        for _ in range(3):
+            with self.assertRaises(KeyError):
+                controller.call('dblp.org', parse_error)
+        stats = controller.stats()['dblp.org']
+        self.assertEqual((0, False), (stats['failures'], stats['open']))
+
+    def test_collect_errors(self):
+        with collect_errors() as errors:
+            report_error('dblp', UpstreamError('dblp.org', 'HTTP 429'))
+        self.assertEqual(['dblp: dblp.org: HTTP 429'], errors)
+        # outside of a collecting block errors are only printed
+        report_error('dblp', UpstreamError('dblp.org', 'HTTP 429'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from paper_semantification.disambiguation import (DisambiguationCache, OrcidClient, WikidataClient, confirmed_orcid,
+                                                  disambiguate_volume)
+from paper_semantification.parser import Author, PaperMetadata
+
+RECORDS = [{'orcid-id': '0000-0001', 'given-names': 'Alice', 'family-names': 'Smith', 'institution-name': ['RWTH Aachen University']},
+           {'orcid-id': '0000-0002', 'given-names': 'John', 'family-names': 'Doe', 'institution-name': ['University of Bonn']},
+           {'orcid-id': '0000-0003', 'given-names': 'John', 'family-names': 'Doe', 'email': ['john@tartu.ee']},
+           {'orcid-id': '0000-0004', 'given-names': 'Bob', 'family-names': 'Jones'}]
+
+
+class OrcidStandIn(BaseHTTPRequestHandler):
+    """ answers expanded searches like the ORCID public API, including its paging """
+    requests = []
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        self.requests.append(params)
+        names = re.findall(r'given-names:"(.*?)" AND family-name:"(.*?)"', params['q'])
+        found = [r for r in RECORDS if (r['given-names'], r['family-names']) in names]
+        start, rows = int(params['start']), int(params['rows'])
+        body = json.dumps({'num-found': len(found), 'expanded-result': found[start:start + rows]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class WikidataStandIn(BaseHTTPRequestHandler):
+    """ answers the SPARQL queries of WikidataClient from a few triples """
+    requests = []
+    TITLES = {'Take it Personally': 'Q1', 'Semantic Papers': 'Q2'}
+    AUTHORS = {'Q1': [('Q10', 'Konrad U. Förstner', '0000-0002-1481-2996')], 'Q2': [('Q11', 'Alice Smith', None)]}
+    ORCIDS = {'0000-0002-1481-2996': 'Q10', '0000-0001': 'Q12'}
+
+    def do_POST(self):
+        query = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())['query'][0]
+        self.requests.append(query)
+        values = re.search(r'VALUES \?\w+ \{(.*?)\}', query, re.S).group(1)
+        uri = 'http://www.wikidata.org/entity/'
+        if '?paper wdt:P50' in query:
+            bindings = [{'paper': uri + paper_id, 'author': uri + author_id, 'name': name, **({'orcid': orcid} if orcid else {})}
+                        for paper_id in re.findall(r'wd:(Q\d+)', values) for author_id, name, orcid in self.AUTHORS.get(paper_id, [])]
+        elif 'wdt:P496' in query:
+            bindings = [{'orcid': orcid, 'item': uri + self.ORCIDS[orcid]} for orcid in re.findall(r'"(.*?)"', values) if orcid in self.ORCIDS]
+        else:
+            bindings = [{'title': title, 'item': uri + self.TITLES[title]} for title in re.findall(r'"(.*?)"@en', values) if title in self.TITLES]
+        body = json.dumps({'results': {'bindings': [{k: {'value': v} for k, v in b.items()} for b in bindings]}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInTest(unittest.TestCase):
+    handler = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), cls.handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.endpoint = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.handler.requests.clear()
+
+
+class WikidataClientTest(StandInTest):
+    handler = WikidataStandIn
+
+    def test_lookups_are_batched(self):
+        client = WikidataClient(self.endpoint + '/sparql', batch_size=2)
+        self.assertEqual({'Take it Personally': 'Q1', 'Semantic Papers': 'Q2'},
+                         client.find_papers(['Take it Personally', 'Unknown', 'Semantic Papers']))
+        self.assertEqual(2, len(self.handler.requests))
+        self.assertEqual({'Q1': [{'wikidata_id': 'Q10', 'name': 'Konrad U. Förstner', 'orcid': '0000-0002-1481-2996'}], 'Q3': []},
+                         client.paper_authors(['Q1', 'Q3']))
+        self.assertEqual({'0000-0001': 'Q12'}, client.find_authors_by_orcid(['0000-0001', '0000-0009']))
+
+
+class DisambiguationCacheTest(unittest.TestCase):
+    def test_cached_lookup(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.sqlite')
+            calls = []
+
+            def lookup(keys):
+                calls.append(keys)
+                return {key: key.upper() for key in keys if key != 'missing'}
+
+            cache = DisambiguationCache(path)
+            self.assertEqual({'a': 'A', 'missing': None}, cache.cached_lookup('test', ['a', 'missing', 'a', ''], lookup))
+            self.assertEqual({'a': 'A', 'b': 'B', 'missing': None}, DisambiguationCache(path).cached_lookup('test', ['a', 'b', 'missing'], lookup))
+            self.assertEqual([['a', 'missing'], ['b']], calls)
+            # once they expired, only the lookups that found nothing are repeated
+            DisambiguationCache(path, not_found_ttl=0).cached_lookup('test', ['a', 'b', 'missing'], lookup)
+            self.assertEqual(['missing'], calls[-1])
+
+
+class DisambiguateVolumeTest(StandInTest):
+    handler = WikidataStandIn
+
+    def test_disambiguate_volume(self):
+        class FakeOrcid:
+            def search(self, names):
+                return {'Alice Smith': [{'orcid': '0000-0001', 'institutions': ['RWTH Aachen University'], 'emails': []}],
+                        'John Doe': [{'orcid': '0000-0002', 'institutions': ['University of Bonn'], 'emails': []}]}
+
+        papers = [PaperMetadata(volume_id=2451, paper_key='paper1', paper_path='Vol-2451/paper1', title='Take it Personally',
+                                authors=[Author('Konrad Förstner', ('ZB MED',)), Author('John Doe', ('University of Tartu',))]),
+                  PaperMetadata(volume_id=2451, paper_key='paper2', paper_path='Vol-2451/paper2', title='Unknown',
+                                authors=[Author('Alice Smith', ('RWTH Aachen University, Germany',))])]
+        first, second = disambiguate_volume(papers, wikidata=WikidataClient(self.endpoint + '/sparql'), orcid=FakeOrcid(),
+                                            cache=DisambiguationCache(None))
+        self.assertEqual(('Q1', ''), (first.wikidata_id, second.wikidata_id))
+        # listed by Wikidata for the paper
+        self.assertEqual(('0000-0002-1481-2996', 'Q10'), (first.authors[0].orcid, first.authors[0].wikidata_id))
+        # the only John Doe found on ORCID has another affiliation
+        self.assertEqual((None, None), (first.authors[1].orcid, first.authors[1].wikidata_id))
+        # found on ORCID with the same affiliation, then on Wikidata by the ORCID iD
+        self.assertEqual(('0000-0001', 'Q12'), (second.authors[0].orcid, second.authors[0].wikidata_id))
+
+
+class OrcidClientTest(StandInTest):
+    handler = OrcidStandIn
+    EXPECTED = {'Alice Smith': [{'orcid': '0000-0001', 'institutions': ['RWTH Aachen University'], 'emails': []}],
+                'John Doe': [{'orcid': '0000-0002', 'institutions': ['University of Bonn'], 'emails': []},
+                             {'orcid': '0000-0003', 'institutions': [], 'emails': ['john@tartu.ee']}],
+                'Bob Jones': [{'orcid': '0000-0004', 'institutions': [], 'emails': []}]}
+
+    def test_results_are_paged(self):
+        # with one record per page, the second "John Doe" is only found on the last page
+        client = OrcidClient(self.endpoint, page_size=1)
+        self.assertEqual(self.EXPECTED, client.search(['Alice Smith', 'John Doe', 'Bob Jones']))
+        self.assertEqual(['0', '1', '2', '3'], [r['start'] for r in OrcidStandIn.requests])
+
+    def test_large_results_are_searched_per_name(self):
+        client = OrcidClient(self.endpoint, max_records=2)
+        self.assertEqual(self.EXPECTED, client.search(['Alice Smith', 'John Doe', 'Bob Jones']))
+        self.assertEqual(4, len(OrcidStandIn.requests))
+
+    def test_confirmed_orcid(self):
+        john = self.EXPECTED['John Doe']
+        self.assertEqual('0000-0003', confirmed_orcid(Author('John Doe', ('University of Tartu',), ('JOHN@tartu.ee',)), john))
+        self.assertEqual('0000-0002', confirmed_orcid(Author('John Doe', ('Univ. of Bonn, Germany',)), john))
+        self.assertIsNone(confirmed_orcid(Author('John Doe', ('University of Tartu',)), john))
+        self.assertIsNone(confirmed_orcid(Author('John Doe', ('University of Bonn',), ('john@tartu.ee',)), john))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import re
+import unittest
+
+import pandas as pd
+from unidecode import unidecode
+
+from paper_semantification.evaluation import (normalize_affiliation, normalize_author_name, normalize_email, normalize_paper_title,
+                                              preprocess_df)
+
+
+# the chained replacements the evaluation used before the normalization was folded into single regular expressions
+def reference_author_name(name):
+    name = re.sub(r'([A-Za-z])\.', '', name).strip().replace('  ', ' ').replace('´', '').replace('-', '').lower()
+    return re.sub(r'\s\S+\s', ' ', unidecode(name))
+
+
+def reference_paper_title(title):
+    title = title.replace('(', ',').replace(')', ',').replace('.', '').replace(', ', ',').replace('-', ',').replace(':', ',')
+    return title.replace(',', '').replace('’', "'").strip().lower()
+
+
+def reference_affiliation(affiliation):
+    return re.sub(r'[^a-zA-Z0-9\s]', '', affiliation.replace('\n', '').lower()).replace(' ', '')
+
+
+NAMES = ['Konrad U. Förstner', 'Jean-Luc Picard', 'Anna Maria Schmidt', 'José´ García', 'C. Lange']
+TITLES = ['Take it Personally (Extended Abstract): A Study.', 'Don’t Stop - Now', 'Knowledge Graphs, Ontologies, and Data']
+AFFILIATIONS = ['RWTH Aachen University,\nGermany', 'Fraunhofer FIT (Sankt Augustin)', 'Université Paris-Saclay']
+
+
+class EvaluationTest(unittest.TestCase):
+    def test_same_results_as_the_chained_replacements(self):
+        for name in NAMES:
+            self.assertEqual(reference_author_name(name), normalize_author_name(name), name)
+        for title in TITLES:
+            self.assertEqual(reference_paper_title(title), normalize_paper_title(title), title)
+        for affiliation in AFFILIATIONS:
+            self.assertEqual(reference_affiliation(affiliation), normalize_affiliation(affiliation), affiliation)
+
+    def test_normalization(self):
+        self.assertEqual('konrad forstner', normalize_author_name('Konrad U. Förstner'))
+        self.assertEqual('take it personally extended abstract a study', normalize_paper_title('Take it Personally (Extended Abstract): A Study.'))
+        self.assertEqual('rwthaachenuniversitygermany', normalize_affiliation('RWTH Aachen University,\nGermany'))
+        self.assertEqual('alice@rwth.de', normalize_email(' Alice@RWTH.de '))
+
+    def test_preprocess_df_keeps_missing_values(self):
+        df = pd.DataFrame({'URL': ['https://ceur-ws.org/Vol-2451/paper1.pdf'], 'Author name': [None], 'Paper title': ['A (B)'],
+                           'Author Affiliations': ['RWTH'], 'Author E-Mail': ['A@B.de']})
+        row = preprocess_df(df).iloc[0]
+        self.assertEqual('http://ceur-ws.org/Vol-2451/paper1.pdf', row['URL'])
+        self.assertIsNone(row['Author name'])
+        self.assertEqual(('a b', 'rwth', 'a@b.de'), (row['Paper title'], row['Author Affiliations mod'], row['Author E-Mail']))
+        # the input frame is not modified
+        self.assertEqual('A (B)', df['Paper title'][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
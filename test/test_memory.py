@@ -0,0 +1,41 @@
+import multiprocessing
+import unittest
+
+from paper_semantification.memory import MemoryGuard, current_rss_mb, peak_rss_mb, process_rss_mb
+
+
+def hold_memory(ready, stop):
+    data = b'x' * (80 * 1024 * 1024)
+    ready.set()
+    stop.wait(10)
+    return len(data)
+
+
+class MemoryTest(unittest.TestCase):
+    def test_rss(self):
+        self.assertGreater(current_rss_mb(), 0)
+        self.assertGreaterEqual(peak_rss_mb(), current_rss_mb() * 0.5)
+
+    def test_rss_of_workers(self):
+        context = multiprocessing.get_context('spawn')
+        ready, stop = context.Event(), context.Event()
+        worker = context.Process(target=hold_memory, args=(ready, stop))
+        worker.start()
+        try:
+            self.assertTrue(ready.wait(10))
+            self.assertGreater(process_rss_mb(worker.pid), 64)
+            self.assertGreater(current_rss_mb(children=True), current_rss_mb() + 64)
+        finally:
+            stop.set()
+            worker.join()
+
+    def test_guard(self):
+        self.assertFalse(MemoryGuard(limit_mb=0).over_limit())
+        self.assertFalse(MemoryGuard(limit_mb=1024 * 1024).over_limit())
+        guard = MemoryGuard(limit_mb=1)
+        self.assertTrue(guard.over_limit())
+        self.assertEqual(1, guard.throttled)
+
+
+if __name__ == "__main__":
+    unittest.main()
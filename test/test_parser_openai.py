@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+import fitz
+import httpx
+from openai import APIConnectionError
+
+from paper_semantification.concurrency import UpstreamError
+from paper_semantification import parser_openai
+from paper_semantification.parser_openai import OpenAIPapersParser, RateLimiter, RequestScheduler
+
+
+def pdf_bytes(text):
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+class PdfStandIn(BaseHTTPRequestHandler):
+    """ serves a one page PDF for every path and counts the downloads """
+    downloads = Counter()
+
+    def do_GET(self):
+        self.downloads[self.path] += 1
+        body = pdf_bytes(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeCompletions:
+    """ chat completions of a stand-in client that fail `failures` times before they answer """
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error or APIConnectionError(request=httpx.Request('POST', 'http://openai.test/v1/chat/completions'))
+        self.calls = 0
+
+    async def create(self, messages, model):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='answer'))])
+
+
+def fake_client(completions, host):
+    return SimpleNamespace(base_url=f'http://{host}/v1', chat=SimpleNamespace(completions=completions))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_requests_per_minute(self):
+        async def run():
+            limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=10000)
+            await limiter.acquire(10)
+            await limiter.acquire(10)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(limiter.acquire(10), 0.1)
+        asyncio.run(run())
+
+    def test_tokens_per_minute(self):
+        async def run():
+            limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=1000)
+            # a request above the budget is let through on an empty window
+            await limiter.acquire(5000)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(limiter.acquire(10), 0.1)
+        asyncio.run(run())
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def test_retryable_errors_are_retried(self):
+        completions = FakeCompletions(failures=2)
+        scheduler = RequestScheduler(fake_client(completions, 'retry.test'), base_delay=0.0)
+        self.assertEqual('answer', asyncio.run(scheduler.chat('prompt', 'gpt-4')))
+        self.assertEqual(3, completions.calls)
+        self.assertEqual(2, scheduler.limiter.stats()['failures'])
+
+    def test_upstream_error_after_the_last_retry(self):
+        completions = FakeCompletions(failures=10)
+        scheduler = RequestScheduler(fake_client(completions, 'down.test'), max_retries=2, base_delay=0.0)
+        with self.assertRaises(UpstreamError):
+            asyncio.run(scheduler.chat('prompt', 'gpt-4'))
+        self.assertEqual(3, completions.calls)
+
+    def test_other_errors_are_not_retried(self):
+        completions = FakeCompletions(failures=1, error=ValueError('invalid request'))
+        scheduler = RequestScheduler(fake_client(completions, 'invalid.test'), base_delay=0.0)
+        with self.assertRaises(ValueError):
+            asyncio.run(scheduler.chat('prompt', 'gpt-4'))
+        self.assertEqual((1, 0), (completions.calls, scheduler.limiter.stats()['failures']))
+
+
+class FakeScheduler:
+    async def chat(self, prompt, model):
+        await asyncio.sleep(0.01)
+        return "[{'name': 'Alice Smith'}]" if 'authors' in prompt else 'Title'
+
+
+class FirstPageCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PdfStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.loop = asyncio.new_event_loop()
+        threading.Thread(target=cls.loop.run_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+
+    def test_pages_of_a_batch_are_downloaded_once(self):
+        async def create_scheduler(base_url, scheduler_options):
+            return FakeScheduler()
+
+        with mock.patch.object(OpenAIPapersParser, '_create_scheduler', staticmethod(create_scheduler)):
+            parser = OpenAIPapersParser(loop=self.loop, first_page_cache_size=4)
+        urls = [f'http://127.0.0.1:{self.server.server_port}/Vol-1/paper{i}.pdf' for i in range(20)]
+        results = parser.parse_papers(urls)
+        self.assertEqual([('Title', [{'name': 'Alice Smith'}])] * 20, results)
+        self.assertEqual({1}, set(PdfStandIn.downloads.values()))
+        self.assertEqual(20, len(PdfStandIn.downloads))
+        # only the configured number of pages is kept once the batch is done
+        self.assertEqual(4, len(parser._first_pages))
+
+
+class SharedParserTest(unittest.TestCase):
+    def test_one_parser_per_model(self):
+        async def create_scheduler(base_url, scheduler_options):
+            return FakeScheduler()
+
+        with mock.patch.object(OpenAIPapersParser, '_create_scheduler', staticmethod(create_scheduler)), \
+                mock.patch.object(parser_openai, '_parsers', {}):
+            gpt4 = parser_openai.get_parser('gpt-4')
+            self.assertIs(gpt4, parser_openai.get_parser('gpt-4'))
+            other = parser_openai.get_parser('gpt-3.5-turbo')
+        self.assertEqual(('gpt-4', 'gpt-3.5-turbo'), (gpt4.gpt_model, other.gpt_model))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from paper_semantification.parser import PaperMetadata
+from paper_semantification.pipeline import RawPaper, group_by_volume, run_pipeline
+
+
+def paper(volume_id, paper_key):
+    return PaperMetadata(volume_id=volume_id, paper_key=paper_key, paper_path=f'Vol-{volume_id}/{paper_key}', title='', authors=[])
+
+
+def fetch_stub(volume_id, paper_key):
+    if paper_key == 'paper2':
+        raise KeyError('grobid')
+    return RawPaper(volume_id=volume_id, paper_key=paper_key, grobid=paper_key.encode(), cermine=None, openai_result=None, errors=[])
+
+
+def parse_stub(raw, events):
+    # runs in a worker process, so it has to be defined at module level
+    metadata = paper(raw.volume_id, raw.paper_key)
+    metadata.title = raw.grobid.decode().upper()
+    return metadata
+
+
+class PipelineTest(unittest.TestCase):
+    def test_run_pipeline(self):
+        tasks = [(2451, 'paper1'), (2451, 'paper2'), (2451, 'paper3')]
+        results = {m.paper_key: m for m in run_pipeline(tasks, cpu_workers=1, io_workers=2, fetch_paper=fetch_stub, parse_paper=parse_stub)}
+        self.assertEqual(['paper1', 'paper2', 'paper3'], sorted(results))
+        self.assertEqual(('PAPER1', []), (results['paper1'].title, results['paper1'].errors))
+        self.assertEqual('PAPER3', results['paper3'].title)
+        self.assertEqual(["fetch: KeyError('grobid')"], results['paper2'].errors)
+
+    def test_group_by_volume(self):
+        paper_counts = {}
+
+        def results():
+            # the volumes are discovered while the results come in
+            paper_counts.update({2451: 2, 2452: 0})
+            yield paper(2451, 'paper2')
+            paper_counts[3498] = 1
+            yield paper(3498, 'paper1')
+            yield paper(2451, 'paper1')
+            paper_counts[3499] = 0
+
+        groups = [(volume_id, [m.paper_key for m in papers]) for volume_id, papers in group_by_volume(results(), paper_counts)]
+        self.assertEqual([(2452, []), (3498, ['paper1']), (2451, ['paper1', 'paper2']), (3499, [])], groups)
+        self.assertEqual({}, paper_counts)
+
+
+if __name__ == "__main__":
+    unittest.main()
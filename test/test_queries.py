@@ -0,0 +1,81 @@
+import time
+import unittest
+
+from paper_semantification.knowledge_graph.queries import COAUTHORS, GraphReader, TTLCache
+
+PAPERS = [{'url': f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper{i:02d}.pdf', 'title': f'Paper {i}', 'wikidata_id': None}
+          for i in range(7)]
+
+
+class FakeConnection:
+    """ answers the papers-by-volume query like the database, from a list ordered by url """
+    def __init__(self):
+        self.queries = []
+
+    def read_query(self, query, parameters):
+        self.queries.append((query, parameters))
+        after = parameters['after']
+        if after is not None:
+            assert 'AND p.url > $after' in query
+        items = [p for p in PAPERS if after is None or p['url'] > after]
+        return items[:parameters['limit']]
+
+    def close(self):
+        pass
+
+
+class GraphReaderTest(unittest.TestCase):
+    def reader(self, ttl=0):
+        reader = GraphReader(cache=TTLCache(ttl=ttl))
+        reader.connection = FakeConnection()
+        reader._connected = True
+        return reader
+
+    def test_keyset_pagination(self):
+        reader = self.reader()
+        pages, cursor = [], None
+        while True:
+            page = reader.papers_by_volume(2451, after=cursor, limit=3)
+            pages.append([p['title'] for p in page['items']])
+            cursor = page['next']
+            if cursor is None:
+                break
+        self.assertEqual([['Paper 0', 'Paper 1', 'Paper 2'], ['Paper 3', 'Paper 4', 'Paper 5'], ['Paper 6']], pages)
+        query, parameters = reader.connection.queries[1]
+        self.assertEqual((2451, PAPERS[2]['url'], 3), (parameters['volume'], parameters['after'], parameters['limit']))
+        self.assertNotIn('{after}', query)
+
+    def test_full_last_page_has_no_next(self):
+        reader = self.reader()
+        page = reader.papers_by_volume(2451, after=PAPERS[3]['url'], limit=3)
+        self.assertEqual(PAPERS[6]['url'], page['next'])
+        self.assertEqual({'items': [], 'next': None}, reader.papers_by_volume(2451, after=page['next'], limit=3))
+
+    def test_pages_are_cached(self):
+        reader = self.reader(ttl=60)
+        first = reader.papers_by_volume(2451, limit=3)
+        self.assertIs(first, reader.papers_by_volume(2451, limit=3))
+        reader.papers_by_volume(2451, limit=4)
+        self.assertEqual(2, len(reader.connection.queries))
+
+    def test_cursor_condition_is_on_the_sort_property(self):
+        self.assertNotIn('$after', COAUTHORS.build(None))
+        cypher = COAUTHORS.build('a1')
+        self.assertIn('WHERE c <> a AND c.author_id > $after', cypher)
+        self.assertTrue(cypher.rstrip().endswith('ORDER BY c.author_id LIMIT $limit'))
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_expiry_and_eviction(self):
+        cache = TTLCache(ttl=0.05, max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual((1, None, 3), (cache.get('a'), cache.get('b'), cache.get('c')))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from paper_semantification.result_cache import ResultCache, etag, etag_matches
+
+
+PAYLOAD = {"paper_path": "http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper23", "paper_title": "Take it Personally",
+           "name": ["Konrad U. Förstner"], "affiliation": [""], "email": [""], "proceeding": "", "event": ""}
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = ResultCache(max_entries=2, path=None)
+        cache.put(2451, 1, PAYLOAD)
+        cache.put(2451, 2, PAYLOAD)
+        cache.get(2451, 1)
+        cache.put(2451, 3, PAYLOAD)
+        self.assertIsNotNone(cache.get(2451, 1))
+        self.assertIsNone(cache.get(2451, 2))
+        self.assertEqual(2, len(cache))
+
+    def test_persistent_tier_and_version(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache', 'results.sqlite')
+            ResultCache(path=path, version='1').put(2451, 23, PAYLOAD)
+            entry = ResultCache(path=path, version='1').get(2451, 23)
+            self.assertEqual(PAYLOAD, entry['payload'])
+            self.assertIsNone(ResultCache(path=path, version='2').get(2451, 23))
+
+    def test_invalidate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(path=os.path.join(tmp, 'results.sqlite'))
+            cache.put(2451, 23, PAYLOAD)
+            cache.put(2451, 24, PAYLOAD)
+            cache.put(3498, 1, PAYLOAD)
+            self.assertEqual(1, cache.invalidate(2451, 23))
+            self.assertIsNone(cache.get(2451, 23))
+            self.assertEqual(1, cache.invalidate(2451))
+            self.assertIsNotNone(cache.get(3498, 1))
+            self.assertEqual(1, cache.invalidate())
+            self.assertIsNone(cache.get(3498, 1))
+            with self.assertRaises(ValueError):
+                cache.invalidate(paper_id=1)
+
+    def test_etag_matches(self):
+        tag = etag(PAYLOAD)
+        self.assertTrue(etag_matches(tag, tag))
+        self.assertTrue(etag_matches(f'"other", W/{tag}', tag))
+        self.assertTrue(etag_matches('*', tag))
+        self.assertFalse(etag_matches(None, tag))
+        # a tag that only contains the entity tag does not match
+        self.assertFalse(etag_matches(f'"x{tag[1:]}', tag))
+        self.assertFalse(etag_matches(tag[1:-1], tag))
+
+
+if __name__ == "__main__":
+    unittest.main()
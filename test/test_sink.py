@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import unittest
+
+from paper_semantification.sink import SCHEMA, JsonlSink, MemorySink, OutputSink, create_sink
+
+
+ROW = {'Volume': '2451', 'Paper title': 'Take it Personally', 'Author name': 'Konrad U. Förstner',
+       'URL': 'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper-23.pdf', 'Source': 'grobid+cermine+openai'}
+
+
+class SinkTest(unittest.TestCase):
+    def test_rows_follow_schema(self):
+        sink = MemorySink()
+        sink.write(ROW)
+        sink.flush()
+        self.assertEqual(SCHEMA, list(sink.rows[0].keys()))
+        self.assertEqual(2451, sink.rows[0]['Volume'])
+        self.assertEqual('', sink.rows[0]['Author E-Mail'])
+
+    def test_jsonl_flushes_in_chunks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out', 'rows.jsonl')
+            sink = JsonlSink(path, chunk_size=2)
+            sink.write_rows([ROW] * 3)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(2, len(f.readlines()))
+            sink.close()
+            rows = list(sink.iter_rows())
+            self.assertEqual(3, len(rows))
+            self.assertEqual('Konrad U. Förstner', rows[2]['Author name'])
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(SCHEMA, list(json.loads(f.readline()).keys()))
+
+    def test_drop_volumes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for kind, path in [('jsonl', os.path.join(tmp, 'rows.jsonl')), ('parquet', os.path.join(tmp, 'rows')), ('memory', None)]:
+                sink = create_sink(kind, path)
+                sink.write_rows([ROW, {**ROW, 'Volume': '2452'}, ROW])
+                sink.close()
+                if kind == 'jsonl':
+                    # the last line of an interrupted run
+                    with open(path, 'a', encoding='utf-8') as f:
+                        f.write('{"Volume": 2452, "Paper ti')
+                sink.drop_volumes([2452])
+                self.assertEqual([2451, 2451], [int(row['Volume']) for row in sink.iter_rows()], kind)
+
+    def test_jsonl_skips_and_repairs_a_partial_last_line(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'rows.jsonl')
+            with JsonlSink(path) as sink:
+                sink.write(ROW)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('{"Volume": 2452, "Paper ti')
+            sink = JsonlSink(path)
+            self.assertEqual([2451], [row['Volume'] for row in sink.iter_rows()])
+            with sink:
+                sink.write({**ROW, 'Volume': '2453'})
+            self.assertEqual([2451, 2453], [row['Volume'] for row in sink.iter_rows()])
+
+    def test_sinks_implement_the_interface(self):
+        with self.assertRaises(TypeError):
+            OutputSink()
+
+    def test_unknown_sink(self):
+        with self.assertRaises(ValueError):
+            create_sink('csv', 'out.csv')
+
+
+if __name__ == "__main__":
+    unittest.main()
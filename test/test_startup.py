@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from paper_semantification.startup import import_profile, lazy_import, parse_import_times
+
+
+OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       900 |       1020 |   json.decoder
+import time:       300 |       1500 | json
+import time:        50 |         50 | colorsys
+"""
+
+
+class StartupTest(unittest.TestCase):
+    def test_parse_import_times_keeps_top_level_imports(self):
+        self.assertEqual([('json', 1.5, 0.3), ('colorsys', 0.05, 0.05)], parse_import_times(OUTPUT))
+
+    def test_import_profile(self):
+        packages = [package for package, _, _ in import_profile('paper_semantification.startup', top=100)]
+        self.assertIn('paper_semantification.startup', packages)
+
+    def test_lazy_import_defers_execution(self):
+        sys.modules.pop('colorsys', None)
+        module = lazy_import('colorsys')
+        self.assertIs(module, sys.modules['colorsys'])
+        self.assertEqual((1.0, 1.0, 1.0), module.hsv_to_rgb(0.0, 0.0, 1.0))
+
+    def test_lazy_import_unknown_module(self):
+        with self.assertRaises(ModuleNotFoundError):
+            lazy_import('paper_semantification_does_not_exist')
+
+    def test_parser_defers_heavy_imports(self):
+        script = ("import sys; from test.stubs import stub_missing_modules; stub_missing_modules('dblp'); "
+                  "import paper_semantification.parser as parser; "
+                  "executed = lambda: sorted(m for m in ('bs4.element', 'neo4j.exceptions', 'ftfy.fixes', 'spellchecker.utils') if m in sys.modules); "
+                  "print(executed()); parser.load_lazy_modules(); print(executed())")
+        completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        before, after = completed.stdout.strip().splitlines()[-2:]
+        self.assertEqual('[]', before)
+        self.assertIn('bs4.element', after)
+
+
+if __name__ == "__main__":
+    unittest.main()
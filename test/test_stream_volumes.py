@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from paper_semantification import parser
+from paper_semantification.parser import Author, PaperMetadata, parse_volumes, stream_volumes
+from paper_semantification.sink import MemorySink
+
+VOLUMES = {2451: ['paper1', 'paper2'], 2452: [], 3498: ['paper1']}
+
+
+def discover_volumes(volume_ids):
+    for v in volume_ids:
+        yield int(v), VOLUMES[int(v)], {'proceedings': f'Vol-{v}', 'event': 'Event'}
+
+
+def extract_volume_papers(volume_id, paper_keys, events=None):
+    return [PaperMetadata(volume_id=volume_id, paper_key=key, paper_path=f'Vol-{volume_id}/{key}', title=key,
+                          authors=[Author('Alice Smith'), Author('Bob Jones')], errors=['grobid: HTTP 503'] if key == 'paper2' else [])
+            for key in paper_keys]
+
+
+@mock.patch.object(parser, 'discover_volumes', discover_volumes)
+@mock.patch.object(parser, 'extract_volume_papers', extract_volume_papers)
+class StreamVolumesTest(unittest.TestCase):
+    def test_volumes_are_streamed_one_at_a_time(self):
+        stream = stream_volumes(['2451', '2452', '3498'])
+        volume_id, papers = next(stream)
+        self.assertEqual((2451, ['paper1', 'paper2']), (volume_id, [m.paper_key for m in papers]))
+        self.assertEqual([(2452, []), (3498, ['paper1'])], [(v, [m.paper_key for m in p]) for v, p in stream])
+
+    def test_parse_volumes_reports_every_volume(self):
+        done = []
+        sink = MemorySink()
+        summary = parse_volumes(volumes=[2451, 2452, 3498], sink=sink, on_volume_done=lambda *args: done.append(args))
+        self.assertEqual([(2451, 2, 1), (2452, 0, 0), (3498, 1, 0)], done)
+        self.assertEqual((3, 3, 1), (summary.volumes, summary.papers, summary.failed))
+        self.assertEqual(6, len(sink.rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from collections import namedtuple
+
+from paper_semantification.knowledge_graph.sync import build_state, content_hash, diff_states, empty_state, sync_paper
+
+# stands in for parser.Author, which cannot be imported without the extraction dependencies
+Author = namedtuple('Author', ['name', 'email', 'affiliation', 'orcid', 'wikidata_id'])
+
+ALICE = Author('Alice Smith', ['alice@rwth-aachen.de'], ['RWTH Aachen University'], '0000-0001-2345-6789', None)
+BOB = Author('Bob Jones', [], ['University of Bonn'], None, None)
+RWTH = [{'id': 'aff-rwth', 'name': 'RWTH Aachen University'}]
+BONN = [{'id': 'aff-bonn', 'name': 'University of Bonn'}]
+
+
+URL = 'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper23.pdf'
+
+
+def state(authors, title='Take it Personally', event='SEMANTiCS 2019'):
+    return build_state(title, 'Vol-2451', event, authors, wikidata_id='Q123', volume='2451')
+
+
+class FakeResult(list):
+    def single(self):
+        return self[0] if self else None
+
+
+class FakeTransaction:
+    """ records the statements and answers the reads of sync_paper from the stored state of the paper (None: not in the graph) """
+    def __init__(self, stored=None, stored_hash=None):
+        self.stored = stored
+        self.stored_hash = stored_hash
+        self.statements = []
+
+    def run(self, query, **parameters):
+        self.statements.append((query, parameters))
+        if 'RETURN p.version' in query:
+            return FakeResult([{'version': 1 if self.stored is None else 2}])
+        if self.stored is None:
+            return FakeResult()
+        if 'RETURN p.content_hash' in query:
+            return FakeResult([{'content_hash': self.stored_hash}])
+        if 'RETURN p.title' in query:
+            return FakeResult([self.stored['paper']])
+        if 'type(r) AS rel_type' in query:
+            return FakeResult({'author_id': author_id, 'rel_type': rel_type, 'key': key}
+                              for rel_type, edges in self.stored['edges'].items() for author_id, key in edges)
+        if 'AS author_id' in query:
+            return FakeResult({'author_id': author_id, **properties} for author_id, properties in self.stored['authors'].items())
+        return FakeResult()
+
+    def writes(self, keyword):
+        return [parameters for query, parameters in self.statements if keyword in query and 'RETURN' not in query]
+
+
+class SyncTest(unittest.TestCase):
+    def test_content_hash_is_stable(self):
+        first = state([('a1', ALICE, RWTH), ('a2', BOB, BONN)])
+        second = state([('a2', BOB, BONN), ('a1', ALICE, RWTH)])
+        self.assertEqual(content_hash(first), content_hash(second))
+        self.assertNotEqual(content_hash(first), content_hash(state([('a1', ALICE, RWTH)])))
+
+    def test_new_paper(self):
+        plan = diff_states(empty_state(), state([('a1', ALICE, RWTH)]))
+        self.assertEqual({'title': 'Take it Personally', 'wikidata_id': 'Q123', 'volume': 2451}, plan.paper)
+        self.assertEqual({'a1'}, plan.add_authored)
+        self.assertEqual({('a1', 'aff-rwth')}, plan.add_edges['AFFILIATED_WITH'])
+        self.assertEqual({'aff-rwth': 'RWTH Aachen University'}, plan.affiliations)
+
+    def test_unchanged_paper(self):
+        current = state([('a1', ALICE, RWTH), ('a2', BOB, BONN)])
+        self.assertTrue(diff_states(current, state([('a1', ALICE, RWTH), ('a2', BOB, BONN)])).empty)
+
+    def test_removed_author_and_changed_event(self):
+        current = state([('a1', ALICE, RWTH), ('a2', BOB, BONN)])
+        plan = diff_states(current, state([('a1', ALICE, RWTH)], event='SEMANTiCS 2020'))
+        self.assertEqual({}, plan.paper)
+        self.assertEqual({'a2'}, plan.remove_authored)
+        self.assertEqual(set(), plan.add_authored)
+        self.assertEqual({}, plan.upsert_authors)
+        self.assertEqual({('a2', 'aff-bonn')}, plan.remove_edges['AFFILIATED_WITH'])
+        self.assertEqual({('a1', 'SEMANTiCS 2020')}, plan.add_edges['PARTICIPATED_IN'])
+        self.assertEqual({('a1', 'SEMANTiCS 2019'), ('a2', 'SEMANTiCS 2019')}, plan.remove_edges['PARTICIPATED_IN'])
+
+    def test_missing_orcid_is_kept(self):
+        current = state([('a1', ALICE, RWTH)])
+        plan = diff_states(current, state([('a1', ALICE._replace(orcid=None), RWTH)]))
+        self.assertTrue(plan.empty)
+        plan = diff_states(current, state([('a1', ALICE._replace(email=['alice@example.org']), RWTH)]))
+        self.assertEqual(['alice@example.org'], plan.upsert_authors['a1']['email'])
+
+
+class SyncPaperTest(unittest.TestCase):
+    def test_new_paper(self):
+        tx = FakeTransaction()
+        result = sync_paper(tx, URL, state([('a1', ALICE, RWTH)]))
+        self.assertEqual((True, 1), (result.changed, result.version))
+        [paper] = tx.writes('SET p += $properties')
+        self.assertEqual({'title': 'Take it Personally', 'wikidata_id': 'Q123', 'volume': 2451}, paper['properties'])
+        [authors] = tx.writes('MERGE (a)-[r:AUTHORED]->(p)')
+        self.assertEqual([('a1', ['alice@rwth-aachen.de'])], [(row['author_id'], row['email']) for row in authors['authors']])
+        [affiliated] = tx.writes('MERGE (a)-[r:AFFILIATED_WITH]->(n)')
+        self.assertEqual([{'author_id': 'a1', 'key': 'aff-rwth', 'name': 'RWTH Aachen University'}], affiliated['rows'])
+        self.assertEqual([{'ids': ['a1']}], tx.writes('SET a.email = reduce'))
+        self.assertEqual([], tx.writes('DELETE'))
+
+    def test_unchanged_paper(self):
+        current = state([('a1', ALICE, RWTH)])
+        tx = FakeTransaction(current, content_hash(current))
+        result = sync_paper(tx, URL, state([('a1', ALICE, RWTH)]))
+        self.assertFalse(result.changed)
+        # only the content hash is read
+        self.assertEqual(1, len(tx.statements))
+
+    def test_removed_author(self):
+        current = state([('a1', ALICE, RWTH), ('a2', BOB, BONN)])
+        tx = FakeTransaction(current, 'outdated')
+        result = sync_paper(tx, URL, state([('a1', ALICE, RWTH)]))
+        self.assertEqual((True, 2), (result.changed, result.version))
+        self.assertEqual([], tx.writes('MERGE (a)-[r:AUTHORED]->(p)'))
+        [authored] = tx.writes('DETACH DELETE a')
+        self.assertEqual((['a2'], URL), (authored['ids'], authored['url']))
+        removed = [row for parameters in tx.writes('WHERE size(r.papers) = 0') for row in parameters['rows']]
+        self.assertEqual(sorted([{'author_id': 'a2', 'key': 'aff-bonn'}, {'author_id': 'a2', 'key': 'Vol-2451'},
+                                 {'author_id': 'a2', 'key': 'SEMANTiCS 2019'}], key=lambda row: row['key']),
+                         sorted(removed, key=lambda row: row['key']))
+        # the emails and affiliations of a2 are merged again from its other papers
+        self.assertEqual([{'ids': ['a2']}], tx.writes('SET a.email = reduce'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from test.stubs import stub_missing_modules
+
+stub_missing_modules('dblp')
+
+from paper_semantification import parser
+from paper_semantification.knowledge_graph import main as graph_main, utils as graph_utils
+from paper_semantification.parser import Author, PaperMetadata
+from paper_semantification.work_queue import CrawlHandler, WorkQueue, Worker, sync_graph_from_queue
+
+
+def rows_of(lease):
+    return [{'URL': lease.key}]
+
+
+def run_logging_worker(path, log_path):
+    """ worker process that logs every task it processes """
+    def handler(lease):
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(lease.key + '\n')
+        return rows_of(lease)
+
+    queue = WorkQueue(path)
+    Worker(queue, handler, poll_interval=0.01).run()
+    queue.close()
+
+
+def extract_paper_metadata(volume_id, paper_key, events=None):
+    metadata = PaperMetadata(volume_id=volume_id, paper_key=paper_key, paper_path=f'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-{volume_id}/{paper_key}',
+                             title=f'Title of {paper_key}', authors=[Author('Wei Wang', ('RWTH Aachen University',), ('wei@rwth-aachen.de',))],
+                             proceeding='Vol-2451', event=events[volume_id] if events else '')
+    if paper_key == 'paper2':
+        metadata.errors.append('grobid: HTTP 503')
+    return metadata
+
+
+class WorkQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'data', 'queue.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_enqueue_lease_ack(self):
+        queue = WorkQueue(self.path)
+        self.assertEqual(2, queue.enqueue('paper', [('2451/paper1', {}), ('2451/paper2', {})]))
+        self.assertEqual(0, queue.enqueue('paper', [('2451/paper1', {})]))
+        lease = queue.lease('worker-1')
+        self.assertEqual(('2451/paper1', 1, 1), (lease.key, lease.token, lease.attempts))
+        self.assertTrue(queue.ack(lease, rows_of(lease)))
+        self.assertFalse(queue.ack(lease, rows_of(lease)))
+        self.assertEqual({'pending': 1, 'leased': 0, 'done': 1, 'failed': 0}, queue.stats()['paper'])
+        self.assertEqual([{'URL': '2451/paper1'}], list(queue.results()))
+        queue.close()
+
+    def test_expired_lease_is_fenced(self):
+        queue = WorkQueue(self.path, lease_seconds=0.05)
+        queue.enqueue('paper', [('2451/paper1', {})])
+        crashed = queue.lease('worker-1')
+        self.assertIsNone(queue.lease('worker-2'))
+        time.sleep(0.1)
+        lease = queue.lease('worker-2')
+        self.assertEqual((2, 2), (lease.token, lease.attempts))
+        self.assertFalse(queue.heartbeat(crashed))
+        self.assertFalse(queue.ack(crashed, [{'URL': 'stale'}]))
+        self.assertTrue(queue.ack(lease, rows_of(lease)))
+        self.assertEqual([{'URL': '2451/paper1'}], list(queue.results()))
+        queue.close()
+
+    def test_failed_after_max_attempts(self):
+        queue = WorkQueue(self.path, max_attempts=2)
+        queue.enqueue('paper', [('2451/paper1', {})])
+        self.assertTrue(queue.release(queue.lease('worker-1'), 'grobid: HTTP 503'))
+        self.assertTrue(queue.release(queue.lease('worker-1'), 'grobid: HTTP 503'))
+        self.assertIsNone(queue.lease('worker-1'))
+        self.assertEqual([('paper', '2451/paper1', 'grobid: HTTP 503')], queue.failures())
+        self.assertEqual(1, queue.retry_failed())
+        self.assertIsNotNone(queue.lease('worker-1'))
+        queue.close()
+
+    def test_workers_process_each_task_once(self):
+        queue = WorkQueue(self.path)
+        queue.enqueue('paper', ((f'2451/paper{i}', {}) for i in range(200)))
+        processed = []
+
+        def handler(lease):
+            processed.append(lease.key)
+            return rows_of(lease)
+
+        def run(owner):
+            worker_queue = WorkQueue(self.path)
+            Worker(worker_queue, handler, owner=owner, poll_interval=0.01).run()
+            worker_queue.close()
+
+        threads = [threading.Thread(target=run, args=(f'worker-{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(200, len(processed))
+        self.assertEqual(200, len(set(processed)))
+        self.assertEqual([f'2451/paper{i}' for i in range(200)], [row['URL'] for row in queue.results()])
+        queue.close()
+
+    def test_worker_processes_process_each_task_once(self):
+        queue = WorkQueue(self.path)
+        queue.enqueue('paper', ((f'2451/paper{i}', {}) for i in range(100)))
+        log_path = os.path.join(self.tmp.name, 'processed.log')
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=run_logging_worker, args=(self.path, log_path)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+        self.assertEqual([0, 0, 0], [process.exitcode for process in processes])
+        with open(log_path, encoding='utf-8') as f:
+            processed = f.read().split()
+        self.assertEqual(sorted(f'2451/paper{i}' for i in range(100)), sorted(processed))
+        self.assertEqual(100, queue.stats()['paper']['done'])
+        queue.close()
+
+
+@mock.patch.object(parser, 'extract_paper_metadata', extract_paper_metadata)
+@mock.patch.object(parser, 'list_volume_papers', lambda volume_id: ['paper1', 'paper2'])
+@mock.patch.object(parser, 'get_volume_events', lambda volume_id: 'SEMANTiCS 2019')
+class CrawlHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = WorkQueue(os.path.join(self.tmp.name, 'queue.sqlite'), max_attempts=2)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def crawl(self):
+        self.queue.enqueue('volume', [('2451', {})])
+        worker = Worker(self.queue, CrawlHandler(self.queue), poll_interval=0.01)
+        with mock.patch('sys.stdout'):
+            worker.run()
+        return worker
+
+    def test_volume_fans_out_to_papers(self):
+        worker = self.crawl()
+        self.assertEqual({'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}, self.queue.stats()['volume'])
+        # the failing paper was leased twice, the volume and the other paper once
+        self.assertEqual((2, 2), (worker.done, worker.failed))
+        self.assertEqual([('paper', '2451/paper2', 'grobid: HTTP 503')], self.queue.failures())
+        [(key, rows)] = self.queue.task_results('paper')
+        self.assertEqual('2451/paper1', key)
+        self.assertEqual(('Title of paper1', 'SEMANTiCS 2019', 'Wei Wang'), (rows[0]['Paper title'], rows[0]['Event'], rows[0]['Author name']))
+
+    def test_sync_graph_uses_author_index(self):
+        self.crawl()
+        calls = []
+        with mock.patch.object(graph_main, 'Neo4jConnection'), mock.patch.object(graph_utils, 'create_neo4j_constraints'), \
+                mock.patch.object(graph_utils, 'sync_neo4j_graph', lambda **kwargs: calls.append(kwargs) or mock.Mock(changed=True)):
+            self.assertEqual(1, sync_graph_from_queue(self.queue, cache_dir=self.tmp.name))
+        [call] = calls
+        self.assertEqual([Author('Wei Wang', ('RWTH Aachen University',), ('wei@rwth-aachen.de',))], call['author_list'])
+        self.assertEqual((2451, 'http://ceurspt.wikidata.dbis.rwth-aachen.de/Vol-2451/paper1.pdf'), (call['volume'], call['url']))
+        self.assertIsNotNone(call['author_index'])
+        self.assertIsNotNone(call['affiliation_dictionary'])
+
+
+if __name__ == "__main__":
+    unittest.main()